@@ -1,16 +1,18 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from config.pagination import KeysetPaginationMixin
 from .models import User, UserProfile, SocialAccount
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(KeysetPaginationMixin, UserAdmin):
     """Enhanced admin for User model with full features"""
 
     list_display = ['username', 'email', 'sign', 'is_premium', 'premium_until', 'onboarded', 'date_joined']
     list_filter = ['is_premium', 'sign', 'onboarded', 'date_joined', 'last_login']
     search_fields = ['username', 'email', 'sign', 'name']
     readonly_fields = ['date_joined', 'last_login']
+    ordering = ['username']
 
     fieldsets = UserAdmin.fieldsets + (
         ('Profile Info', {
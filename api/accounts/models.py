@@ -90,6 +90,15 @@ class User(AbstractUser):
     notifications_enabled = models.BooleanField(default=True)
     theme_preference = models.CharField(max_length=10, choices=[('dark', 'Dark'), ('light', 'Light')], default='dark')
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Admin changelist filters, ordered by username
+            models.Index(fields=['is_premium', 'username']),
+            models.Index(fields=['sign', 'username']),
+            models.Index(fields=['onboarded', 'username']),
+            models.Index(fields=['last_login']),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.sign or 'No sign'})"
 
@@ -0,0 +1,149 @@
+"""
+Async social login helpers
+
+Provider token checks are awaited on the event loop with httpx, so under
+ASGI (APP_SERVER=asgi) a worker can have thousands of provider calls in
+flight without a thread for each. There the server's event loop lives as long
+as the worker and shares one AsyncClient (pooled keep-alive connections).
+Under WSGI every call of an async view runs on a loop of its own, so each
+lookup opens a client and closes it before returning. When httpx is not
+installed the blocking `requests` lookup runs in a thread instead. Users and
+social accounts are looked up with the async ORM.
+"""
+import asyncio
+import uuid
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+import requests
+
+from .models import SocialAccount
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional async client
+    httpx = None
+
+User = get_user_model()
+
+PROVIDER_TIMEOUT_SECONDS = 10
+
+USERINFO_URLS = {
+    'google': 'https://www.googleapis.com/oauth2/v2/userinfo',
+    'facebook': 'https://graph.facebook.com/me',
+}
+USERINFO_PARAMS = {
+    'facebook': {'fields': 'id,name,email'},
+}
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def new_client():
+    return httpx.AsyncClient(
+        timeout=PROVIDER_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=200),
+    )
+
+
+def get_client():
+    """Shared AsyncClient for the running (long-lived) event loop, created on first use"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = new_client()
+    return client
+
+
+async def provider_get(url, params):
+    if getattr(settings, 'APP_SERVER', 'wsgi') == 'asgi':
+        return await get_client().get(url, params=params)
+    async with new_client() as client:
+        return await client.get(url, params=params)
+
+
+def apple_user_info(access_token):
+    # Apple Sign In validation would require more complex JWT validation
+    # For demo, we'll return mock data
+    return {
+        'id': f'apple_user_{access_token[:10]}',
+        'email': 'user@privaterelay.appleid.com',
+        'name': 'Apple User'
+    }
+
+
+def blocking_user_info(provider, access_token):
+    """Provider lookup with requests, used when httpx is not installed"""
+    params = {**USERINFO_PARAMS.get(provider, {}), 'access_token': access_token}
+    try:
+        response = requests.get(USERINFO_URLS[provider], params=params, timeout=PROVIDER_TIMEOUT_SECONDS)
+        if response.status_code == 200:
+            return response.json()
+    except (requests.RequestException, ValueError):
+        pass
+    return None
+
+
+async def fetch_social_user_info(provider, access_token):
+    """Validate a provider token and return the provider's user info, or None"""
+    if provider == 'apple':
+        return apple_user_info(access_token)
+    if provider not in USERINFO_URLS:
+        return None
+
+    if httpx is None:
+        return await sync_to_async(blocking_user_info, thread_sensitive=False)(provider, access_token)
+
+    params = {**USERINFO_PARAMS.get(provider, {}), 'access_token': access_token}
+    try:
+        response = await provider_get(USERINFO_URLS[provider], params)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+async def aget_or_create_social_user(provider, user_info, access_token):
+    """Find the user behind a provider account, creating user and account on first login"""
+    provider_id = str(user_info.get('id', ''))
+    email = user_info.get('email', '')
+    name = user_info.get('name', '')
+
+    try:
+        social_account = await SocialAccount.objects.select_related('user').aget(
+            provider=provider, provider_id=provider_id
+        )
+    except SocialAccount.DoesNotExist:
+        pass
+    else:
+        social_account.access_token = access_token
+        await social_account.asave(update_fields=['access_token', 'updated_at'])
+        return social_account.user, False
+
+    user = None
+    if email:
+        user = await User.objects.filter(email=email).afirst()
+
+    if not user:
+        username = f"{provider}_{uuid.uuid4().hex[:8]}"
+        user = await User.objects.acreate(
+            username=username,
+            email=email or f"{username}@salamene.app",
+            name=name,
+            onboarded=False
+        )
+
+    await SocialAccount.objects.acreate(
+        user=user,
+        provider=provider,
+        provider_id=provider_id,
+        provider_email=email,
+        access_token=access_token
+    )
+    return user, True
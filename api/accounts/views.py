@@ -3,11 +3,15 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
 from .serializers import UserSignupSerializer, UserSerializer, UserUpdateSerializer, SocialAuthSerializer, OnboardingSerializer, CompleteUserSerializer
 from .authentication import generate_jwt_token
-from .models import SocialAccount, UserProfile
+from .models import UserProfile
+from .social import aget_or_create_social_user, fetch_social_user_info
+from config.renderers import dumps
+import json
 import uuid
-import requests
 from django.utils import timezone
 
 User = get_user_model()
@@ -99,16 +103,30 @@ def update_user_profile(request):
         )
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def social_auth(request):
-    """Handle social authentication (Google, Apple, Facebook)"""
-    serializer = SocialAuthSerializer(data=request.data)
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), content_type='application/json', status=status_code)
+
+
+async def social_auth(request):
+    """
+    Handle social authentication (Google, Apple, Facebook)
+
+    A plain async Django view rather than a DRF one: the provider call is
+    awaited, so under ASGI it does not hold a worker thread.
+    """
+    if request.method != 'POST':
+        return json_response({"detail": f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = None
+    serializer = SocialAuthSerializer(data=data)
 
     if not serializer.is_valid():
-        return Response(
+        return json_response(
             {"error": {"code": "INVALID_DATA", "message": "Invalid social auth data"}},
-            status=status.HTTP_400_BAD_REQUEST
+            status.HTTP_400_BAD_REQUEST
         )
 
     provider = serializer.validated_data['provider']
@@ -116,37 +134,41 @@ def social_auth(request):
 
     try:
         # Validate token with provider and get user info
-        user_info = validate_social_token(provider, access_token)
+        user_info = await fetch_social_user_info(provider, access_token)
 
         if not user_info:
-            return Response(
+            return json_response(
                 {"error": {"code": "INVALID_TOKEN", "message": "Invalid social auth token"}},
-                status=status.HTTP_401_UNAUTHORIZED
+                status.HTTP_401_UNAUTHORIZED
             )
 
         # Get or create user
-        user, created = get_or_create_social_user(provider, user_info, access_token)
+        user, created = await aget_or_create_social_user(provider, user_info, access_token)
 
         # Generate JWT token
         jwt_token = generate_jwt_token(user)
 
         # Create user profile if new user
         if created:
-            UserProfile.objects.get_or_create(user=user)
-            user.calculate_astrological_signs()
+            await UserProfile.objects.aget_or_create(user=user)
+            await sync_to_async(user.calculate_astrological_signs)()
 
-        return Response({
+        return json_response({
             "jwt": jwt_token,
             "user": UserSerializer(user).data
-        }, status=status.HTTP_200_OK)
+        })
 
     except Exception as e:
-        return Response(
+        return json_response(
             {"error": {"code": "SERVER_ERROR", "message": str(e)}},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+# Tokens are the credential here; there is no session cookie to protect
+social_auth.csrf_exempt = True
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def refresh_token(request):
@@ -183,90 +205,6 @@ def logout(request):
         )
 
 
-def validate_social_token(provider, access_token):
-    """Validate social auth token and return user info"""
-    try:
-        if provider == 'google':
-            # Validate Google token
-            response = requests.get(
-                f'https://www.googleapis.com/oauth2/v2/userinfo?access_token={access_token}',
-                timeout=10
-            )
-            if response.status_code == 200:
-                return response.json()
-
-        elif provider == 'apple':
-            # Apple Sign In validation would require more complex JWT validation
-            # For demo, we'll return mock data
-            return {
-                'id': f'apple_user_{access_token[:10]}',
-                'email': 'user@privaterelay.appleid.com',
-                'name': 'Apple User'
-            }
-
-        elif provider == 'facebook':
-            # Validate Facebook token
-            response = requests.get(
-                f'https://graph.facebook.com/me?fields=id,name,email&access_token={access_token}',
-                timeout=10
-            )
-            if response.status_code == 200:
-                return response.json()
-
-        return None
-
-    except Exception:
-        return None
-
-
-def get_or_create_social_user(provider, user_info, access_token):
-    """Get or create user from social auth"""
-    provider_id = str(user_info.get('id', ''))
-    email = user_info.get('email', '')
-    name = user_info.get('name', '')
-
-    # Try to find existing social account
-    try:
-        social_account = SocialAccount.objects.get(provider=provider, provider_id=provider_id)
-        user = social_account.user
-
-        # Update access token
-        social_account.access_token = access_token
-        social_account.save()
-
-        return user, False
-
-    except SocialAccount.DoesNotExist:
-        # Try to find user by email if provided
-        user = None
-        if email:
-            try:
-                user = User.objects.get(email=email)
-            except User.DoesNotExist:
-                pass
-
-        # Create new user if not found
-        if not user:
-            username = f"{provider}_{uuid.uuid4().hex[:8]}"
-            user = User.objects.create(
-                username=username,
-                email=email or f"{username}@salamene.app",
-                name=name,
-                onboarded=False
-            )
-
-        # Create social account
-        SocialAccount.objects.create(
-            user=user,
-            provider=provider,
-            provider_id=provider_id,
-            provider_email=email,
-            access_token=access_token
-        )
-
-        return user, True
-
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def complete_onboarding(request):
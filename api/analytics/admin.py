@@ -1,13 +1,56 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import AnalyticsEvent, SessionMetrics
+from config.pagination import KeysetPaginationMixin
+from .models import AnalyticsEvent, SessionMetrics, InternedString, FunnelStepCount
+
+
+class AppVersionFilter(admin.SimpleListFilter):
+    """Filter events by interned app version"""
+    title = 'app version'
+    parameter_name = 'version'
+
+    def lookups(self, request, model_admin):
+        versions = InternedString.objects.filter(kind=InternedString.APP_VERSION).order_by('-id')[:50]
+        return [(str(version.id), version.value) for version in versions]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(version_id=self.value())
+        return queryset
+
+
+class NonZeroFilter(admin.SimpleListFilter):
+    """Yes/No filter on a counter; avoids the SELECT DISTINCT of the default integer filter"""
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(**{f'{self.field_name}__gt': 0})
+        if self.value() == 'no':
+            return queryset.filter(**{self.field_name: 0})
+        return queryset
+
+
+class PurchasedFilter(NonZeroFilter):
+    title = 'purchased'
+    parameter_name = 'purchased'
+    field_name = 'successful_purchases'
+
+
+class SawPaywallFilter(NonZeroFilter):
+    title = 'saw paywall'
+    parameter_name = 'saw_paywall'
+    field_name = 'paywall_views'
 
 
 @admin.register(AnalyticsEvent)
-class AnalyticsEventAdmin(admin.ModelAdmin):
-    list_display = ['event', 'user', 'session_short', 'timestamp_readable', 'created_at']
-    list_filter = ['event', 'app_version', 'created_at']
-    search_fields = ['event', 'session_id', 'user__username']
+class AnalyticsEventAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ['event_name', 'user', 'session_short', 'timestamp_readable', 'created_at']
+    list_filter = ['event_code', AppVersionFilter, 'created_at']
+    search_fields = ['session_id', '=user__id']
     readonly_fields = ['timestamp_readable', 'session_short', 'created_at']
     ordering = ['-created_at']
 
@@ -22,19 +65,25 @@ class AnalyticsEventAdmin(admin.ModelAdmin):
         return f"{obj.session_id[:8]}..."
     session_short.short_description = 'Session'
 
+    def event_name(self, obj):
+        return obj.event_name
+    event_name.short_description = 'Event'
+    event_name.admin_order_field = 'event_code'
+
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user')
+        # Users may be in another database: no join
+        return super().get_queryset(request).prefetch_related('user')
 
 
 @admin.register(SessionMetrics)
-class SessionMetricsAdmin(admin.ModelAdmin):
+class SessionMetricsAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = [
         'session_short', 'user', 'duration_minutes', 'screen_views',
         'tab_switches', 'banner_clicks', 'paywall_views',
         'compatibility_calculations', 'successful_purchases', 'start_time'
     ]
-    list_filter = ['start_time', 'successful_purchases', 'paywall_views']
-    search_fields = ['session_id', 'user__username']
+    list_filter = ['start_time', PurchasedFilter, SawPaywallFilter]
+    search_fields = ['session_id', '=user__id']
     readonly_fields = ['session_short', 'duration_minutes']
     ordering = ['-start_time']
 
@@ -52,4 +101,13 @@ class SessionMetricsAdmin(admin.ModelAdmin):
     duration_minutes.short_description = 'Duration'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user')
\ No newline at end of file
+        # Users may be in another database: no join
+        return super().get_queryset(request).prefetch_related('user')
+
+
+@admin.register(FunnelStepCount)
+class FunnelStepCountAdmin(admin.ModelAdmin):
+    list_display = ['funnel', 'day', 'app_version', 'banner_id', 'step', 'count']
+    list_filter = ['funnel', 'step', 'day']
+    search_fields = ['banner_id', 'app_version']
+    ordering = ['-day', 'funnel', 'step_index']
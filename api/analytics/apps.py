@@ -3,4 +3,12 @@ from django.apps import AppConfig
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'analytics'
\ No newline at end of file
+    name = 'analytics'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete
+        from .signals import delete_user_analytics
+
+        # Analytics rows reference users without a database-level cascade
+        post_delete.connect(delete_user_analytics, sender=get_user_model())
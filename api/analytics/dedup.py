@@ -0,0 +1,62 @@
+"""
+In-memory dedup window for client-generated analytics event ids
+"""
+import threading
+import time
+
+from django.conf import settings
+
+
+class RecentEventIds:
+    """
+    Time-bounded set of recently seen event ids.
+
+    Ids live in two generations that rotate every `window_seconds`, so an id is
+    remembered for at least one and at most two windows. Each generation is
+    capped at `max_size` entries to keep memory bounded during bursts.
+    """
+
+    def __init__(self, window_seconds=600, max_size=200000):
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _maybe_rotate(self):
+        now = time.monotonic()
+        if now - self._rotated_at >= self.window_seconds or len(self._current) >= self.max_size:
+            # After two idle windows both generations are stale
+            self._previous = self._current if now - self._rotated_at < 2 * self.window_seconds else set()
+            self._current = set()
+            self._rotated_at = now
+
+    def filter_new(self, event_ids):
+        """Return the ids not seen in the window and remember them"""
+        new_ids = []
+        with self._lock:
+            self._maybe_rotate()
+            for event_id in event_ids:
+                if event_id in self._current or event_id in self._previous:
+                    continue
+                self._current.add(event_id)
+                new_ids.append(event_id)
+        return new_ids
+
+    def forget(self, event_ids):
+        """Drop ids whose events were not stored, so a retry is accepted"""
+        with self._lock:
+            self._current.difference_update(event_ids)
+            self._previous.difference_update(event_ids)
+
+    def clear(self):
+        with self._lock:
+            self._current.clear()
+            self._previous.clear()
+
+
+recent_event_ids = RecentEventIds(
+    window_seconds=getattr(settings, 'ANALYTICS_DEDUP_WINDOW_SECONDS', 600),
+    max_size=getattr(settings, 'ANALYTICS_DEDUP_MAX_IDS', 200000),
+)
@@ -0,0 +1,125 @@
+"""
+Constant-memory export of analytics events as NDJSON or CSV
+"""
+from datetime import datetime, timezone as dt_timezone
+import csv
+import io
+import json
+import zlib
+
+from django.db.models import Q
+
+from .models import AnalyticsEvent
+from .records import RECORD_FIELDS, RECORD_COLUMNS, iter_event_records
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows per keyset page and per server-side cursor fetch
+PAGE_SIZE = 50000
+CHUNK_SIZE = 2000
+
+# Bytes buffered before a chunk is handed to the response
+FLUSH_BYTES = 64 * 1024
+
+
+def parse_time(value):
+    """Parse epoch milliseconds, YYYY-MM-DD or an ISO datetime into epoch ms"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}'. Use epoch ms, YYYY-MM-DD or an ISO datetime")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def iter_export_records(start=None, end=None, events=None, page_size=PAGE_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    Stream records with start <= timestamp < end in (timestamp, id) order.
+
+    Pages are fetched by keyset on (timestamp, id), never OFFSET, and each page is
+    read through a server-side cursor so memory stays flat.
+    """
+    queryset = AnalyticsEvent.objects.all()
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    if events:
+        queryset = queryset.with_events(events)
+
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(timestamp__gt=last[0]) | Q(timestamp=last[0], id__gt=last[1]))
+        rows = page.order_by('timestamp', 'id').values_list(*RECORD_COLUMNS)[:page_size]
+
+        count = 0
+        for record in iter_event_records(rows.iterator(chunk_size=chunk_size)):
+            count += 1
+            last = (record['timestamp'], record['id'])
+            yield record
+
+        if count < page_size:
+            break
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+
+
+def iter_csv(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RECORD_FIELDS)
+    for record in records:
+        record = dict(record, params=json.dumps(record['params'], separators=(',', ':')))
+        writer.writerow([record[field] for field in RECORD_FIELDS])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def buffered(chunks, flush_bytes=FLUSH_BYTES):
+    """Join small chunks so the response writes ~flush_bytes at a time"""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= flush_bytes:
+            yield b''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks, level=6):
+    """Compress a byte stream on the fly into a gzip container"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(start=None, end=None, events=None, export_format='ndjson', compress=False):
+    """Byte chunks of an export; the caller streams them to a response or file"""
+    records = iter_export_records(start, end, events)
+    encoder = iter_csv if export_format == 'csv' else iter_ndjson
+    stream = buffered(encoder(records))
+    if compress:
+        stream = gzipped(stream)
+    return stream
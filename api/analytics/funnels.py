@@ -0,0 +1,283 @@
+"""
+Conversion funnel computation over analytics events
+
+Events are consumed in a single streaming pass ordered by (session_id, timestamp),
+keeping state only for the session currently being read. Attempts that are still
+in progress when a pass ends are carried in a FunnelCheckpoint so the next
+incremental run can resume where this one stopped.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+import logging
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import AnalyticsEvent, FunnelStepCount, FunnelCheckpoint
+from .interning import intern_cache
+from config.routers import analytics_database
+
+logger = logging.getLogger('analytics')
+
+# In-progress attempts not touched for this long are dropped from checkpoints
+OPEN_ATTEMPT_TTL_MS = 24 * 60 * 60 * 1000
+
+
+class Funnel:
+    """An ordered sequence of events that make up one conversion path"""
+
+    def __init__(self, name, steps, reset_on=()):
+        self.name = name
+        self.steps = tuple(steps)
+        self.reset_on = frozenset(reset_on)
+
+    @property
+    def events(self):
+        """All event names the funnel needs to see"""
+        return set(self.steps) | self.reset_on
+
+    def __repr__(self):
+        return f"Funnel({self.name}: {' -> '.join(self.steps)})"
+
+
+FUNNELS = {
+    'paywall_purchase': Funnel(
+        'paywall_purchase',
+        ['paywall_shown', 'upgrade_cta_clicked', 'purchase_initiated', 'purchase_success'],
+        reset_on=['purchase_failed'],
+    ),
+    'purchase': Funnel(
+        'purchase',
+        ['purchase_initiated', 'purchase_success'],
+        reset_on=['purchase_failed'],
+    ),
+}
+
+
+def get_banner_id(params):
+    """Extract the banner id from paywall `trigger` / upgrade `source` params"""
+    if not isinstance(params, dict):
+        return ''
+    for key in ('trigger', 'source'):
+        value = params.get(key)
+        if isinstance(value, str) and value.startswith('banner_'):
+            return value[len('banner_'):][:50]
+    return ''
+
+
+class FunnelEngine:
+    """Streaming step counter for a single funnel"""
+
+    def __init__(self, funnel, open_sessions=None):
+        self.funnel = funnel
+        self.counts = defaultdict(lambda: [0] * len(funnel.steps))
+        self.open_sessions = dict(open_sessions or {})
+        self.last_event_id = 0
+        self.max_timestamp = 0
+        self.events_read = 0
+
+        self._session_id = None
+        self._state = None
+
+    def feed(self, event_id, session_id, timestamp, event, app_version, params):
+        """Consume one event; events must arrive ordered by (session_id, timestamp)"""
+        if session_id != self._session_id:
+            self._close_session()
+            self._session_id = session_id
+            self._state = self.open_sessions.pop(session_id, None)
+
+        self.events_read += 1
+        self.last_event_id = max(self.last_event_id, event_id)
+        self.max_timestamp = max(self.max_timestamp, timestamp)
+
+        steps = self.funnel.steps
+        state = self._state
+
+        if state is None:
+            if event == steps[0]:
+                day = datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc).date()
+                state = {
+                    'step': 0,
+                    'day': day.isoformat(),
+                    'app_version': app_version or '',
+                    'banner_id': get_banner_id(params),
+                }
+                self._advance(state)
+            else:
+                return
+        elif event in self.funnel.reset_on:
+            state = None
+        elif event == steps[state['step']]:
+            self._advance(state)
+
+        if state is not None:
+            if state['step'] >= len(steps):
+                state = None
+            else:
+                state['last_ts'] = timestamp
+        self._state = state
+
+    def finish(self):
+        """Flush the last session; returns the accumulated counts"""
+        self._close_session()
+        self._session_id = None
+
+        # Keep checkpoints bounded: forget attempts nobody has touched for a day
+        cutoff = self.max_timestamp - OPEN_ATTEMPT_TTL_MS
+        self.open_sessions = {
+            session_id: state for session_id, state in self.open_sessions.items()
+            if state.get('last_ts', 0) >= cutoff
+        }
+        return self.counts
+
+    def _advance(self, state):
+        key = (state['day'], state['app_version'], state['banner_id'])
+        self.counts[key][state['step']] += 1
+        state['step'] += 1
+
+    def _close_session(self):
+        if self._session_id is not None and self._state is not None:
+            self.open_sessions[self._session_id] = self._state
+        self._state = None
+
+
+def iter_funnel_events(funnel, after_id=0, until_id=None, since=None, until=None):
+    """Stream (id, session_id, timestamp, event, app_version, params) rows for a funnel"""
+    queryset = AnalyticsEvent.objects.with_events(funnel.events).filter(id__gt=after_id)
+    if until_id is not None:
+        queryset = queryset.filter(id__lte=until_id)
+    if since is not None:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until is not None:
+        queryset = queryset.filter(timestamp__lt=until)
+
+    rows = queryset.order_by('session_id', 'timestamp', 'id').values_list(
+        'id', 'session_id', 'timestamp', 'event_code', 'event', 'version_id', 'params'
+    ).iterator(chunk_size=5000)
+
+    versions = {None: ''}
+    for event_id, session_id, timestamp, event_code, event, version_id, params in rows:
+        if version_id not in versions:
+            versions.update(intern_cache.values_for([version_id]))
+        event_name = AnalyticsEvent.EVENT_NAMES.get(event_code, event)
+        yield event_id, session_id, timestamp, event_name, versions.get(version_id, ''), params
+
+
+def save_counts(funnel, counts):
+    """Add step counts to the stored FunnelStepCount rows"""
+    for (day, app_version, banner_id), step_counts in counts.items():
+        for step_index, count in enumerate(step_counts):
+            if not count:
+                continue
+            lookup = {
+                'funnel': funnel.name,
+                'day': day,
+                'app_version': app_version,
+                'banner_id': banner_id,
+                'step_index': step_index,
+            }
+            updated = FunnelStepCount.objects.filter(**lookup).update(count=F('count') + count)
+            if not updated:
+                FunnelStepCount.objects.create(step=funnel.steps[step_index], count=count, **lookup)
+
+
+def compute_funnel(funnel, incremental=True, since=None, until=None):
+    """
+    Compute step counts for a funnel.
+
+    Incremental runs resume from the funnel's checkpoint and only read events
+    inserted since, up to AnalyticsEvent.objects.settled_id(). Full runs
+    recompute the [since, until) day range from scratch. A full run over all
+    days also replaces the checkpoint. A ranged one only reads events up to
+    the checkpoint, since the next incremental run adds the ones after it, so
+    it raises ValueError while the funnel has no checkpoint yet.
+    """
+    checkpoint, _ = FunnelCheckpoint.objects.get_or_create(funnel=funnel.name)
+    if not incremental and (since or until) and not checkpoint.last_event_id:
+        # Nothing would be read, and the range's counts would just be deleted
+        raise ValueError(
+            f"Funnel {funnel.name} has no checkpoint yet; run it incrementally or with --full "
+            "over all days before rebuilding a date range"
+        )
+    if incremental:
+        until_id = AnalyticsEvent.objects.settled_id()
+
+        engine = FunnelEngine(funnel, open_sessions=checkpoint.open_sessions)
+        for row in iter_funnel_events(funnel, after_id=checkpoint.last_event_id, until_id=until_id):
+            engine.feed(*row)
+        counts = engine.finish()
+
+        with transaction.atomic(using=analytics_database()):
+            save_counts(funnel, counts)
+            checkpoint.last_event_id = max(checkpoint.last_event_id, until_id)
+            checkpoint.open_sessions = engine.open_sessions
+            checkpoint.save(update_fields=['last_event_id', 'open_sessions', 'updated_at'])
+    else:
+        since_ms = int(datetime.combine(since, datetime.min.time(), tzinfo=dt_timezone.utc).timestamp() * 1000) if since else None
+        until_ms = int(datetime.combine(until, datetime.min.time(), tzinfo=dt_timezone.utc).timestamp() * 1000) if until else None
+
+        whole_range = since is None and until is None
+        if whole_range:
+            until_id = AnalyticsEvent.objects.settled_id()
+        else:
+            until_id = checkpoint.last_event_id
+
+        engine = FunnelEngine(funnel)
+        for row in iter_funnel_events(funnel, until_id=until_id, since=since_ms, until=until_ms):
+            engine.feed(*row)
+        counts = engine.finish()
+
+        with transaction.atomic(using=analytics_database()):
+            stale = FunnelStepCount.objects.filter(funnel=funnel.name)
+            if since:
+                stale = stale.filter(day__gte=since)
+            if until:
+                stale = stale.filter(day__lt=until)
+            stale.delete()
+            save_counts(funnel, counts)
+            if whole_range:
+                checkpoint.last_event_id = until_id
+                checkpoint.open_sessions = engine.open_sessions
+                checkpoint.save(update_fields=['last_event_id', 'open_sessions', 'updated_at'])
+
+    logger.info(f"Funnel {funnel.name}: read {engine.events_read} events, {len(counts)} groups, {len(engine.open_sessions)} open attempts")
+    return engine
+
+
+def conversion_report(funnel, start_day=None, end_day=None, group_by=('day',)):
+    """
+    Step-by-step conversion grouped by any of 'day', 'app_version' and 'banner_id'.
+
+    Returns a list of rows with the grouping values, per-step counts, the
+    conversion from the previous step and the overall conversion from step one.
+    """
+    queryset = FunnelStepCount.objects.filter(funnel=funnel.name)
+    if start_day:
+        queryset = queryset.filter(day__gte=start_day)
+    if end_day:
+        queryset = queryset.filter(day__lte=end_day)
+
+    groups = defaultdict(lambda: [0] * len(funnel.steps))
+    for row in queryset.values(*group_by, 'step_index', 'count'):
+        key = tuple(row[field] for field in group_by)
+        groups[key][row['step_index']] += row['count']
+
+    report = []
+    for key in sorted(groups, key=lambda k: tuple(str(v) for v in k)):
+        step_counts = groups[key]
+        steps = []
+        for index, step in enumerate(funnel.steps):
+            count = step_counts[index]
+            previous = step_counts[index - 1] if index else count
+            steps.append({
+                'step': step,
+                'count': count,
+                'conversion': round(count / previous, 4) if previous else 0.0,
+                'overall': round(count / step_counts[0], 4) if step_counts[0] else 0.0,
+            })
+        entry = {field: (value.isoformat() if hasattr(value, 'isoformat') else value)
+                 for field, value in zip(group_by, key)}
+        entry['steps'] = steps
+        report.append(entry)
+
+    return report
@@ -0,0 +1,107 @@
+"""
+Per-process cache of InternedString ids for user agents and app versions
+"""
+from collections import OrderedDict
+import hashlib
+import ipaddress
+import threading
+
+from .models import InternedString
+
+
+def digest_for(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def pack_ip(ip_address):
+    """Return the 4/16 byte form of an IP address, or None if it is not valid"""
+    if not ip_address:
+        return None
+    try:
+        return ipaddress.ip_address(ip_address).packed
+    except ValueError:
+        return None
+
+
+class InternCache:
+    """Bounded LRU of (kind, value) <-> id mappings backed by InternedString"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, kind, value, pk):
+        self._ids[(kind, value)] = pk
+        self._ids.move_to_end((kind, value))
+        self._values[pk] = value
+        self._values.move_to_end(pk)
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+        while len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+
+    def ids_for(self, kind, values):
+        """Map values to InternedString ids, creating missing rows in bulk"""
+        result = {}
+        missing = set()
+        with self._lock:
+            for value in values:
+                pk = self._ids.get((kind, value))
+                if pk is None:
+                    missing.add(value)
+                else:
+                    self._ids.move_to_end((kind, value))
+                    result[value] = pk
+
+        if missing:
+            digests = {digest_for(value): value for value in missing}
+            InternedString.objects.bulk_create(
+                [InternedString(kind=kind, value=value, digest=digest) for digest, value in digests.items()],
+                ignore_conflicts=True
+            )
+            rows = InternedString.objects.filter(kind=kind, digest__in=list(digests)).values_list('id', 'digest')
+            with self._lock:
+                for pk, digest in rows:
+                    value = digests[digest]
+                    result[value] = pk
+                    self._remember(kind, value, pk)
+
+        return result
+
+    def id_for(self, kind, value):
+        if not value:
+            return None
+        return self.ids_for(kind, [value])[value]
+
+    def values_for(self, ids):
+        """Map InternedString ids back to their values"""
+        result = {}
+        missing = set()
+        with self._lock:
+            for pk in ids:
+                if pk is None:
+                    continue
+                value = self._values.get(pk)
+                if value is None:
+                    missing.add(pk)
+                else:
+                    result[pk] = value
+
+        if missing:
+            rows = InternedString.objects.filter(id__in=missing).values_list('id', 'kind', 'value')
+            with self._lock:
+                for pk, kind, value in rows:
+                    result[pk] = value
+                    self._remember(kind, value, pk)
+
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._values.clear()
+
+
+intern_cache = InternCache()
@@ -0,0 +1,237 @@
+"""
+Live ingest counters for the ops dashboard
+
+Each worker counts events per minute, purchases and active sessions in memory
+(one lock acquisition per ingested batch) and flushes them to the shared cache
+every ANALYTICS_LIVE_FLUSH_SECONDS: on the next batch, or from a timer that
+the first unflushed batch starts, so a worker that goes idle still publishes
+what it holds. Counts are merged across workers with
+atomic cache increments; active sessions are HyperLogLog sketches, merged
+under a short cache lock and simply kept for the next flush when the lock is
+busy, since merging a sketch twice changes nothing.
+"""
+from collections import Counter, defaultdict
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import BaseRenderer
+
+from .models import AnalyticsEvent
+from .sketches import HyperLogLog
+
+logger = logging.getLogger('analytics')
+
+KEY_PREFIX = 'analytics:live'
+OTHER_BUCKET = 'other'
+PURCHASE_EVENT = 'purchase_success'
+
+# Minutes of live data kept in the cache
+RETENTION_SECONDS = 2 * 60 * 60
+
+# Sessions seen within this many minutes count as active
+ACTIVE_SESSION_MINUTES = 5
+
+# Sketches are only needed for a rough live count
+SESSION_SKETCH_PRECISION = 10
+
+
+def current_minute(now=None):
+    return int((now if now is not None else time.time()) // 60)
+
+
+def event_key(minute, name):
+    return f"{KEY_PREFIX}:{minute}:event:{name}"
+
+
+def purchases_key(minute):
+    return f"{KEY_PREFIX}:{minute}:purchases"
+
+
+def sessions_key(minute):
+    return f"{KEY_PREFIX}:{minute}:sessions"
+
+
+def add_count(key, count):
+    """Atomically add to a shared counter, creating it on first use"""
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        if not cache.add(key, count, RETENTION_SECONDS):
+            cache.incr(key, count)
+
+
+class LiveCounters:
+    """Per-process counters, flushed to the shared cache"""
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'ANALYTICS_LIVE_FLUSH_SECONDS', 5
+        )
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._reset()
+        self._last_flush = time.monotonic()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's timer thread does not exist in the child
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def _reset(self):
+        self._events = defaultdict(Counter)  # minute -> event name -> count
+        self._purchases = Counter()  # minute -> count
+        self._sessions = {}  # minute -> set of session ids
+
+    def record(self, event_names, session_ids, now=None):
+        """Count one ingested batch"""
+        minute = current_minute(now)
+        names = Counter(
+            name if name in AnalyticsEvent.EVENT_CODES else OTHER_BUCKET for name in event_names
+        )
+        with self._lock:
+            self._events[minute].update(names)
+            if names[PURCHASE_EVENT]:
+                self._purchases[minute] += names[PURCHASE_EVENT]
+            self._sessions.setdefault(minute, set()).update(session_ids)
+            self._start_timer()
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _start_timer(self):
+        # Called with self._lock held
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_pending(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+        with self._lock:
+            # Counts kept back by a failed flush (or recorded meanwhile) get another timer
+            if self._events or self._purchases or self._sessions:
+                self._start_timer()
+
+    def flush(self):
+        """Push pending counts to the cache; failures keep them for the next try"""
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            with self._lock:
+                events, purchases, sessions = self._events, self._purchases, self._sessions
+                self._reset()
+
+            try:
+                # Entries are removed once written so a failure only retries the rest
+                for minute, names in events.items():
+                    for name in list(names):
+                        add_count(event_key(minute, name), names.pop(name))
+                for minute in list(purchases):
+                    add_count(purchases_key(minute), purchases.pop(minute))
+            except Exception as e:
+                logger.warning(f"Live counter flush failed: {e}")
+                self._restore(events, purchases, {})
+
+            pending_sessions = {}
+            for minute, session_ids in sessions.items():
+                if not self._merge_sessions(minute, session_ids):
+                    pending_sessions[minute] = session_ids
+            if pending_sessions:
+                self._restore({}, Counter(), pending_sessions)
+        finally:
+            self._flush_lock.release()
+
+    def _merge_sessions(self, minute, session_ids):
+        lock_key = f"{sessions_key(minute)}:lock"
+        try:
+            if not cache.add(lock_key, self.worker_id, 5):
+                return False
+            try:
+                stored = cache.get(sessions_key(minute))
+                sketch = HyperLogLog.from_bytes(stored) if stored else HyperLogLog(SESSION_SKETCH_PRECISION)
+                for session_id in session_ids:
+                    sketch.add(session_id)
+                cache.set(sessions_key(minute), sketch.to_bytes(), RETENTION_SECONDS)
+            finally:
+                cache.delete(lock_key)
+            return True
+        except Exception as e:
+            logger.warning(f"Live session flush failed: {e}")
+            return False
+
+    def _restore(self, events, purchases, sessions):
+        # Skip minutes that are too old to be worth retrying
+        oldest = current_minute() - RETENTION_SECONDS // 60
+        with self._lock:
+            for minute, names in events.items():
+                if minute >= oldest and names:
+                    self._events[minute].update(names)
+            for minute, count in purchases.items():
+                if minute >= oldest and count:
+                    self._purchases[minute] += count
+            for minute, session_ids in sessions.items():
+                if minute >= oldest:
+                    self._sessions.setdefault(minute, set()).update(session_ids)
+
+
+live_counters = LiveCounters()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets `Accept: text/event-stream` (sent by EventSource) pass content negotiation"""
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def live_snapshot(minutes=15, now=None):
+    """Merged counts for the last `minutes` minutes across all workers"""
+    last = current_minute(now)
+    window = range(last - minutes + 1, last + 1)
+    names = list(AnalyticsEvent.EVENT_CODES) + [OTHER_BUCKET]
+
+    keys = []
+    for minute in window:
+        keys.extend(event_key(minute, name) for name in names)
+        keys.append(purchases_key(minute))
+        keys.append(sessions_key(minute))
+    values = cache.get_many(keys)
+
+    rows = []
+    active = HyperLogLog(SESSION_SKETCH_PRECISION)
+    for minute in window:
+        counts = {
+            name: values[event_key(minute, name)] for name in names if values.get(event_key(minute, name))
+        }
+        rows.append({
+            'minute': time.strftime('%Y-%m-%dT%H:%M:00Z', time.gmtime(minute * 60)),
+            'events': counts,
+            'total': sum(counts.values()),
+            'purchases': values.get(purchases_key(minute), 0),
+        })
+        sessions = values.get(sessions_key(minute))
+        if sessions and minute > last - ACTIVE_SESSION_MINUTES:
+            active.merge(HyperLogLog.from_bytes(sessions))
+
+    return {
+        'generated_at': int(time.time() * 1000),
+        'active_sessions': active.count(),
+        'minutes': rows,
+    }
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.retention import archive_events
+
+
+class Command(BaseCommand):
+    help = 'Archive old analytics events to NDJSON.gz files and delete them in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ANALYTICS_RETENTION_DAYS,
+                            help='Archive events older than this many days')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Events read per chunk')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Events deleted per statement')
+        parser.add_argument('--archive-dir', help='Override ANALYTICS_ARCHIVE_DIR')
+        parser.add_argument('--dry-run', action='store_true', help='Write and verify archives without deleting rows')
+
+    def handle(self, *args, **options):
+        stats = archive_events(
+            older_than_days=options['days'],
+            chunk_size=options['chunk_size'],
+            delete_batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            archive_dir=options['archive_dir'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {stats['archived']} events into {stats['files']} files, deleted {stats['deleted']}"
+        ))
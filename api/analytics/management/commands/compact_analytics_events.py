@@ -0,0 +1,91 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.interning import intern_cache, pack_ip
+from analytics.models import AnalyticsEvent, SessionMetrics, InternedString
+from config.routers import analytics_database
+
+
+class Command(BaseCommand):
+    help = 'Backfill the compact analytics event layout in id-ordered chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Events per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks')
+        parser.add_argument('--limit', type=int, help='Stop after this many events')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        total = 0
+
+        while True:
+            events = list(
+                AnalyticsEvent.objects.filter(id__gt=last_id, event_code__isnull=True).order_by('id').only(
+                    'id', 'event', 'session_id', 'legacy_install_id', 'legacy_app_version',
+                    'legacy_user_props', 'legacy_ip_address', 'legacy_user_agent'
+                )[:chunk_size]
+            )
+            if not events:
+                break
+
+            with transaction.atomic(using=analytics_database()):
+                self.compact_chunk(events)
+
+            last_id = events[-1].id
+            total += len(events)
+            self.stdout.write(f"Compacted {total} events (last id {last_id})")
+
+            if options['limit'] and total >= options['limit']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} events compacted"))
+
+    def compact_chunk(self, events):
+        agent_ids = intern_cache.ids_for(InternedString.USER_AGENT, {e.legacy_user_agent for e in events if e.legacy_user_agent})
+        version_ids = intern_cache.ids_for(InternedString.APP_VERSION, {e.legacy_app_version for e in events if e.legacy_app_version})
+
+        # Latest props per session, moved to SessionMetrics once. Events of a
+        # session without a SessionMetrics row keep them in the legacy columns.
+        sessions = SessionMetrics.objects.in_bulk(
+            {event.session_id for event in events}, field_name='session_id'
+        )
+        session_context = {}
+        for event in events:
+            event_code = AnalyticsEvent.code_for(event.event)
+            if event_code != AnalyticsEvent.OTHER_EVENT:
+                event.event = ''
+            event.event_code = event_code
+            event.agent_id = agent_ids.get(event.legacy_user_agent)
+            event.version_id = version_ids.get(event.legacy_app_version)
+            event.ip_packed = pack_ip(event.legacy_ip_address)
+
+            if event.session_id in sessions:
+                session_context[event.session_id] = (event.legacy_install_id, event.legacy_app_version, event.legacy_user_props)
+                event.legacy_install_id = ''
+                event.legacy_user_props = {}
+
+            event.legacy_app_version = ''
+            event.legacy_ip_address = None
+            event.legacy_user_agent = ''
+
+        AnalyticsEvent.objects.bulk_update(events, [
+            'event_code', 'event', 'agent', 'version', 'ip_packed',
+            'legacy_install_id', 'legacy_app_version', 'legacy_user_props',
+            'legacy_ip_address', 'legacy_user_agent',
+        ], batch_size=500)
+
+        updated = []
+        for session_id, (install_id, app_version, user_props) in session_context.items():
+            session = sessions[session_id]
+            if session.install_id:
+                continue
+            session.install_id = install_id
+            session.app_version = app_version
+            session.user_props = user_props or {}
+            updated.append(session)
+        SessionMetrics.objects.bulk_update(updated, ['install_id', 'app_version', 'user_props'], batch_size=500)
@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.funnels import FUNNELS, compute_funnel, conversion_report
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Compute paywall/purchase conversion funnels from analytics events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--funnel', action='append', choices=sorted(FUNNELS),
+                            help='Funnel to compute (default: all)')
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute the date range from scratch (up to the checkpoint when --since/--until are given)')
+        parser.add_argument('--since', type=parse_day, help='First day (YYYY-MM-DD) for --full runs and the report')
+        parser.add_argument('--until', type=parse_day, help='Day (YYYY-MM-DD) after the last one for --full runs and the report')
+        parser.add_argument('--group-by', default='day',
+                            help="Comma separated report dimensions: day, app_version, banner_id")
+        parser.add_argument('--report', action='store_true', help='Print the conversion report as JSON')
+
+    def handle(self, *args, **options):
+        group_by = tuple(field.strip() for field in options['group_by'].split(',') if field.strip())
+        for field in group_by:
+            if field not in ('day', 'app_version', 'banner_id'):
+                raise CommandError(f"Unknown dimension '{field}'")
+
+        for name in options['funnel'] or sorted(FUNNELS):
+            funnel = FUNNELS[name]
+            try:
+                engine = compute_funnel(
+                    funnel,
+                    incremental=not options['full'],
+                    since=options['since'],
+                    until=options['until'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"{name}: {engine.events_read} events read, {len(engine.open_sessions)} attempts in progress")
+
+            if options['report']:
+                end_day = None
+                if options['until']:
+                    end_day = options['until'].fromordinal(options['until'].toordinal() - 1)
+                report = conversion_report(funnel, options['since'], end_day, group_by)
+                self.stdout.write(json.dumps({'funnel': name, 'rows': report}, indent=2))
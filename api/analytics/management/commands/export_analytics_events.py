@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.export import EXPORT_FORMATS, export_stream, parse_time
+
+
+class Command(BaseCommand):
+    help = 'Export analytics events for a time range to an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write')
+        parser.add_argument('--start', help='Start (epoch ms, YYYY-MM-DD or ISO datetime), inclusive')
+        parser.add_argument('--end', help='End (epoch ms, YYYY-MM-DD or ISO datetime), exclusive')
+        parser.add_argument('--event', action='append', default=[], help='Only export this event (repeatable)')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_time(options['start'])
+            end = parse_time(options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        written = 0
+        with open(options['output'], 'wb') as fh:
+            for chunk in export_stream(start, end, options['event'], options['format'], options['gzip']):
+                fh.write(chunk)
+                written += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
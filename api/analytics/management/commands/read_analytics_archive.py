@@ -0,0 +1,27 @@
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.retention import iter_archived_events
+
+
+def parse_day(value):
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD")
+    return int(day.timestamp() * 1000)
+
+
+class Command(BaseCommand):
+    help = 'Stream archived analytics events as NDJSON for reprocessing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_day, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--until', type=parse_day, help='Day after the last one (YYYY-MM-DD)')
+        parser.add_argument('--archive-dir', help='Override ANALYTICS_ARCHIVE_DIR')
+
+    def handle(self, *args, **options):
+        for record in iter_archived_events(options['since'], options['until'], options['archive_dir']):
+            self.stdout.write(json.dumps(record, separators=(',', ':')))
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from analytics.management.commands.compute_funnels import parse_day
+from analytics.sketches import rollup_active_users, active_summary, retention
+
+
+class Command(BaseCommand):
+    help = 'Fold new analytics events into the per-day active install/user sketches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report', type=parse_day, metavar='YYYY-MM-DD',
+                            help='Print DAU/WAU/MAU ending on this day as JSON')
+        parser.add_argument('--dimension', default='all', choices=['all', 'sign', 'premium', 'app_version'],
+                            help='Slice for --report (default: all)')
+        parser.add_argument('--cohort', type=parse_day, metavar='YYYY-MM-DD',
+                            help='Print day 1/7/30 install retention for this cohort day as JSON')
+
+    def handle(self, *args, **options):
+        events_read = rollup_active_users()
+        self.stdout.write(f"{events_read} events folded into active user sketches")
+
+        if options['report']:
+            report = {
+                kind: active_summary(options['report'], kind, options['dimension'])
+                for kind in ('install', 'user')
+            }
+            self.stdout.write(json.dumps({'date': options['report'].isoformat(), 'actives': report}, indent=2))
+
+        if options['cohort']:
+            self.stdout.write(json.dumps(retention(options['cohort']), indent=2))
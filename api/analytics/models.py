@@ -1,9 +1,63 @@
+from datetime import timedelta
+import ipaddress
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class InternedString(models.Model):
+    """Lookup table for long, highly repeated event attributes (user agents, app versions)"""
+
+    USER_AGENT = 1
+    APP_VERSION = 2
+
+    KINDS = [
+        (USER_AGENT, 'User Agent'),
+        (APP_VERSION, 'App Version'),
+    ]
+
+    kind = models.PositiveSmallIntegerField(choices=KINDS)
+    value = models.TextField()
+    digest = models.CharField(max_length=40)  # sha1 of value, keeps the unique index small
+
+    class Meta:
+        unique_together = ['kind', 'digest']
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.value[:50]}"
+
+
+class AnalyticsEventQuerySet(models.QuerySet):
+
+    def with_events(self, names):
+        """Filter by event names, using the small-integer codes where possible"""
+        codes = [AnalyticsEvent.EVENT_CODES[name] for name in names if name in AnalyticsEvent.EVENT_CODES]
+        others = [name for name in names if name not in AnalyticsEvent.EVENT_CODES]
+
+        condition = models.Q(event_code__in=codes)
+        if others:
+            condition |= models.Q(event_code=AnalyticsEvent.OTHER_EVENT, event__in=others)
+        return self.filter(condition)
+
+    def settled_id(self, now=None):
+        """
+        Id that incremental readers can safely stop at (0 when there is none).
+
+        Ids are handed out on insert but become visible on commit, so a batch
+        still in flight can hold lower ids than rows already visible. Stopping
+        at the newest row older than ANALYTICS_SETTLE_SECONDS leaves such
+        batches for the next run instead of skipping them for good.
+        """
+        now = now or timezone.now()
+        cutoff = now - timedelta(seconds=getattr(settings, 'ANALYTICS_SETTLE_SECONDS', 60))
+        settled = self.filter(created_at__lt=cutoff).order_by('-created_at', '-id').values_list('id', flat=True)
+        return settled.first() or 0
+
+
 class AnalyticsEvent(models.Model):
     """Model for storing analytics events"""
 
@@ -24,45 +78,96 @@ class AnalyticsEvent(models.Model):
         ('app_opened', 'App Opened'),
         ('session_start', 'Session Start'),
         ('session_end', 'Session End'),
+        ('onboarding_step_viewed', 'Onboarding Step Viewed'),
+        ('auth_completed', 'Auth Completed'),
+        ('horoscope_loaded', 'Horoscope Loaded'),
+        ('compat_viewed', 'Compatibility Viewed'),
+        ('druid_viewed', 'Druid Viewed'),
+        ('chinese_viewed', 'Chinese Viewed'),
+        ('push_opened', 'Push Opened'),
+        ('api_error', 'API Error'),
+        ('screen_time_ms', 'Screen Time'),
+        ('ab_exposed', 'A/B Exposed'),
+    ]
+
+    # Stored event codes follow EVENT_TYPES order: only append, never reorder or remove.
+    OTHER_EVENT = 0  # event outside the catalog, name kept in `event`
+    EVENT_CODES = {name: code for code, (name, _) in enumerate(EVENT_TYPES, start=1)}
+    EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+    EVENT_CODE_CHOICES = [(OTHER_EVENT, 'Other')] + [
+        (code, label) for code, (_, label) in enumerate(EVENT_TYPES, start=1)
     ]
 
     # Event identification
-    event = models.CharField(max_length=50, choices=EVENT_TYPES)
+    event_id = models.CharField(max_length=64, unique=True, null=True, blank=True)  # Client-generated idempotency key
+    event_code = models.PositiveSmallIntegerField(choices=EVENT_CODE_CHOICES, null=True)  # null until backfilled
+    event = models.CharField(max_length=50, blank=True)  # only for events outside the catalog
     timestamp = models.BigIntegerField()  # Unix timestamp in milliseconds
     session_id = models.CharField(max_length=100)
-    install_id = models.CharField(max_length=100)
-    app_version = models.CharField(max_length=20)
+    version = models.ForeignKey(InternedString, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
 
-    # User context
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    user_props = models.JSONField(default=dict)  # user properties like sign, is_premium
+    # User context (user_props and install_id live on SessionMetrics). Users may
+    # live in another database, so there is no FK constraint; rows are removed
+    # with the user by analytics.signals.delete_user_analytics
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
 
     # Event parameters
     params = models.JSONField(default=dict)
 
     # Request metadata
-    ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
+    ip_packed = models.BinaryField(max_length=16, null=True, blank=True)  # 4 or 16 bytes
+    agent = models.ForeignKey(InternedString, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+
+    # Legacy row layout, emptied by the compact_analytics_events command.
+    # Drop these columns once every environment has been backfilled.
+    legacy_install_id = models.CharField(max_length=100, blank=True, db_column='install_id')
+    legacy_app_version = models.CharField(max_length=20, blank=True, db_column='app_version')
+    legacy_user_props = models.JSONField(default=dict, blank=True, db_column='user_props')
+    legacy_ip_address = models.GenericIPAddressField(null=True, blank=True, db_column='ip_address')
+    legacy_user_agent = models.TextField(blank=True, db_column='user_agent')
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = AnalyticsEventQuerySet.as_manager()
+
     class Meta:
         indexes = [
-            models.Index(fields=['event', 'timestamp']),
+            models.Index(fields=['event_code', 'timestamp']),
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['user', 'timestamp']),
-            models.Index(fields=['session_id']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['session_id', 'timestamp']),
+            models.Index(fields=['created_at', 'id']),
+            # Admin changelist filters, ordered by -created_at
+            models.Index(fields=['event_code', 'created_at', 'id']),
+            models.Index(fields=['version', 'created_at', 'id']),
         ]
 
     def __str__(self):
-        return f"{self.event} - {self.session_id[:8]}... - {self.created_at}"
+        return f"{self.event_name} - {self.session_id[:8]}... - {self.created_at}"
+
+    @classmethod
+    def code_for(cls, name):
+        """Return the stored code for an event name"""
+        return cls.EVENT_CODES.get(name, cls.OTHER_EVENT)
+
+    @property
+    def event_name(self):
+        if self.event_code is None:
+            return self.event
+        return self.EVENT_NAMES.get(self.event_code, self.event)
+
+    @property
+    def ip_address(self):
+        if self.ip_packed:
+            return str(ipaddress.ip_address(bytes(self.ip_packed)))
+        return self.legacy_ip_address
 
 
 class SessionMetrics(models.Model):
     """Aggregated session metrics for analytics"""
 
     session_id = models.CharField(max_length=100, unique=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
 
     # Session timing
     start_time = models.DateTimeField()
@@ -81,7 +186,102 @@ class SessionMetrics(models.Model):
     purchase_attempts = models.IntegerField(default=0)
     successful_purchases = models.IntegerField(default=0)
 
+    # Session-level context, stored once instead of on every event
+    install_id = models.CharField(max_length=100, blank=True)
+    app_version = models.CharField(max_length=20, blank=True)
+    user_props = models.JSONField(default=dict, blank=True)  # user properties like sign, is_premium
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        verbose_name_plural = 'session metrics'
+        indexes = [
+            # Admin changelist ordering and its purchase/paywall filters
+            models.Index(fields=['start_time', 'id']),
+            models.Index(fields=['start_time', 'id'], condition=models.Q(successful_purchases__gt=0), name='session_purchased_idx'),
+            models.Index(fields=['start_time', 'id'], condition=models.Q(paywall_views__gt=0), name='session_paywall_idx'),
+        ]
+
+    def __str__(self):
+        return f"Session {self.session_id[:8]}... - {self.duration_seconds}s"
+
+
+class FunnelStepCount(models.Model):
+    """Number of funnel attempts that reached a step, per day/app version/banner"""
+
+    funnel = models.CharField(max_length=50)
+    day = models.DateField()
+    app_version = models.CharField(max_length=20)
+    banner_id = models.CharField(max_length=50, blank=True)  # '' when not banner-driven
+    step_index = models.PositiveSmallIntegerField()
+    step = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['funnel', 'day', 'app_version', 'banner_id', 'step_index']
+        indexes = [
+            models.Index(fields=['funnel', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.funnel} {self.day} {self.step}: {self.count}"
+
+
+class FunnelCheckpoint(models.Model):
+    """Resume point for incremental funnel computation"""
+
+    funnel = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    open_sessions = models.JSONField(default=dict)  # session_id -> in-progress attempt state
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.funnel} @ event {self.last_event_id}"
+
+
+class ActiveUsersSketch(models.Model):
+    """HyperLogLog registers of the installs/users active on one day, per slice"""
+
+    KIND_CHOICES = [
+        ('install', 'Install'),
+        ('user', 'User'),
+    ]
+
+    DIMENSION_CHOICES = [
+        ('all', 'All'),
+        ('sign', 'Sign'),
+        ('premium', 'Premium'),
+        ('app_version', 'App version'),
+    ]
+
+    day = models.DateField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=50, blank=True)  # '' for dimension 'all'
+    registers = models.BinaryField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['day', 'kind', 'dimension', 'value']
+        indexes = [
+            models.Index(fields=['kind', 'dimension', 'value', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.kind} {self.dimension}={self.value or '*'}"
+
+
+class RollupCheckpoint(models.Model):
+    """Last analytics event folded into a rollup"""
+
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"Session {self.session_id[:8]}... - {self.duration_seconds}s"
\ No newline at end of file
+        return f"{self.name} @ event {self.last_event_id}"
@@ -0,0 +1,116 @@
+"""
+Request parsers for analytics batches
+
+Both parsers accept `Content-Encoding: gzip` bodies, decompressed as they are
+read and capped at ANALYTICS_MAX_BATCH_BYTES of decoded data. JSON is decoded
+with orjson when it is installed; MessagePack needs the optional `msgpack`
+package and is decoded one event at a time.
+"""
+import gzip
+import json
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.parsers import BaseParser
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional binary encoding
+    msgpack = None
+
+READ_SIZE = 64 * 1024
+
+
+class BatchTooLarge(ParseError):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+def get_max_batch_bytes():
+    return getattr(settings, 'ANALYTICS_MAX_BATCH_BYTES', 5 * 1024 * 1024)
+
+
+class LimitedReader:
+    """File-like wrapper that refuses to read past `limit` bytes"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.consumed = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.limit + 1 - self.consumed
+        data = self.stream.read(min(size, self.limit + 1 - self.consumed))
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise BatchTooLarge(f"Analytics batch exceeds {self.limit} bytes")
+        return data
+
+
+def open_body(stream, parser_context):
+    """Readable, size-capped view of the request body, gunzipped if needed"""
+    request = (parser_context or {}).get('request')
+    encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower() if request is not None else ''
+    if encoding in ('', 'identity'):
+        return LimitedReader(stream, get_max_batch_bytes())
+    if encoding in ('gzip', 'x-gzip'):
+        return LimitedReader(gzip.GzipFile(fileobj=stream, mode='rb'), get_max_batch_bytes())
+    raise UnsupportedMediaType(f"Content-Encoding {encoding}")
+
+
+def read_all(reader):
+    chunks = []
+    try:
+        for chunk in iter(lambda: reader.read(READ_SIZE), b''):
+            chunks.append(chunk)
+    except (OSError, EOFError) as e:
+        raise ParseError(f"Invalid gzip body - {e}")
+    return b''.join(chunks)
+
+
+class AnalyticsJSONParser(BaseParser):
+    """JSON batches, optionally gzip-compressed"""
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_all(open_body(stream, parser_context))
+        try:
+            if orjson is not None:
+                return orjson.loads(body)
+            return json.loads(body)
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {e}")
+
+
+class AnalyticsMessagePackParser(BaseParser):
+    """MessagePack batches, optionally gzip-compressed"""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise UnsupportedMediaType(media_type or self.media_type)
+
+        reader = open_body(stream, parser_context)
+        unpacker = msgpack.Unpacker(reader, raw=False, max_buffer_size=get_max_batch_bytes())
+        try:
+            # Events are unpacked one at a time as the body is read
+            length = unpacker.read_array_header()
+            return [unpacker.unpack() for _ in range(length)]
+        except (ValueError, OSError, EOFError, msgpack.OutOfData) as e:
+            raise ParseError(f"MessagePack parse error - {e}")
+
+
+def analytics_parsers():
+    """Parser classes for the ingestion endpoint, binary formats only when installed"""
+    parsers = [AnalyticsJSONParser]
+    if msgpack is not None:
+        parsers.append(AnalyticsMessagePackParser)
+    return parsers
@@ -0,0 +1,145 @@
+"""
+Recent events per session, served from the shared cache
+
+Ingestion keeps the newest RECENT_EVENTS_LIMIT events of each session in a
+small cache entry so session summaries rarely touch AnalyticsEvent. A buffer
+started mid-session (cache eviction, deploy) is marked incomplete and is only
+trusted once it is full; otherwise lookups fall back to the
+(session_id, timestamp) index and re-seed the buffer from it.
+
+Buffers are updated read-modify-write, so two batches for one session can
+overwrite each other's entries. A separate counter per session is bumped
+atomically (cache.incr) for every event, and each buffer records the count it
+was built from. A buffer whose count lags the counter lost an update and is
+not trusted, whether complete or not.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .interning import digest_for
+from .models import AnalyticsEvent
+
+logger = logging.getLogger('analytics')
+
+RECENT_EVENTS_LIMIT = 20
+BUFFER_TTL_SECONDS = 24 * 60 * 60
+
+
+def buffer_key(session_id):
+    # Session ids are client supplied; hash them into a cache-safe key
+    return f"analytics:recent:{digest_for(session_id)}"
+
+
+def count_key(session_id):
+    return f"analytics:recent-count:{digest_for(session_id)}"
+
+
+def event_entry(analytics_event):
+    return {
+        'event': analytics_event.event_name,
+        'timestamp': analytics_event.timestamp,
+        'params': analytics_event.params,
+    }
+
+
+def newest(entries, limit=RECENT_EVENTS_LIMIT):
+    return sorted(entries, key=lambda entry: entry['timestamp'], reverse=True)[:limit]
+
+
+def remember_events(analytics_events, new_sessions=()):
+    """
+    Add freshly stored events to their sessions' buffers.
+
+    `new_sessions` are sessions whose first events are in this batch, so their
+    buffers start out complete. Buffers are read and written with one
+    get_many/set_many per batch, and each session's counter with one add and
+    one incr (there is no atomic batch increment; a batch usually holds a
+    single session). When concurrent batches for one session drop each
+    other's entries, the session counter no longer matches and the next
+    lookup falls back to the database.
+    """
+    by_session = {}
+    for analytics_event in analytics_events:
+        by_session.setdefault(analytics_event.session_id, []).append(event_entry(analytics_event))
+    if not by_session:
+        return
+
+    keys = {session_id: buffer_key(session_id) for session_id in by_session}
+    try:
+        stored = cache.get_many(list(keys.values()))
+        updated = {}
+        for session_id, entries in by_session.items():
+            buffer = stored.get(keys[session_id]) or {'complete': session_id in new_sessions, 'events': [], 'count': 0}
+            cache.add(count_key(session_id), 0, BUFFER_TTL_SECONDS)
+            cache.incr(count_key(session_id), len(entries))
+            updated[keys[session_id]] = {
+                'complete': buffer['complete'],
+                'events': newest(buffer['events'] + entries),
+                'count': (buffer.get('count') or 0) + len(entries),
+            }
+        cache.set_many(updated, BUFFER_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Failed to update recent event buffers: {e}")
+
+
+def recent_events(session_ids, limit=RECENT_EVENTS_LIMIT):
+    """Newest events for each session id, newest first, cache first"""
+    session_ids = list(dict.fromkeys(session_ids))
+    keys = {session_id: buffer_key(session_id) for session_id in session_ids}
+    count_keys = {session_id: count_key(session_id) for session_id in session_ids}
+    try:
+        stored = cache.get_many(list(keys.values()) + list(count_keys.values()))
+    except Exception as e:
+        logger.warning(f"Failed to read recent event buffers: {e}")
+        stored = {}
+
+    result = {}
+    missing = []
+    for session_id in session_ids:
+        buffer = stored.get(keys[session_id])
+        if (
+            buffer
+            and buffer.get('count') == stored.get(count_keys[session_id])
+            and (buffer['complete'] or len(buffer['events']) >= limit)
+        ):
+            result[session_id] = buffer['events'][:limit]
+        else:
+            missing.append(session_id)
+
+    if missing:
+        try:
+            # Counts taken before loading: events added meanwhile make the buffer stale, not wrong
+            for session_id in missing:
+                cache.add(count_keys[session_id], 0, BUFFER_TTL_SECONDS)
+            counts = cache.get_many([count_keys[session_id] for session_id in missing])
+        except Exception as e:
+            logger.warning(f"Failed to read recent event counters: {e}")
+            counts = {}
+
+        loaded = load_recent_events(missing, RECENT_EVENTS_LIMIT)
+        result.update({session_id: entries[:limit] for session_id, entries in loaded.items()})
+        try:
+            cache.set_many({
+                keys[session_id]: {'complete': True, 'events': entries, 'count': counts[count_keys[session_id]]}
+                for session_id, entries in loaded.items()
+                if count_keys[session_id] in counts
+            }, BUFFER_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Failed to seed recent event buffers: {e}")
+
+    return result
+
+
+def load_recent_events(session_ids, limit=RECENT_EVENTS_LIMIT):
+    """Newest `limit` events per session from the database in one query"""
+    ranked = AnalyticsEvent.objects.filter(session_id__in=session_ids).annotate(
+        recent_rank=Window(RowNumber(), partition_by=F('session_id'), order_by=F('timestamp').desc())
+    ).filter(recent_rank__lte=limit).only('session_id', 'event_code', 'event', 'timestamp', 'params')
+
+    result = {session_id: [] for session_id in session_ids}
+    for analytics_event in ranked:
+        result[analytics_event.session_id].append(event_entry(analytics_event))
+    return {session_id: newest(entries, limit) for session_id, entries in result.items()}
@@ -0,0 +1,83 @@
+"""
+Flat, JSON-ready records for analytics events (archives and exports)
+
+A record holds everything stored for the event. In the compact layout,
+install_id and user_props live on the event's SessionMetrics row, and are
+copied into the record from there.
+"""
+from itertools import islice
+import ipaddress
+
+from .interning import intern_cache
+from .models import AnalyticsEvent, SessionMetrics
+
+RECORD_FIELDS = [
+    'id', 'event_id', 'event', 'timestamp', 'session_id', 'user_id', 'install_id',
+    'app_version', 'params', 'user_props', 'ip_address', 'user_agent', 'created_at',
+]
+
+# Columns read from the table to build a record (compact and legacy layout)
+RECORD_COLUMNS = [
+    'id', 'event_id', 'event_code', 'event', 'timestamp', 'session_id', 'user_id',
+    'legacy_install_id', 'version_id', 'legacy_app_version', 'params', 'legacy_user_props',
+    'ip_packed', 'legacy_ip_address', 'agent_id', 'legacy_user_agent', 'created_at',
+]
+
+# Rows per SessionMetrics lookup, and sessions remembered between lookups
+SESSION_BATCH_SIZE = 1000
+MAX_CACHED_SESSIONS = 50000
+
+
+def iter_event_records(rows):
+    """Turn `values_list(*RECORD_COLUMNS)` rows into record dicts"""
+    rows = iter(rows)
+    sessions = {}
+    interned = {None: ''}
+    while True:
+        batch = list(islice(rows, SESSION_BATCH_SIZE))
+        if not batch:
+            return
+
+        missing = {row[5] for row in batch if row[5] not in sessions}
+        if missing:
+            if len(sessions) > MAX_CACHED_SESSIONS:
+                sessions.clear()
+            sessions.update({session_id: ('', {}) for session_id in missing})
+            sessions.update(
+                (session_id, (install_id, user_props))
+                for session_id, install_id, user_props in SessionMetrics.objects.filter(
+                    session_id__in=missing
+                ).values_list('session_id', 'install_id', 'user_props')
+            )
+        yield from build_records(batch, sessions, interned)
+
+
+def build_records(rows, sessions, interned):
+    for (pk, event_id, event_code, event, timestamp, session_id, user_id,
+         legacy_install_id, version_id, legacy_app_version, params, legacy_user_props,
+         ip_packed, legacy_ip_address, agent_id, legacy_user_agent, created_at) in rows:
+        missing = [key for key in (version_id, agent_id) if key not in interned]
+        if missing:
+            interned.update(intern_cache.values_for(missing))
+        session_install_id, session_user_props = sessions[session_id]
+
+        if ip_packed:
+            ip_address = str(ipaddress.ip_address(bytes(ip_packed)))
+        else:
+            ip_address = legacy_ip_address
+
+        yield {
+            'id': pk,
+            'event_id': event_id,
+            'event': AnalyticsEvent.EVENT_NAMES.get(event_code, event),
+            'timestamp': timestamp,
+            'session_id': session_id,
+            'user_id': user_id,
+            'install_id': legacy_install_id or session_install_id,
+            'app_version': interned.get(version_id) or legacy_app_version,
+            'params': params,
+            'user_props': legacy_user_props or session_user_props,
+            'ip_address': ip_address,
+            'user_agent': interned.get(agent_id) or legacy_user_agent,
+            'created_at': created_at.isoformat() if created_at else None,
+        }
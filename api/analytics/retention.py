@@ -0,0 +1,195 @@
+"""
+Retention for analytics events: cold archive to NDJSON.gz and bounded deletes
+
+Archives are partitioned by event day:
+
+    <ANALYTICS_ARCHIVE_DIR>/YYYY/MM/DD/events-<first_id>-<last_id>.ndjson.gz
+    <ANALYTICS_ARCHIVE_DIR>/YYYY/MM/DD/events-<first_id>-<last_id>.json  (manifest)
+
+Each line is a full record (analytics/records.py), including the install id
+and user properties kept on SessionMetrics for compacted rows. Rows are only
+deleted after their archive file has been re-read and checked against the
+manifest.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AnalyticsEvent
+from .records import RECORD_COLUMNS, iter_event_records
+
+logger = logging.getLogger('analytics')
+
+
+class ArchiveVerificationError(Exception):
+    """An archive file does not match the rows it was written from"""
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'ANALYTICS_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'analytics'))
+
+
+def event_day(timestamp):
+    return datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc).date()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_archive_file(archive_dir, day, records):
+    """Write records for one day to a gzip NDJSON file plus manifest"""
+    directory = archive_dir / f"{day:%Y}" / f"{day:%m}" / f"{day:%d}"
+    directory.mkdir(parents=True, exist_ok=True)
+
+    first_id, last_id = records[0]['id'], records[-1]['id']
+    path = directory / f"events-{first_id}-{last_id}.ndjson.gz"
+    tmp_path = path.with_suffix('.gz.tmp')
+
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as fh:
+        for record in records:
+            fh.write(json.dumps(record, separators=(',', ':'), default=str))
+            fh.write('\n')
+    os.replace(tmp_path, path)
+
+    manifest = {
+        'file': path.name,
+        'day': day.isoformat(),
+        'count': len(records),
+        'first_id': first_id,
+        'last_id': last_id,
+        'min_timestamp': min(record['timestamp'] for record in records),
+        'max_timestamp': max(record['timestamp'] for record in records),
+        'sha256': file_sha256(path),
+    }
+    with open(directory / f"events-{first_id}-{last_id}.json", 'w') as fh:
+        json.dump(manifest, fh)
+
+    return path, manifest
+
+
+def verify_archive_file(path, manifest, expected_ids):
+    """Re-read an archive and make sure it holds exactly the expected rows"""
+    if file_sha256(path) != manifest['sha256']:
+        raise ArchiveVerificationError(f"{path}: checksum mismatch")
+
+    ids = set()
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            ids.add(json.loads(line)['id'])
+
+    if len(ids) != manifest['count'] or ids != set(expected_ids):
+        raise ArchiveVerificationError(f"{path}: expected {len(expected_ids)} events, found {len(ids)}")
+
+
+def delete_in_batches(ids, batch_size):
+    """Delete rows by primary key in short transactions"""
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        deleted += AnalyticsEvent.objects.filter(id__in=batch).delete()[0]
+    return deleted
+
+
+def archive_events(older_than_days=None, chunk_size=20000, delete_batch_size=1000, dry_run=False, archive_dir=None):
+    """
+    Archive and delete events older than `older_than_days` (event time).
+
+    Events are read in (timestamp, id) keyset order, `chunk_size` rows at a time.
+    Each chunk is split by day, written, verified, and only then deleted in
+    batches of `delete_batch_size`. With `dry_run` the files are written and
+    verified but nothing is deleted.
+    """
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'ANALYTICS_RETENTION_DAYS', 90)
+    archive_dir = Path(archive_dir) if archive_dir else get_archive_dir()
+
+    cutoff = int((timezone.now() - timedelta(days=older_than_days)).timestamp() * 1000)
+    stats = {'archived': 0, 'deleted': 0, 'files': 0}
+    last = None
+
+    while True:
+        queryset = AnalyticsEvent.objects.filter(timestamp__lt=cutoff)
+        if last is not None:
+            queryset = queryset.filter(Q(timestamp__gt=last[0]) | Q(timestamp=last[0], id__gt=last[1]))
+        records = list(iter_event_records(
+            queryset.order_by('timestamp', 'id').values_list(*RECORD_COLUMNS)[:chunk_size]
+        ))
+        if not records:
+            break
+        last = (records[-1]['timestamp'], records[-1]['id'])
+
+        by_day = {}
+        for record in records:
+            by_day.setdefault(event_day(record['timestamp']), []).append(record)
+
+        for day, day_records in sorted(by_day.items()):
+            day_records.sort(key=lambda record: record['id'])
+            path, manifest = write_archive_file(archive_dir, day, day_records)
+            ids = [record['id'] for record in day_records]
+            verify_archive_file(path, manifest, ids)
+
+            stats['files'] += 1
+            stats['archived'] += len(ids)
+            if not dry_run:
+                stats['deleted'] += delete_in_batches(ids, delete_batch_size)
+
+        logger.info(f"Archived {stats['archived']} analytics events into {stats['files']} files")
+
+    return stats
+
+
+def iter_archived_events(start=None, end=None, archive_dir=None):
+    """
+    Stream archived event records with start <= timestamp < end (epoch ms).
+
+    Files are visited in day order and skipped using their manifests, so only
+    archives overlapping the range are decompressed.
+    """
+    archive_dir = Path(archive_dir) if archive_dir else get_archive_dir()
+    if not archive_dir.exists():
+        return
+
+    start_day = event_day(start) if start is not None else None
+    end_day = event_day(end) if end is not None else None
+
+    manifests = sorted(
+        archive_dir.glob('*/*/*/events-*.json'),
+        key=lambda path: (path.parent, int(path.stem.split('-')[1]))
+    )
+    for manifest_path in manifests:
+        year, month, day = manifest_path.parts[-4:-1]
+        day = datetime(int(year), int(month), int(day)).date()
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+        if start is not None and manifest['max_timestamp'] < start:
+            continue
+        if end is not None and manifest['min_timestamp'] >= end:
+            continue
+
+        with gzip.open(manifest_path.parent / manifest['file'], 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                record = json.loads(line)
+                if start is not None and record['timestamp'] < start:
+                    continue
+                if end is not None and record['timestamp'] >= end:
+                    continue
+                # Files written before these fields were archived
+                record.setdefault('install_id', '')
+                record.setdefault('user_props', {})
+                yield record
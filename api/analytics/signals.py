@@ -0,0 +1,15 @@
+"""
+Signal handlers for the analytics app
+"""
+from .models import AnalyticsEvent, SessionMetrics
+
+
+def delete_user_analytics(sender, instance, **kwargs):
+    """
+    Remove a deleted user's events and sessions.
+
+    Stands in for ON DELETE CASCADE, which the database cannot do when the
+    analytics tables live in their own database.
+    """
+    AnalyticsEvent.objects.filter(user_id=instance.pk).delete()
+    SessionMetrics.objects.filter(user_id=instance.pk).delete()
@@ -0,0 +1,225 @@
+"""
+HyperLogLog sketches for distinct active installs/users
+
+Sketches are built per day and slice by the rollup, stored in ActiveUsersSketch
+and merged on read, so any window (DAU/WAU/MAU or arbitrary ranges) costs a
+handful of register merges instead of COUNT(DISTINCT) over the events table.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
+import logging
+import math
+
+from django.db import transaction
+
+from .models import AnalyticsEvent, SessionMetrics, ActiveUsersSketch, RollupCheckpoint
+from config.routers import analytics_database
+
+logger = logging.getLogger('analytics')
+
+PRECISION = 12  # 4096 registers, ~1.6% standard error
+
+# Distinct sessions resolved against SessionMetrics per batch during rollup
+SESSION_BATCH_SIZE = 5000
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch with a 64-bit hash"""
+
+    def __init__(self, precision=PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError(f"Expected {self.size} registers, got {len(registers)}")
+            self.registers = bytearray(registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        remainder = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches with different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        return cls(precision=int(math.log2(len(data))), registers=data)
+
+
+def session_slices(user_props, app_version):
+    """The (dimension, value) slices a session is counted in"""
+    user_props = user_props if isinstance(user_props, dict) else {}
+    slices = [('all', '')]
+    if user_props.get('sign'):
+        slices.append(('sign', str(user_props['sign'])[:50]))
+    if 'is_premium' in user_props:
+        slices.append(('premium', 'true' if user_props['is_premium'] else 'false'))
+    if app_version:
+        slices.append(('app_version', app_version))
+    return slices
+
+
+class ActiveUsersRollup:
+    """Accumulates per-day sketches from (day, session_id, user_id) observations"""
+
+    def __init__(self):
+        self.sketches = defaultdict(HyperLogLog)  # (day, kind, dimension, value) -> sketch
+        self._pending = {}  # (day, session_id) -> user_id
+
+    def observe(self, day, session_id, user_id):
+        key = (day, session_id)
+        if self._pending.get(key) is None:
+            self._pending[key] = user_id
+        if len(self._pending) >= SESSION_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        session_ids = {session_id for _, session_id in self._pending}
+        sessions = {
+            row[0]: row[1:] for row in SessionMetrics.objects.filter(session_id__in=session_ids).values_list(
+                'session_id', 'install_id', 'app_version', 'user_props', 'user_id'
+            )
+        }
+        for (day, session_id), user_id in self._pending.items():
+            install_id, app_version, user_props, session_user_id = sessions.get(session_id, ('', '', {}, None))
+            user_id = user_id or session_user_id
+            for dimension, value in session_slices(user_props, app_version):
+                if install_id:
+                    self.sketches[(day, 'install', dimension, value)].add(install_id)
+                if user_id:
+                    self.sketches[(day, 'user', dimension, value)].add(user_id)
+        self._pending = {}
+
+    def save(self):
+        """Merge accumulated sketches into the stored per-day rows"""
+        self.flush()
+        days = {key[0] for key in self.sketches}
+        with transaction.atomic(using=analytics_database()):
+            stored = {
+                (row.day, row.kind, row.dimension, row.value): row
+                for row in ActiveUsersSketch.objects.select_for_update().filter(day__in=days)
+            }
+            to_create = []
+            for key, sketch in self.sketches.items():
+                row = stored.get(key)
+                if row is None:
+                    day, kind, dimension, value = key
+                    to_create.append(ActiveUsersSketch(
+                        day=day, kind=kind, dimension=dimension, value=value, registers=sketch.to_bytes()
+                    ))
+                else:
+                    row.registers = HyperLogLog.from_bytes(row.registers).merge(sketch).to_bytes()
+                    row.save(update_fields=['registers', 'updated_at'])
+            ActiveUsersSketch.objects.bulk_create(to_create)
+        return len(self.sketches)
+
+
+def rollup_active_users():
+    """
+    Add events inserted since the last run, up to
+    AnalyticsEvent.objects.settled_id(), to the per-day sketches.
+
+    Re-adding an install to a sketch is a no-op, so a run that fails before
+    its checkpoint is saved can simply be repeated.
+    """
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name='active_users')
+    until_id = AnalyticsEvent.objects.settled_id()
+
+    rollup = ActiveUsersRollup()
+    rows = AnalyticsEvent.objects.filter(
+        id__gt=checkpoint.last_event_id, id__lte=until_id
+    ).values_list('session_id', 'user_id', 'timestamp').iterator(chunk_size=5000)
+
+    events_read = 0
+    for session_id, user_id, timestamp in rows:
+        day = datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc).date()
+        rollup.observe(day, session_id, user_id)
+        events_read += 1
+
+    sketches = rollup.save()
+    checkpoint.last_event_id = max(checkpoint.last_event_id, until_id)
+    checkpoint.save(update_fields=['last_event_id', 'updated_at'])
+
+    logger.info(f"Active users rollup: read {events_read} events, updated {sketches} sketches")
+    return events_read
+
+
+def merged_sketch(start_day, end_day, kind='install', dimension='all', value=''):
+    """Union of the stored sketches for start_day..end_day (inclusive)"""
+    sketch = HyperLogLog()
+    rows = ActiveUsersSketch.objects.filter(
+        day__gte=start_day, day__lte=end_day, kind=kind, dimension=dimension, value=value
+    ).values_list('registers', flat=True)
+    for registers in rows:
+        sketch.merge(HyperLogLog.from_bytes(registers))
+    return sketch
+
+
+def count_active(start_day, end_day, kind='install', dimension='all', value=''):
+    return merged_sketch(start_day, end_day, kind, dimension, value).count()
+
+
+def active_summary(day, kind='install', dimension='all'):
+    """DAU/WAU/MAU ending on `day` for every value of a dimension"""
+    windows = {'dau': 1, 'wau': 7, 'mau': 30}
+    values = ActiveUsersSketch.objects.filter(
+        day__gte=day - timedelta(days=29), day__lte=day, kind=kind, dimension=dimension
+    ).values_list('value', flat=True).distinct()
+
+    summary = {}
+    for value in sorted(values):
+        summary[value] = {
+            name: count_active(day - timedelta(days=length - 1), day, kind, dimension, value)
+            for name, length in windows.items()
+        }
+    return summary
+
+
+def retention(cohort_day, offsets=(1, 7, 30), kind='install', dimension='all', value=''):
+    """
+    Day-N retention of the installs active on `cohort_day`.
+
+    The overlap of two days is estimated as |A| + |B| - |A u B| from their
+    sketches, so small cohorts carry the sketch's relative error.
+    """
+    cohort = merged_sketch(cohort_day, cohort_day, kind, dimension, value)
+    cohort_size = cohort.count()
+
+    result = {'cohort_day': cohort_day.isoformat(), 'cohort_size': cohort_size, 'retention': {}}
+    for offset in offsets:
+        later = merged_sketch(cohort_day + timedelta(days=offset), cohort_day + timedelta(days=offset), kind, dimension, value)
+        union = HyperLogLog(registers=cohort.registers).merge(later).count()
+        retained = max(0, min(cohort_size, cohort_size + later.count() - union))
+        result['retention'][f'day_{offset}'] = {
+            'retained': retained,
+            'rate': round(retained / cohort_size, 4) if cohort_size else 0.0,
+        }
+    return result
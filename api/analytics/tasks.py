@@ -0,0 +1,18 @@
+"""
+Background tasks (see jobs/registry.py)
+"""
+from jobs.registry import task
+
+from .funnels import FUNNELS, compute_funnel
+from .sketches import rollup_active_users
+
+
+@task('analytics.rollup_active_users', every=900)
+def rollup_active_user_sketches():
+    return rollup_active_users()
+
+
+@task('analytics.compute_funnels', every=900)
+def compute_funnels():
+    """Incremental run of every funnel; returns events read per funnel"""
+    return {name: compute_funnel(FUNNELS[name]).events_read for name in sorted(FUNNELS)}
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from analytics.interning import InternCache, intern_cache, pack_ip
+from analytics.models import AnalyticsEvent, InternedString, SessionMetrics
+
+
+class InternCacheTests(TestCase):
+    def setUp(self):
+        intern_cache.clear()
+        self.addCleanup(intern_cache.clear)
+
+    def test_values_are_stored_once_and_mapped_both_ways(self):
+        cache = InternCache()
+        ids = cache.ids_for(InternedString.APP_VERSION, ['1.0.0', '2.0.0'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.ids_for(InternedString.APP_VERSION, ['1.0.0']), {'1.0.0': ids['1.0.0']})
+        # Another process (empty cache) finds the same rows
+        self.assertEqual(InternCache().ids_for(InternedString.APP_VERSION, ['2.0.0', '1.0.0']), ids)
+        self.assertEqual(InternedString.objects.count(), 2)
+        self.assertEqual(InternCache().values_for([ids['1.0.0'], None]), {ids['1.0.0']: '1.0.0'})
+
+    def test_kinds_are_separate(self):
+        cache = InternCache()
+        agent = cache.id_for(InternedString.USER_AGENT, 'same')
+        version = cache.id_for(InternedString.APP_VERSION, 'same')
+
+        self.assertNotEqual(agent, version)
+        self.assertIsNone(cache.id_for(InternedString.USER_AGENT, ''))
+
+    def test_cache_is_bounded(self):
+        cache = InternCache(max_size=2)
+        cache.ids_for(InternedString.APP_VERSION, ['1', '2', '3'])
+
+        self.assertEqual(len(cache._ids), 2)
+        self.assertEqual(len(cache._values), 2)
+
+    def test_pack_ip(self):
+        self.assertEqual(pack_ip('10.0.0.1'), bytes([10, 0, 0, 1]))
+        self.assertEqual(len(pack_ip('2001:db8::1')), 16)
+        self.assertIsNone(pack_ip('unknown'))
+        self.assertIsNone(pack_ip(None))
+
+
+class CompactAnalyticsEventsTests(TestCase):
+    def setUp(self):
+        intern_cache.clear()
+        self.addCleanup(intern_cache.clear)
+
+    def legacy_event(self, session_id, event='screen_view', **fields):
+        return AnalyticsEvent.objects.create(
+            event=event, timestamp=1704067200000, session_id=session_id,
+            legacy_install_id='install-1', legacy_app_version='2.0.0', legacy_user_props={'sign': 'leo'},
+            legacy_ip_address='10.0.0.1', legacy_user_agent='Salamene/2.0', **fields,
+        )
+
+    def compact(self, *args):
+        call_command('compact_analytics_events', *args, stdout=StringIO())
+
+    def test_backfill_moves_values_to_the_compact_columns(self):
+        SessionMetrics.objects.create(session_id='s1', start_time=timezone.now())
+        known = self.legacy_event('s1')
+        custom = self.legacy_event('s1', event='made_up_event')
+
+        self.compact('--chunk-size', '1')
+
+        known.refresh_from_db()
+        self.assertEqual((known.event_code, known.event, known.event_name),
+                         (AnalyticsEvent.code_for('screen_view'), '', 'screen_view'))
+        self.assertEqual(intern_cache.values_for([known.agent_id, known.version_id]),
+                         {known.agent_id: 'Salamene/2.0', known.version_id: '2.0.0'})
+        self.assertEqual(known.ip_address, '10.0.0.1')
+        self.assertEqual((known.legacy_install_id, known.legacy_user_props, known.legacy_user_agent), ('', {}, ''))
+        custom.refresh_from_db()
+        self.assertEqual((custom.event_code, custom.event_name), (AnalyticsEvent.OTHER_EVENT, 'made_up_event'))
+
+        session = SessionMetrics.objects.get(session_id='s1')
+        self.assertEqual((session.install_id, session.app_version, session.user_props),
+                         ('install-1', '2.0.0', {'sign': 'leo'}))
+
+    def test_events_without_a_session_row_keep_their_install_id(self):
+        event = self.legacy_event('orphan')
+
+        self.compact()
+
+        event.refresh_from_db()
+        self.assertIsNotNone(event.event_code)
+        self.assertEqual((event.legacy_install_id, event.legacy_user_props), ('install-1', {'sign': 'leo'}))
+
+    def test_compacted_events_are_skipped_and_limit_is_honoured(self):
+        for _ in range(3):
+            self.legacy_event('s1')
+
+        self.compact('--chunk-size', '2', '--limit', '2')
+        self.assertEqual(AnalyticsEvent.objects.filter(event_code__isnull=True).count(), 1)
+
+        out = StringIO()
+        call_command('compact_analytics_events', stdout=out)
+        self.assertIn('Done: 1 events compacted', out.getvalue())
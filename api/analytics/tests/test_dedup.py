@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from analytics.dedup import RecentEventIds, recent_event_ids
+from analytics.interning import intern_cache
+from analytics.models import AnalyticsEvent, SessionMetrics
+
+URL = '/api/v1/analytics/events/'
+
+
+def event(event_id=None, name='screen_view', session_id='session-1'):
+    data = {'event': name, 'ts': 1704067200000, 'session_id': session_id, 'install_id': 'install-1',
+            'app_version': '2.0.0'}
+    if event_id is not None:
+        data['event_id'] = event_id
+    return data
+
+
+class RecentEventIdsTests(TestCase):
+    def test_ids_are_remembered_for_two_windows(self):
+        ids = RecentEventIds(window_seconds=10)
+        start = ids._rotated_at
+        self.assertEqual(ids.filter_new(['a', 'b', 'a']), ['a', 'b'])
+        with mock.patch('analytics.dedup.time.monotonic', return_value=start + 10):
+            self.assertEqual(ids.filter_new(['a', 'c']), ['c'])
+        with mock.patch('analytics.dedup.time.monotonic', return_value=start + 20):
+            self.assertEqual(ids.filter_new(['a', 'c']), ['a'])
+
+    def test_idle_windows_forget_everything(self):
+        ids = RecentEventIds(window_seconds=10)
+        ids.filter_new(['a'])
+        with mock.patch('analytics.dedup.time.monotonic', return_value=ids._rotated_at + 25):
+            self.assertEqual(ids.filter_new(['a']), ['a'])
+
+    def test_forgotten_ids_are_accepted_again(self):
+        ids = RecentEventIds()
+        ids.filter_new(['a', 'b'])
+        ids.forget(['a'])
+
+        self.assertEqual(ids.filter_new(['a', 'b']), ['a'])
+
+
+class EventDedupTests(TestCase):
+    def setUp(self):
+        for reset in (cache.clear, intern_cache.clear, recent_event_ids.clear):
+            reset()
+            self.addCleanup(reset)
+
+    def post(self, events):
+        response = self.client.post(URL, events, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_retried_batch_is_stored_once(self):
+        batch = [event('e1'), event('e2', name='paywall_shown'), event('e1')]
+
+        self.assertEqual(self.post(batch)['processed'], 2)
+        self.assertEqual(self.post(batch)['processed'], 0)
+
+        self.assertEqual(sorted(AnalyticsEvent.objects.values_list('event_id', flat=True)), ['e1', 'e2'])
+        session = SessionMetrics.objects.get(session_id='session-1')
+        self.assertEqual((session.screen_views, session.paywall_views), (1, 1))
+
+    def test_ids_stored_by_another_process_are_dropped(self):
+        self.post([event('e1')])
+        recent_event_ids.clear()
+
+        self.assertEqual(self.post([event('e1'), event('e2')])['processed'], 1)
+        self.assertEqual(AnalyticsEvent.objects.count(), 2)
+
+    def test_events_without_an_id_are_never_deduplicated(self):
+        self.post([event(), event()])
+        self.post([event(), event('')])
+
+        self.assertEqual(AnalyticsEvent.objects.count(), 4)
+        self.assertFalse(AnalyticsEvent.objects.exclude(event_id=None).exists())
+
+    def test_failed_write_lets_the_retry_through(self):
+        with mock.patch.object(AnalyticsEvent.objects, 'bulk_create', side_effect=RuntimeError('down')):
+            response = self.client.post(URL, [event('e1')], content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+
+        self.assertEqual(self.post([event('e1')])['processed'], 1)
+
+    def test_concurrent_ingest_that_passed_the_checks_is_not_counted_twice(self):
+        self.post([event('e1')])
+
+        # The other request checked for duplicates before this one stored e1
+        with mock.patch('analytics.views.drop_duplicate_events', side_effect=lambda pending: (pending, [])):
+            body = self.post([event('e1'), event('e2'), event()])
+
+        self.assertEqual(body['processed'], 2)
+        self.assertEqual(AnalyticsEvent.objects.count(), 3)
+        self.assertEqual(SessionMetrics.objects.get(session_id='session-1').screen_views, 3)
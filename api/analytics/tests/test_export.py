@@ -0,0 +1,134 @@
+import csv
+import gzip
+import io
+import json
+from unittest import mock
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from analytics import export
+from analytics.export import buffered, export_stream, gzipped, iter_export_records, parse_time
+from analytics.interning import intern_cache
+from analytics.models import AnalyticsEvent, SessionMetrics
+
+User = get_user_model()
+
+URL = '/api/v1/analytics/export/'
+DAY_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+
+def add_event(event, timestamp, session_id='s1'):
+    code = AnalyticsEvent.code_for(event)
+    return AnalyticsEvent.objects.create(
+        event_code=code, event=event if code == AnalyticsEvent.OTHER_EVENT else '',
+        timestamp=timestamp, session_id=session_id, params={'at': timestamp},
+    )
+
+
+class ExportRecordsTests(TestCase):
+    def setUp(self):
+        intern_cache.clear()
+        self.addCleanup(intern_cache.clear)
+
+    def test_keyset_pages_return_each_row_once_in_order(self):
+        # Equal timestamps across a page boundary are ordered by id
+        for timestamp in (DAY_MS + 2, DAY_MS, DAY_MS + 1, DAY_MS + 1, DAY_MS + 1, DAY_MS + 3):
+            add_event('screen_view', timestamp)
+
+        records = list(iter_export_records(page_size=2, chunk_size=1))
+
+        self.assertEqual(len(records), 6)
+        self.assertEqual([(r['timestamp'], r['id']) for r in records],
+                         sorted((r['timestamp'], r['id']) for r in records))
+
+    def test_time_range_and_event_filter(self):
+        add_event('screen_view', DAY_MS - 1)
+        add_event('screen_view', DAY_MS)
+        add_event('paywall_shown', DAY_MS + 10)
+        add_event('screen_view', DAY_MS + 86400000)
+
+        records = list(iter_export_records(start=DAY_MS, end=DAY_MS + 86400000))
+        self.assertEqual([r['timestamp'] for r in records], [DAY_MS, DAY_MS + 10])
+        records = list(iter_export_records(events=['paywall_shown']))
+        self.assertEqual([r['event'] for r in records], ['paywall_shown'])
+
+    def test_records_carry_session_context(self):
+        SessionMetrics.objects.create(session_id='s1', start_time='2024-01-01T00:00:00Z',
+                                      install_id='install-1', user_props={'sign': 'leo'})
+        add_event('screen_view', DAY_MS)
+
+        record = next(iter_export_records())
+
+        self.assertEqual((record['install_id'], record['user_props']), ('install-1', {'sign': 'leo'}))
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time('2024-01-01'), DAY_MS)
+        self.assertEqual(parse_time(str(DAY_MS)), DAY_MS)
+        self.assertEqual(parse_time('2024-01-01T01:00:00+01:00'), DAY_MS)
+        self.assertIsNone(parse_time(''))
+        with self.assertRaises(ValueError):
+            parse_time('last tuesday')
+
+
+class StreamingTests(TestCase):
+    def test_buffered_joins_small_chunks(self):
+        self.assertEqual(list(buffered([b'ab', b'cd', b'e'], flush_bytes=3)), [b'abcd', b'e'])
+
+    def test_gzipped_stream_decompresses_to_the_input(self):
+        chunks = [bytes([n]) * 1000 for n in range(50)]
+
+        compressed = b''.join(gzipped(iter(chunks)))
+
+        self.assertEqual(gzip.decompress(compressed), b''.join(chunks))
+
+    def test_stream_is_lazy(self):
+        with mock.patch.object(export, 'iter_export_records') as records:
+            records.return_value = iter([])
+            stream = export_stream(compress=True)
+            records.assert_called_once()
+            self.assertEqual(gzip.decompress(b''.join(stream)), b'')
+
+    def test_csv_and_ndjson(self):
+        add_event('screen_view', DAY_MS)
+        add_event('made_up', DAY_MS + 1)
+
+        lines = b''.join(export_stream()).decode().splitlines()
+        self.assertEqual([json.loads(line)['event'] for line in lines], ['screen_view', 'made_up'])
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(export_stream(export_format='csv')).decode())))
+        self.assertEqual([row['event'] for row in rows], ['screen_view', 'made_up'])
+        self.assertEqual(json.loads(rows[0]['params']), {'at': DAY_MS})
+
+
+class ExportViewTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        add_event('screen_view', DAY_MS)
+
+    def test_gzip_export(self):
+        response = self.client.get(URL, {'output': 'csv', 'gzip': '1', 'start': '2024-01-01'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('analytics-events.csv.gz', response['Content-Disposition'])
+        body = zlib.decompress(b''.join(response.streaming_content), 16 + zlib.MAX_WBITS)
+        self.assertEqual(len(body.decode().splitlines()), 2)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(URL, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(URL, {'start': 'soon'}).status_code, 400)
+
+    @override_settings(APP_SERVER='asgi')
+    def test_asgi_gets_an_async_stream(self):
+        response = self.client.get(URL)
+
+        self.assertTrue(response.is_async)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(User.objects.create_user('member', 'member@example.com', 'secret'))
+
+        self.assertEqual(self.client.get(URL).status_code, 403)
@@ -0,0 +1,102 @@
+from datetime import date
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from analytics.funnels import FUNNELS, compute_funnel, conversion_report
+from analytics.models import AnalyticsEvent, FunnelCheckpoint, FunnelStepCount
+
+FUNNEL = FUNNELS['purchase']
+DAY_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+
+def add_event(session_id, event, offset_ms=0):
+    return AnalyticsEvent.objects.create(
+        event_code=AnalyticsEvent.code_for(event),
+        timestamp=DAY_MS + offset_ms,
+        session_id=session_id,
+    )
+
+
+def step_counts():
+    return dict(FunnelStepCount.objects.filter(funnel=FUNNEL.name).values_list('step', 'count'))
+
+
+@override_settings(ANALYTICS_SETTLE_SECONDS=0)
+class ComputeFunnelTests(TestCase):
+    def test_counts_steps_per_session(self):
+        add_event('a', 'purchase_initiated')
+        add_event('a', 'purchase_success', 1000)
+        add_event('b', 'purchase_initiated')
+        add_event('c', 'purchase_success')  # no attempt started
+
+        compute_funnel(FUNNEL)
+
+        self.assertEqual(step_counts(), {'purchase_initiated': 2, 'purchase_success': 1})
+        report = conversion_report(FUNNEL)
+        self.assertEqual(report[0]['day'], '2024-01-01')
+        self.assertEqual(report[0]['steps'][1]['conversion'], 0.5)
+
+    def test_incremental_run_resumes_open_attempts(self):
+        add_event('a', 'purchase_initiated')
+        compute_funnel(FUNNEL)
+        checkpoint = FunnelCheckpoint.objects.get(funnel=FUNNEL.name)
+        self.assertIn('a', checkpoint.open_sessions)
+
+        add_event('a', 'purchase_success', 1000)
+        compute_funnel(FUNNEL)
+
+        self.assertEqual(step_counts(), {'purchase_initiated': 1, 'purchase_success': 1})
+        self.assertEqual(FunnelCheckpoint.objects.get(funnel=FUNNEL.name).open_sessions, {})
+
+    def test_reset_event_ends_the_attempt(self):
+        add_event('a', 'purchase_initiated')
+        add_event('a', 'purchase_failed', 1000)
+        add_event('a', 'purchase_success', 2000)
+
+        compute_funnel(FUNNEL)
+
+        self.assertEqual(step_counts(), {'purchase_initiated': 1})
+
+    def test_incremental_run_after_full_run_does_not_count_twice(self):
+        add_event('a', 'purchase_initiated')
+        compute_funnel(FUNNEL)
+        add_event('b', 'purchase_initiated')
+        add_event('a', 'purchase_success', 1000)
+
+        compute_funnel(FUNNEL, incremental=False)
+        compute_funnel(FUNNEL)
+
+        self.assertEqual(step_counts(), {'purchase_initiated': 2, 'purchase_success': 1})
+
+    def test_ranged_full_run_stops_at_the_checkpoint(self):
+        add_event('a', 'purchase_initiated')
+        compute_funnel(FUNNEL)
+        add_event('b', 'purchase_initiated')
+
+        compute_funnel(FUNNEL, incremental=False, since=date(2024, 1, 1), until=date(2024, 1, 2))
+        self.assertEqual(step_counts(), {'purchase_initiated': 1})
+
+        compute_funnel(FUNNEL)
+        self.assertEqual(step_counts(), {'purchase_initiated': 2})
+
+    def test_ranged_full_run_without_a_checkpoint_is_refused(self):
+        add_event('a', 'purchase_initiated')
+        FunnelStepCount.objects.create(funnel=FUNNEL.name, day=date(2024, 1, 1), step_index=0,
+                                       step='purchase_initiated', count=7)
+
+        with self.assertRaisesMessage(ValueError, 'has no checkpoint yet'):
+            compute_funnel(FUNNEL, incremental=False, since=date(2024, 1, 1), until=date(2024, 1, 2))
+        with self.assertRaisesMessage(CommandError, 'has no checkpoint yet'):
+            call_command('compute_funnels', '--full', '--since', '2024-01-01', '--funnel', FUNNEL.name)
+
+        self.assertEqual(step_counts(), {'purchase_initiated': 7})
+
+    @override_settings(ANALYTICS_SETTLE_SECONDS=60)
+    def test_recent_events_are_left_for_the_next_run(self):
+        add_event('a', 'purchase_initiated')
+
+        compute_funnel(FUNNEL)
+
+        self.assertEqual(step_counts(), {})
+        self.assertEqual(FunnelCheckpoint.objects.get(funnel=FUNNEL.name).last_event_id, 0)
@@ -0,0 +1,87 @@
+import gzip
+import json
+import unittest
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from analytics.dedup import recent_event_ids
+from analytics.interning import intern_cache
+from analytics.models import AnalyticsEvent, SessionMetrics
+from analytics.parsers import msgpack
+
+URL = '/api/v1/analytics/events/'
+
+
+def event(name='screen_view', ts=1704067200000, **fields):
+    return {'event': name, 'ts': ts, 'session_id': 'session-1', 'install_id': 'install-1',
+            'app_version': '2.0.0', **fields}
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        for reset in (cache.clear, intern_cache.clear, recent_event_ids.clear):
+            reset()
+            self.addCleanup(reset)
+
+    def post(self, body, content_type='application/json', **headers):
+        return self.client.post(URL, body, content_type=content_type, **headers)
+
+    def test_invalid_events_are_reported_by_index(self):
+        response = self.post(json.dumps([
+            event(),
+            'not an object',
+            {'event': 'screen_view'},
+            event(ts='yesterday'),
+            event(params=[1]),
+            event(ts=True),
+        ]))
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['processed'], 1)
+        self.assertEqual([entry['index'] for entry in body['rejected']], [1, 2, 3, 4, 5])
+        self.assertIn('missing fields: ts, session_id', body['rejected'][1]['reason'])
+        self.assertEqual(AnalyticsEvent.objects.count(), 1)
+
+    def test_string_timestamps_update_session_metrics(self):
+        response = self.post(json.dumps([event(ts='1704067200000'), event(ts='1704067260000')]))
+
+        self.assertEqual(response.json()['processed'], 2)
+        session = SessionMetrics.objects.get(session_id='session-1')
+        self.assertEqual((session.screen_views, session.duration_seconds), (2, 60))
+
+    def test_gzip_body(self):
+        response = self.post(gzip.compress(json.dumps([event(), event()]).encode()), HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['processed'], 2)
+
+    def test_corrupt_gzip_body_is_rejected(self):
+        response = self.post(b'\x1f\x8bnot gzip', HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['code'], 'INVALID_DATA')
+
+    def test_unknown_content_encoding_is_rejected(self):
+        response = self.post(json.dumps([event()]), HTTP_CONTENT_ENCODING='br')
+
+        self.assertEqual(response.status_code, 415)
+
+    @override_settings(ANALYTICS_MAX_BATCH_BYTES=1024)
+    def test_oversized_decoded_body_is_rejected(self):
+        body = gzip.compress(json.dumps([event(params={'pad': 'x' * 4096})]).encode())
+
+        response = self.post(body, HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_body(self):
+        body = gzip.compress(msgpack.packb([event(), event('paywall_shown')]))
+
+        response = self.post(body, content_type='application/msgpack', HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['processed'], 2)
@@ -0,0 +1,66 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from analytics import views
+from analytics.live import LiveCounters, current_minute, event_key, live_snapshot
+
+
+class LiveCountersTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_idle_worker_publishes_on_a_timer(self):
+        counters = LiveCounters(flush_interval=0.05)
+        counters.record(['screen_view', 'screen_view', 'made_up'], {'s1'})
+        minute = current_minute()
+
+        self.assertIsNone(cache.get(event_key(minute, 'screen_view')))
+        deadline = time.monotonic() + 2
+        while cache.get(event_key(minute, 'screen_view')) is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(cache.get(event_key(minute, 'screen_view')), 2)
+        snapshot = live_snapshot(1)
+        self.assertEqual(snapshot['minutes'][0]['events'], {'screen_view': 2, 'other': 1})
+        self.assertEqual(snapshot['active_sessions'], 1)
+
+    def test_counts_from_several_workers_are_merged(self):
+        first, second = LiveCounters(flush_interval=60), LiveCounters(flush_interval=60)
+        first.record(['purchase_success'], {'s1'})
+        second.record(['purchase_success', 'screen_view'], {'s1', 's2'})
+        first.flush()
+        second.flush()
+
+        row = live_snapshot(1)['minutes'][0]
+        self.assertEqual((row['total'], row['purchases']), (3, 2))
+        self.assertEqual(live_snapshot(1)['active_sessions'], 2)
+
+
+class LiveStreamTests(SimpleTestCase):
+    def test_stream_ends_after_max_seconds(self):
+        frames = list(views.live_event_stream(15, interval=0, max_seconds=0))
+
+        self.assertEqual(frames[0], 'retry: 0\n\n')
+        self.assertTrue(frames[1].startswith('event: counters\ndata: {'))
+        self.assertEqual(len(frames), 2)
+
+    def test_stream_beyond_the_cap_is_told_to_come_back(self):
+        stream = views.live_event_stream(15, interval=0, max_seconds=0)
+        self.assertEqual(next(stream), 'retry: 0\n\n')  # holds the only slot
+
+        self.assertIn('event: busy', ''.join(views.live_event_stream(15)))
+        stream.close()
+        self.assertEqual(len(list(views.live_event_stream(15, interval=0, max_seconds=0))), 2)
+
+    def test_async_stream(self):
+        async def collect():
+            return [frame async for frame in views.async_live_event_stream(15, interval=0, max_seconds=0)]
+
+        frames = async_to_sync(collect)()
+
+        self.assertEqual(len(frames), 2)
+        self.assertTrue(frames[1].startswith('event: counters\n'))
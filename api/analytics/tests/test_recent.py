@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from analytics.models import AnalyticsEvent
+from analytics.recent import buffer_key, recent_events, remember_events
+
+DAY_MS = 1704067200000
+
+
+def store_events(session_id, count, start=0):
+    return [
+        AnalyticsEvent.objects.create(
+            event_code=AnalyticsEvent.code_for('screen_view'), timestamp=DAY_MS + index,
+            session_id=session_id, params={'index': index},
+        )
+        for index in range(start, start + count)
+    ]
+
+
+class RecentEventsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_complete_buffer_is_served_from_the_cache(self):
+        remember_events(store_events('s', 3), new_sessions={'s'})
+
+        with self.assertNumQueries(0):
+            entries = recent_events(['s'])['s']
+
+        self.assertEqual([entry['params']['index'] for entry in entries], [2, 1, 0])
+
+    def test_buffer_that_lost_a_concurrent_update_falls_back_to_the_database(self):
+        remember_events(store_events('s', 2), new_sessions={'s'})
+        first_buffer = cache.get(buffer_key('s'))
+        remember_events(store_events('s', 2, start=2))
+        # A concurrent batch that read the buffer before the second one wrote it
+        cache.set(buffer_key('s'), first_buffer)
+
+        with self.assertNumQueries(1):
+            entries = recent_events(['s'])['s']
+        self.assertEqual([entry['params']['index'] for entry in entries], [3, 2, 1, 0])
+
+        # Re-seeded from the database
+        with self.assertNumQueries(0):
+            recent_events(['s'])
+
+    def test_buffer_started_mid_session_is_not_trusted_until_full(self):
+        store_events('s', 2)
+        remember_events(store_events('s', 1, start=2))
+
+        entries = recent_events(['s'])['s']
+
+        self.assertEqual(len(entries), 3)
@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+
+from django.test import TestCase
+from django.utils import timezone
+
+from analytics.models import AnalyticsEvent, InternedString, SessionMetrics
+from analytics.interning import intern_cache, pack_ip
+from analytics.retention import archive_events, iter_archived_events
+
+DAY_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+
+class ArchiveRoundTripTests(TestCase):
+    def setUp(self):
+        # Interned ids do not outlive the test transaction
+        intern_cache.clear()
+        self.addCleanup(intern_cache.clear)
+        self.archive_dir = tempfile.mkdtemp(prefix='analytics-archive-')
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+
+        # Compact layout: install id and user properties live on the session
+        SessionMetrics.objects.create(
+            session_id='compact', start_time=timezone.now(), install_id='install-1',
+            app_version='2.0.0', user_props={'sign': 'leo'},
+        )
+        self.compact = AnalyticsEvent.objects.create(
+            event_id='e-1', event_code=AnalyticsEvent.code_for('screen_view'), timestamp=DAY_MS,
+            session_id='compact', params={'screen': 'today'}, ip_packed=pack_ip('10.0.0.1'),
+            version_id=intern_cache.id_for(InternedString.APP_VERSION, '2.0.0'),
+            agent_id=intern_cache.id_for(InternedString.USER_AGENT, 'Salamene/2.0'),
+        )
+        # Legacy layout: not backfilled yet
+        self.legacy = AnalyticsEvent.objects.create(
+            event='custom_event', timestamp=DAY_MS + 86400000, session_id='legacy',
+            legacy_install_id='install-2', legacy_app_version='1.9.0',
+            legacy_user_props={'sign': 'aries'}, legacy_ip_address='10.0.0.2',
+            legacy_user_agent='Salamene/1.9',
+        )
+
+    def test_archive_keeps_every_stored_field(self):
+        stats = archive_events(older_than_days=1, archive_dir=self.archive_dir)
+
+        self.assertEqual(stats, {'archived': 2, 'deleted': 2, 'files': 2})
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+        records = {record['id']: record for record in iter_archived_events(archive_dir=self.archive_dir)}
+        compact = records[self.compact.id]
+        self.assertEqual(compact['event'], 'screen_view')
+        self.assertEqual(compact['install_id'], 'install-1')
+        self.assertEqual(compact['user_props'], {'sign': 'leo'})
+        self.assertEqual(compact['app_version'], '2.0.0')
+        self.assertEqual(compact['ip_address'], '10.0.0.1')
+        self.assertEqual(compact['user_agent'], 'Salamene/2.0')
+        self.assertEqual(compact['params'], {'screen': 'today'})
+
+        legacy = records[self.legacy.id]
+        self.assertEqual(legacy['event'], 'custom_event')
+        self.assertEqual(legacy['install_id'], 'install-2')
+        self.assertEqual(legacy['user_props'], {'sign': 'aries'})
+        self.assertEqual(legacy['app_version'], '1.9.0')
+        self.assertEqual(legacy['ip_address'], '10.0.0.2')
+        self.assertEqual(legacy['user_agent'], 'Salamene/1.9')
+
+    def test_dry_run_keeps_rows(self):
+        stats = archive_events(older_than_days=1, archive_dir=self.archive_dir, dry_run=True)
+
+        self.assertEqual(stats['deleted'], 0)
+        self.assertEqual(AnalyticsEvent.objects.count(), 2)
+
+    def test_read_filters_by_time_range(self):
+        archive_events(older_than_days=1, archive_dir=self.archive_dir)
+
+        records = list(iter_archived_events(start=DAY_MS + 1, archive_dir=self.archive_dir))
+
+        self.assertEqual([record['id'] for record in records], [self.legacy.id])
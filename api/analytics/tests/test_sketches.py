@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from analytics.models import ActiveUsersSketch, AnalyticsEvent, RollupCheckpoint, SessionMetrics
+from analytics.interning import intern_cache
+from analytics.sketches import HyperLogLog, count_active, retention, rollup_active_users, session_slices
+
+DAY = date(2024, 1, 1)
+DAY_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+
+def sketch_of(values):
+    sketch = HyperLogLog()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def store(day, values, kind='install', dimension='all', value=''):
+    ActiveUsersSketch.objects.create(
+        day=day, kind=kind, dimension=dimension, value=value, registers=sketch_of(values).to_bytes()
+    )
+
+
+class HyperLogLogTests(TestCase):
+    def assertClose(self, estimate, actual, tolerance=0.05):
+        self.assertLessEqual(abs(estimate - actual), actual * tolerance, f'{estimate} vs {actual}')
+
+    def test_count_is_within_a_few_percent(self):
+        for size in (100, 1000, 10000, 50000):
+            self.assertClose(sketch_of(f'install-{n}' for n in range(size)).count(), size)
+
+    def test_duplicates_do_not_count(self):
+        sketch = sketch_of(f'install-{n % 500}' for n in range(10000))
+
+        self.assertClose(sketch.count(), 500)
+
+    def test_merge_is_the_union(self):
+        left = sketch_of(f'install-{n}' for n in range(0, 6000))
+        right = sketch_of(f'install-{n}' for n in range(4000, 10000))
+        union = sketch_of(f'install-{n}' for n in range(10000))
+
+        self.assertEqual(left.merge(right).registers, union.registers)
+
+    def test_round_trip_and_validation(self):
+        sketch = sketch_of(range(300))
+
+        self.assertEqual(HyperLogLog.from_bytes(sketch.to_bytes()).count(), sketch.count())
+        with self.assertRaises(ValueError):
+            HyperLogLog(registers=b'\x00' * 10)
+        with self.assertRaises(ValueError):
+            HyperLogLog(precision=10).merge(HyperLogLog())
+        self.assertEqual(HyperLogLog().count(), 0)
+
+
+class WindowTests(TestCase):
+    def test_count_active_merges_days(self):
+        for offset in range(7):
+            store(DAY + timedelta(days=offset), (f'install-{n}' for n in range(offset * 100, offset * 100 + 1000)))
+
+        self.assertAlmostEqual(count_active(DAY, DAY + timedelta(days=6)), 1600, delta=80)
+        self.assertAlmostEqual(count_active(DAY, DAY), 1000, delta=50)
+
+    def test_retention_by_inclusion_exclusion(self):
+        store(DAY, (f'install-{n}' for n in range(2000)))
+        store(DAY + timedelta(days=1), (f'install-{n}' for n in range(1000, 3000)))  # half retained
+        store(DAY + timedelta(days=7), (f'install-{n}' for n in range(5000, 6000)))  # none retained
+
+        result = retention(DAY, offsets=(1, 7, 30))
+
+        self.assertAlmostEqual(result['cohort_size'], 2000, delta=100)
+        self.assertAlmostEqual(result['retention']['day_1']['rate'], 0.5, delta=0.08)
+        self.assertLess(result['retention']['day_7']['rate'], 0.08)
+        self.assertEqual(result['retention']['day_30'], {'retained': 0, 'rate': 0.0})
+
+
+@override_settings(ANALYTICS_SETTLE_SECONDS=-60)
+class RollupTests(TestCase):
+    def setUp(self):
+        intern_cache.clear()
+        self.addCleanup(intern_cache.clear)
+
+    def add_session(self, session_id, install_id, user_props):
+        SessionMetrics.objects.create(
+            session_id=session_id, start_time=timezone.now(), install_id=install_id,
+            app_version='2.0.0', user_props=user_props,
+        )
+        AnalyticsEvent.objects.create(
+            event_code=AnalyticsEvent.code_for('screen_view'), timestamp=DAY_MS, session_id=session_id,
+        )
+
+    def test_rollup_builds_sliced_sketches_once(self):
+        self.add_session('s1', 'install-1', {'sign': 'leo', 'is_premium': True})
+        self.add_session('s2', 'install-2', {'sign': 'aries'})
+        self.add_session('s3', 'install-1', {'sign': 'leo', 'is_premium': True})
+
+        self.assertEqual(rollup_active_users(), 3)
+        self.assertEqual(rollup_active_users(), 0)
+
+        self.assertEqual(count_active(DAY, DAY), 2)
+        self.assertEqual(count_active(DAY, DAY, dimension='sign', value='leo'), 1)
+        self.assertEqual(count_active(DAY, DAY, dimension='premium', value='true'), 1)
+        self.assertEqual(count_active(DAY, DAY, dimension='app_version', value='2.0.0'), 2)
+        self.assertEqual(RollupCheckpoint.objects.get(name='active_users').last_event_id,
+                         AnalyticsEvent.objects.latest('id').id)
+
+    def test_session_slices(self):
+        self.assertEqual(session_slices(None, ''), [('all', '')])
+        self.assertEqual(
+            session_slices({'sign': 'leo', 'is_premium': False}, '2.0.0'),
+            [('all', ''), ('sign', 'leo'), ('premium', 'false'), ('app_version', '2.0.0')],
+        )
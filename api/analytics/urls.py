@@ -4,4 +4,9 @@ from . import views
 urlpatterns = [
     path('events/', views.events, name='analytics_events'),
     path('session/', views.session_summary, name='session_summary'),
+    path('sessions/', views.session_lookup, name='session_lookup'),
+    path('export/', views.export_events, name='analytics_export'),
+    path('actives/', views.active_users, name='analytics_actives'),
+    path('live/', views.live_counters_stream, name='analytics_live'),
+    path('retention/', views.retention_cohort, name='analytics_retention'),
 ]
\ No newline at end of file
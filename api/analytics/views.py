@@ -1,12 +1,31 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.decorators import api_view, parser_classes, permission_classes, renderer_classes
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import json
 import logging
-from .models import AnalyticsEvent, SessionMetrics
+import threading
+import time
+from .models import AnalyticsEvent, SessionMetrics, InternedString
+from .interning import intern_cache, pack_ip
+from .export import EXPORT_FORMATS, export_stream, parse_time
+from .dedup import recent_event_ids
+from .parsers import analytics_parsers
+from .recent import recent_events, remember_events
+from .live import EventStreamRenderer, live_counters, live_snapshot
+from .sketches import active_summary, retention
+from config.renderers import FastJSONRenderer
+from config.routers import analytics_database
+from config.streaming import stream_body
 
 User = get_user_model()
 logger = logging.getLogger('analytics')
@@ -22,12 +41,75 @@ def get_client_ip(request):
     return ip
 
 
+REQUIRED_EVENT_FIELDS = ['event', 'ts', 'session_id', 'install_id', 'app_version']
+
+
+def build_event(event_data, user, ip_packed, agent_id):
+    """
+    Validate one event from a batch and build its row.
+
+    Raises ValueError with the rejection reason reported back to the client.
+    """
+    if not isinstance(event_data, dict):
+        raise ValueError('event must be an object')
+
+    missing_fields = [field for field in REQUIRED_EVENT_FIELDS if field not in event_data]
+    if missing_fields:
+        raise ValueError(f"missing fields: {', '.join(missing_fields)}")
+
+    event = event_data['event']
+    if not isinstance(event, str) or not 0 < len(event) <= 50:
+        raise ValueError('event must be a non-empty string of at most 50 characters')
+    session_id = event_data['session_id']
+    if not isinstance(session_id, str) or not 0 < len(session_id) <= 100:
+        raise ValueError('session_id must be a non-empty string of at most 100 characters')
+    if isinstance(event_data['ts'], bool):
+        raise ValueError('ts must be epoch milliseconds')
+    try:
+        timestamp = int(event_data['ts'])
+    except (TypeError, ValueError):
+        raise ValueError('ts must be epoch milliseconds')
+    params = event_data.get('params', {})
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object')
+
+    event_id = event_data.get('event_id')
+    if not isinstance(event_id, str) or not 0 < len(event_id) <= 64:
+        event_id = None
+
+    event_code = AnalyticsEvent.code_for(event)
+    return AnalyticsEvent(
+        event_id=event_id,
+        event_code=event_code,
+        event=event if event_code == AnalyticsEvent.OTHER_EVENT else '',
+        timestamp=timestamp,
+        session_id=session_id,
+        user=user,
+        params=params,
+        ip_packed=ip_packed,
+        agent_id=agent_id
+    )
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@parser_classes(analytics_parsers())
 def events(request):
-    """Handle analytics events from the mobile app"""
+    """
+    Handle analytics events from the mobile app
+
+    Accepts a JSON (or MessagePack) array, optionally sent with
+    `Content-Encoding: gzip`. Events that fail validation are skipped and
+    reported in `rejected` by their index in the batch.
+    """
     try:
-        events_data = request.data
+        try:
+            events_data = request.data
+        except (ParseError, UnsupportedMediaType) as e:
+            return Response(
+                {"error": {"code": "INVALID_DATA", "message": str(e.detail)}},
+                status=e.status_code
+            )
 
         if not isinstance(events_data, list):
             return Response(
@@ -35,56 +117,71 @@ def events(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get request metadata
-        ip_address = get_client_ip(request)
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        # Get request metadata (interned once per batch)
+        ip_packed = pack_ip(get_client_ip(request))
+        agent_id = intern_cache.id_for(InternedString.USER_AGENT, request.META.get('HTTP_USER_AGENT', ''))
 
-        # Process each event
-        created_events = []
-        for event_data in events_data:
+        # Get user if authenticated
+        user = None
+        if hasattr(request, 'user') and request.user.is_authenticated:
+            user = request.user
+
+        # Build event rows for the batch
+        pending_events = []
+        rejected = []
+        for index, event_data in enumerate(events_data):
             try:
-                # Validate required fields
-                required_fields = ['event', 'ts', 'session_id', 'install_id', 'app_version']
-                for field in required_fields:
-                    if field not in event_data:
-                        logger.warning(f"Missing required field: {field}")
-                        continue
-
-                # Get user if authenticated
-                user = None
-                if hasattr(request, 'user') and request.user.is_authenticated:
-                    user = request.user
-
-                # Create analytics event
-                analytics_event = AnalyticsEvent.objects.create(
-                    event=event_data['event'],
-                    timestamp=event_data['ts'],
-                    session_id=event_data['session_id'],
-                    install_id=event_data['install_id'],
-                    app_version=event_data['app_version'],
-                    user=user,
-                    user_props=event_data.get('user_props', {}),
-                    params=event_data.get('params', {}),
-                    ip_address=ip_address,
-                    user_agent=user_agent
-                )
-
-                created_events.append(analytics_event)
-
-                # Update session metrics
-                update_session_metrics(event_data, user)
-
-                # Log important events
-                if event_data['event'] in ['purchase_success', 'paywall_shown', 'upgrade_cta_clicked']:
-                    logger.info(f"Analytics: {event_data['event']} - Session: {event_data['session_id'][:8]}... - User: {user.username if user else 'Anonymous'}")
-
-            except Exception as e:
-                logger.error(f"Failed to process event: {event_data.get('event', 'unknown')} - Error: {str(e)}")
+                analytics_event = build_event(event_data, user, ip_packed, agent_id)
+            except ValueError as e:
+                rejected.append({'index': index, 'reason': str(e)})
                 continue
+            pending_events.append((analytics_event, event_data))
 
-        logger.info(f"Processed {len(created_events)} analytics events from session {events_data[0].get('session_id', 'unknown')[:8] if events_data else 'unknown'}...")
+        if rejected:
+            logger.warning(f"Rejected {len(rejected)} of {len(events_data)} analytics events, first: {rejected[0]['reason']}")
 
-        return Response({'status': 'success', 'processed': len(created_events)})
+        pending_events, new_event_ids = drop_duplicate_events(pending_events)
+
+        version_ids = intern_cache.ids_for(
+            InternedString.APP_VERSION,
+            {str(event_data['app_version']) for _, event_data in pending_events}
+        )
+        for analytics_event, event_data in pending_events:
+            analytics_event.version_id = version_ids[str(event_data['app_version'])]
+
+        try:
+            stored = insert_events([analytics_event for analytics_event, _ in pending_events])
+        except Exception:
+            # Nothing was stored, so let the client's retry through
+            recent_event_ids.forget(new_event_ids)
+            raise
+        pending_events = [(analytics_event, event_data) for analytics_event, event_data in pending_events
+                          if id(analytics_event) in stored]
+
+        live_counters.record(
+            [event_data['event'] for _, event_data in pending_events],
+            {analytics_event.session_id for analytics_event, _ in pending_events}
+        )
+
+        created_events = []
+        new_sessions = set()
+        for analytics_event, event_data in pending_events:
+            created_events.append(analytics_event)
+
+            # Update session metrics
+            if update_session_metrics(event_data, user, analytics_event.timestamp):
+                new_sessions.add(analytics_event.session_id)
+
+            # Log important events
+            if event_data['event'] in ['purchase_success', 'paywall_shown', 'upgrade_cta_clicked']:
+                logger.info(f"Analytics: {event_data['event']} - Session: {event_data['session_id'][:8]}... - User: {user.username if user else 'Anonymous'}")
+
+        remember_events(created_events, new_sessions)
+
+        if pending_events:
+            logger.info(f"Processed {len(created_events)} analytics events from session {pending_events[0][0].session_id[:8]}...")
+
+        return Response({'status': 'success', 'processed': len(created_events), 'rejected': rejected})
 
     except Exception as e:
         logger.error(f"Analytics events processing failed: {str(e)}")
@@ -94,12 +191,85 @@ def events(request):
         )
 
 
-def update_session_metrics(event_data, user):
-    """Update aggregated session metrics"""
+def drop_duplicate_events(pending_events):
+    """
+    Drop events whose client event id was already received.
+
+    Ids are checked against the in-process window first; ids the window has not
+    seen are checked with a single query for the whole batch. Returns the
+    remaining events and the ids newly added to the window.
+    """
+    event_ids = [analytics_event.event_id for analytics_event, _ in pending_events if analytics_event.event_id]
+    if not event_ids:
+        return pending_events, []
+
+    new_event_ids = recent_event_ids.filter_new(event_ids)
+    if new_event_ids:
+        stored_ids = set(
+            AnalyticsEvent.objects.filter(event_id__in=new_event_ids).values_list('event_id', flat=True)
+        )
+    else:
+        stored_ids = set()
+
+    accepted_ids = set(new_event_ids) - stored_ids
+    unique_events = []
+    for analytics_event, event_data in pending_events:
+        event_id = analytics_event.event_id
+        if event_id:
+            if event_id not in accepted_ids:
+                continue
+            # Only the first copy within a batch is kept
+            accepted_ids.discard(event_id)
+        unique_events.append((analytics_event, event_data))
+
+    duplicates = len(pending_events) - len(unique_events)
+    if duplicates:
+        logger.info(f"Dropped {duplicates} duplicate analytics events")
+
+    return unique_events, new_event_ids
+
+
+def insert_events(analytics_events):
+    """
+    Insert event rows; returns the ids (id()) of the objects actually stored.
+
+    Two ingests of the same retried batch can both get past
+    drop_duplicate_events. The second one then fails on the unique event_id
+    and falls back to one insert per event, so only the rows it really
+    inserted go on to the session metrics and counters.
+    """
+    database = analytics_database()
+    try:
+        with transaction.atomic(using=database):
+            AnalyticsEvent.objects.bulk_create(analytics_events)
+        return {id(analytics_event) for analytics_event in analytics_events}
+    except IntegrityError:
+        pass
+
+    stored = set()
+    for analytics_event in analytics_events:
+        try:
+            with transaction.atomic(using=database):
+                analytics_event.save(force_insert=True)
+        except IntegrityError:
+            continue  # stored by the concurrent ingest
+        stored.add(id(analytics_event))
+    duplicates = len(analytics_events) - len(stored)
+    if duplicates:
+        logger.info(f"Dropped {duplicates} analytics events stored by a concurrent ingest")
+    return stored
+
+
+def update_session_metrics(event_data, user, timestamp):
+    """
+    Update aggregated session metrics; returns True when the session is new.
+
+    `timestamp` is the event's epoch ms as normalized by build_event, since
+    clients may send it as a string.
+    """
     try:
         session_id = event_data['session_id']
         event_type = event_data['event']
-        timestamp = event_data['ts']
 
         # Convert timestamp to datetime
         event_datetime = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
@@ -110,9 +280,17 @@ def update_session_metrics(event_data, user):
             defaults={
                 'user': user,
                 'start_time': event_datetime,
+                'install_id': str(event_data['install_id'])[:100],
+                'app_version': str(event_data['app_version'])[:20],
+                'user_props': event_data.get('user_props', {}),
             }
         )
 
+        # Session-level props are stored once; keep the latest values
+        user_props = event_data.get('user_props', {})
+        if not created and user_props and user_props != session_metrics.user_props:
+            session_metrics.user_props = user_props
+
         # Update metrics based on event type
         if event_type == 'screen_view':
             session_metrics.screen_views += 1
@@ -138,9 +316,25 @@ def update_session_metrics(event_data, user):
             session_metrics.duration_seconds = int(duration)
 
         session_metrics.save()
+        return created
 
     except Exception as e:
         logger.error(f"Failed to update session metrics: {str(e)}")
+        return False
+
+
+def session_metrics_data(session_metrics):
+    return {
+        'duration_seconds': session_metrics.duration_seconds,
+        'screen_views': session_metrics.screen_views,
+        'tab_switches': session_metrics.tab_switches,
+        'banner_clicks': session_metrics.banner_clicks,
+        'paywall_views': session_metrics.paywall_views,
+        'compatibility_calculations': session_metrics.compatibility_calculations,
+        'upgrade_attempts': session_metrics.upgrade_attempts,
+        'purchase_attempts': session_metrics.purchase_attempts,
+        'successful_purchases': session_metrics.successful_purchases,
+    }
 
 
 @api_view(['GET'])
@@ -156,36 +350,12 @@ def session_summary(request):
         )
 
     try:
-        # Get session metrics
         session_metrics = SessionMetrics.objects.get(session_id=session_id)
 
-        # Get recent events for this session
-        recent_events = AnalyticsEvent.objects.filter(
-            session_id=session_id
-        ).order_by('-timestamp')[:20]
-
-        events_summary = []
-        for event in recent_events:
-            events_summary.append({
-                'event': event.event,
-                'timestamp': event.timestamp,
-                'params': event.params
-            })
-
         return Response({
             'session_id': session_id,
-            'metrics': {
-                'duration_seconds': session_metrics.duration_seconds,
-                'screen_views': session_metrics.screen_views,
-                'tab_switches': session_metrics.tab_switches,
-                'banner_clicks': session_metrics.banner_clicks,
-                'paywall_views': session_metrics.paywall_views,
-                'compatibility_calculations': session_metrics.compatibility_calculations,
-                'upgrade_attempts': session_metrics.upgrade_attempts,
-                'purchase_attempts': session_metrics.purchase_attempts,
-                'successful_purchases': session_metrics.successful_purchases,
-            },
-            'recent_events': events_summary
+            'metrics': session_metrics_data(session_metrics),
+            'recent_events': recent_events([session_id])[session_id]
         })
 
     except SessionMetrics.DoesNotExist:
@@ -197,4 +367,209 @@ def session_summary(request):
         return Response(
             {"error": {"code": "SERVER_ERROR", "message": "Failed to get session summary"}},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+# Upper bound on session ids per batch lookup
+MAX_SESSION_LOOKUP = 200
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def session_lookup(request):
+    """Summaries for many sessions at once, for support tooling (admin only)"""
+    session_ids = request.data.get('session_ids') if isinstance(request.data, dict) else None
+    if not isinstance(session_ids, list) or not all(isinstance(session_id, str) for session_id in session_ids):
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "session_ids must be an array of strings"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(session_ids) > MAX_SESSION_LOOKUP:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": f"At most {MAX_SESSION_LOOKUP} session_ids per request"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    metrics = SessionMetrics.objects.in_bulk(session_ids, field_name='session_id')
+    events_by_session = recent_events([session_id for session_id in session_ids if session_id in metrics])
+
+    sessions = {}
+    for session_id in session_ids:
+        session_metrics = metrics.get(session_id)
+        sessions[session_id] = {
+            'metrics': session_metrics_data(session_metrics),
+            'recent_events': events_by_session[session_id],
+        } if session_metrics else None
+
+    return Response({'sessions': sessions})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_events(request):
+    """Stream analytics events for a time range as NDJSON or CSV (admin only)"""
+    # `format` is reserved by DRF for renderer selection
+    export_format = request.GET.get('output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "output must be ndjson or csv"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        start = parse_time(request.GET.get('start'))
+        end = parse_time(request.GET.get('end'))
+    except ValueError as e:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": str(e)}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    event_names = [name for name in request.GET.get('event', '').split(',') if name]
+    compress = request.GET.get('gzip') in ('1', 'true')
+
+    filename = f"analytics-events.{export_format}"
+    content_type = EXPORT_FORMATS[export_format]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(
+        stream_body(export_stream(start, end, event_names, export_format, compress)),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    logger.info(f"Analytics export started by {request.user.username}: start={start} end={end} events={event_names or 'all'}")
+    return response
+
+
+def parse_day_param(value, default=None):
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def active_users(request):
+    """DAU/WAU/MAU from the per-day sketches, optionally sliced (admin only)"""
+    kind = request.GET.get('kind', 'install')
+    dimension = request.GET.get('dimension', 'all')
+    if kind not in ('install', 'user') or dimension not in ('all', 'sign', 'premium', 'app_version'):
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "kind must be install or user; dimension all, sign, premium or app_version"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        day = parse_day_param(request.GET.get('date'), default=timezone.now().date() - timedelta(days=1))
+    except ValueError:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "date must be YYYY-MM-DD"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({
+        'date': day.isoformat(),
+        'kind': kind,
+        'dimension': dimension,
+        'slices': active_summary(day, kind, dimension),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def retention_cohort(request):
+    """Day-N retention for the installs active on a cohort day (admin only)"""
+    try:
+        cohort_day = parse_day_param(request.GET.get('cohort'))
+        offsets = tuple(int(n) for n in request.GET.get('days', '1,7,30').split(',') if n)
+    except ValueError:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "cohort must be YYYY-MM-DD and days a comma separated list of integers"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if cohort_day is None:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "cohort is required"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    kind = request.GET.get('kind', 'install')
+    if kind not in ('install', 'user'):
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "kind must be install or user"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(retention(cohort_day, offsets, kind=kind))
+
+
+# Seconds between SSE updates and before the stream closes (clients reconnect)
+LIVE_STREAM_INTERVAL = 5
+LIVE_STREAM_MAX_SECONDS = 300
+
+
+def counters_event(minutes):
+    # Publish this worker's own pending counts before reading the merged view
+    live_counters.flush()
+    return f"event: counters\ndata: {json.dumps(live_snapshot(minutes), separators=(',', ':'))}\n\n"
+
+
+# Under WSGI every open stream holds a worker thread, so each process serves only a few
+live_stream_slots = threading.BoundedSemaphore(getattr(settings, 'ANALYTICS_LIVE_MAX_STREAMS', 1))
+
+
+def live_event_stream(minutes, interval=LIVE_STREAM_INTERVAL, max_seconds=LIVE_STREAM_MAX_SECONDS):
+    if not live_stream_slots.acquire(blocking=False):
+        # EventSource reconnects after `retry`, by then a slot (or another worker) may be free
+        yield f"retry: {interval * 1000}\n\nevent: busy\ndata: {{}}\n\n"
+        return
+    try:
+        deadline = time.monotonic() + max_seconds
+        yield f"retry: {interval * 1000}\n\n"
+        while True:
+            yield counters_event(minutes)
+            if time.monotonic() + interval > deadline:
+                break
+            time.sleep(interval)
+    finally:
+        live_stream_slots.release()
+
+
+async def async_live_event_stream(minutes, interval=LIVE_STREAM_INTERVAL, max_seconds=LIVE_STREAM_MAX_SECONDS):
+    """live_event_stream for ASGI: waits on the event loop instead of holding a thread"""
+    deadline = time.monotonic() + max_seconds
+    yield f"retry: {interval * 1000}\n\n"
+    while True:
+        yield await sync_to_async(counters_event)(minutes)
+        if time.monotonic() + interval > deadline:
+            break
+        await asyncio.sleep(interval)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([FastJSONRenderer, EventStreamRenderer])
+def live_counters_stream(request):
+    """Server-Sent Events stream of live ingest counters (admin only)"""
+    try:
+        minutes = min(max(int(request.GET.get('minutes', 15)), 1), 120)
+    except ValueError:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "minutes must be an integer"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if request.GET.get('once') in ('1', 'true'):
+        live_counters.flush()
+        return Response(live_snapshot(minutes))
+
+    if getattr(settings, 'APP_SERVER', 'wsgi') == 'asgi':
+        stream = async_live_event_stream(minutes)
+    else:
+        stream = live_event_stream(minutes)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,68 @@
+"""
+Per-request cost of the middleware stack on API routes
+
+Times the same cheap API request (a validation error, so no database work)
+through Django's stock session/CSRF/auth/messages/clickjacking middleware and
+through the WebOnly* variants the project uses, which skip them under /api/.
+Run from the api/ directory:
+
+    python -m benchmarks.middleware --requests 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+STOCK_WEB_MIDDLEWARE = {
+    'config.middleware.WebOnlySessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'config.middleware.WebOnlyCsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'config.middleware.WebOnlyAuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.middleware.WebOnlyMessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+    'config.middleware.WebOnlyXFrameOptionsMiddleware': 'django.middleware.clickjacking.XFrameOptionsMiddleware',
+}
+
+PATH = '/api/v1/predictions/daily/?sign=unknown&date=2025-01-01'
+
+
+def time_stack(middleware, requests):
+    """Microseconds per request through a handler built with `middleware`"""
+    from django.test import Client, override_settings
+
+    with override_settings(MIDDLEWARE=middleware):
+        client = Client()
+        for _ in range(min(requests, 500)):
+            client.get(PATH)
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get(PATH)
+        return (time.perf_counter() - started) / requests * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000, help='Requests per stack (default: 20000)')
+    parser.add_argument('--rounds', type=int, default=3, help='Best of this many rounds (default: 3)')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+
+    lean = list(settings.MIDDLEWARE)
+    stock = [STOCK_WEB_MIDDLEWARE.get(path, path) for path in lean]
+
+    results = {'stock': [], 'lean': []}
+    for _ in range(args.rounds):
+        results['stock'].append(time_stack(stock, args.requests))
+        results['lean'].append(time_stack(lean, args.requests))
+
+    stock_us, lean_us = min(results['stock']), min(results['lean'])
+    print(f"stock web middleware  {stock_us:8.1f} us/request")
+    print(f"web-only middleware   {lean_us:8.1f} us/request")
+    print(f"saved                 {stock_us - lean_us:8.1f} us/request ({(stock_us - lean_us) / stock_us:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
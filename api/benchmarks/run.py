@@ -0,0 +1,243 @@
+"""
+HTTP load test for every api/v1 route
+
+Boots the project against a throwaway database (benchmarks/settings.py),
+seeds it, serves it with a threaded WSGI server on localhost and drives each
+scenario with a pool of concurrent clients. Run from the api/ directory:
+
+    python -m benchmarks.run --requests 500 --concurrency 8 --output results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.2
+
+Per scenario it reports p50/p95/p99 latency, throughput, SQL queries per
+request and unexpected statuses. The run fails (exit 1) when any request got
+a status its scenario does not expect, since the latency of error responses
+says nothing about the route. With --baseline it also fails when a
+scenario's p95 or query count regressed beyond the tolerance.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+QUERY_HEADER = 'X-Bench-Queries'
+
+# p95 differences below this are noise, whatever the relative change
+MIN_REGRESSION_MS = 2.0
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def query_counting(app):
+    """Wrap the WSGI app so every response reports how many queries it ran"""
+    from django.db import connection
+
+    def wrapped(environ, start_response):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        def counting_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [(QUERY_HEADER, str(count[0]))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return app(environ, counting_start_response)
+
+    return wrapped
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def send(port, method, path, body, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    payload = json.dumps(body).encode('utf-8') if body is not None else None
+    request_headers = {'Content-Type': 'application/json', **headers} if payload is not None else dict(headers)
+    started = time.perf_counter()
+    connection.request(method, path, body=payload, headers=request_headers)
+    response = connection.getresponse()
+    response.read()
+    elapsed = time.perf_counter() - started
+    queries = int(response.getheader(QUERY_HEADER) or 0)
+    connection.close()
+    return response.status, elapsed, queries
+
+
+def run_scenario(port, scenario, fixtures, requests, concurrency, offset):
+    """Fire `requests` requests with `concurrency` clients; returns the stats dict"""
+    latencies = []
+    queries = []
+    unexpected = {}
+    lock = threading.Lock()
+
+    def one(i):
+        method, path, body, headers = scenario.request(fixtures, offset + i)
+        try:
+            status, elapsed, count = send(port, method, path, body, headers)
+        except OSError as e:
+            status, elapsed, count = f"error: {e.__class__.__name__}", 0.0, 0
+        with lock:
+            latencies.append(elapsed)
+            queries.append(count)
+            if status not in scenario.expected:
+                unexpected[str(status)] = unexpected.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'throughput_rps': round(requests / wall, 1) if wall else 0.0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'unexpected_statuses': unexpected,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against a baseline results file"""
+    problems = []
+    for name, base in baseline.get('scenarios', {}).items():
+        current = results['scenarios'].get(name)
+        if current is None:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit and current['p95_ms'] - base['p95_ms'] > MIN_REGRESSION_MS:
+            problems.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if current['queries_per_request'] > base['queries_per_request'] + 0.5:
+            problems.append(
+                f"{name}: {current['queries_per_request']} queries/request vs baseline {base['queries_per_request']}"
+            )
+    return problems
+
+
+def failures(results):
+    """Scenarios that got unexpected statuses"""
+    return [
+        f"{name}: unexpected statuses {stats['unexpected_statuses']}"
+        for name, stats in results['scenarios'].items()
+        if stats['unexpected_statuses']
+    ]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='Timed requests per scenario (default: 300)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--warmup', type=int, default=50, help='Untimed requests per scenario first (default: 50)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Seed data volume multiplier (default: 1)')
+    parser.add_argument('--scenario', action='append', help='Only run these scenarios (repeatable)')
+    parser.add_argument('--output', default='benchmark-results.json', help='Where to write the results JSON')
+    parser.add_argument('--baseline', help='Results JSON to compare against; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative p95 increase over the baseline (default: 0.2)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    from .scenarios import SCENARIOS
+    from .seed import seed
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    unknown = set(args.scenario or []) - {s.name for s in SCENARIOS}
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    print(f"Seeding ({connection.vendor}, scale {args.scale})...", flush=True)
+    fixtures = seed(args.scale)
+
+    server = make_server('127.0.0.1', 0, query_counting(get_wsgi_application()),
+                         server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = {
+        'meta': {
+            'timestamp': int(time.time()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'scale': args.scale,
+        },
+        'scenarios': {},
+    }
+
+    try:
+        for scenario in scenarios:
+            if args.warmup:
+                run_scenario(port, scenario, fixtures, args.warmup, args.concurrency, offset=0)
+            stats = run_scenario(port, scenario, fixtures, args.requests, args.concurrency, offset=args.warmup)
+            results['scenarios'][scenario.name] = stats
+            print(
+                f"{scenario.name:22} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  "
+                f"p99 {stats['p99_ms']:8.2f}ms  {stats['throughput_rps']:8.1f} req/s  "
+                f"{stats['queries_per_request']:6.2f} q/req"
+                + (f"  unexpected {stats['unexpected_statuses']}" if stats['unexpected_statuses'] else ''),
+                flush=True
+            )
+    finally:
+        server.shutdown()
+
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    failed = failures(results)
+    if failed:
+        print('Failed requests:\n  ' + '\n  '.join(failed), file=sys.stderr)
+        return 1
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print('Regressions:\n  ' + '\n  '.join(problems), file=sys.stderr)
+            return 1
+        print('No regressions against baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
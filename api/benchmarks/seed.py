@@ -0,0 +1,101 @@
+"""
+Seed data for the benchmark suite
+"""
+from datetime import timedelta
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from accounts.authentication import generate_jwt_token
+from analytics.interning import intern_cache
+from analytics.models import AnalyticsEvent, InternedString, SessionMetrics
+from payments.catalog import seed_default_plans
+from payments.models import PaymentPlan, Transaction
+
+User = get_user_model()
+
+SIGNS = ['aries', 'taurus', 'gemini', 'cancer', 'leo', 'virgo',
+         'libra', 'scorpio', 'sagittarius', 'capricorn', 'aquarius', 'pisces']
+
+
+def seed(scale=1.0, rng=None):
+    """
+    Create users, transactions and analytics history sized by `scale`.
+
+    At scale 1: 5k users, 20k transactions, 2k sessions and 100k events.
+    Returns the fixtures the scenarios need (tokens, transaction ids...).
+    """
+    rng = rng or random.Random(42)
+    now = timezone.now()
+
+    user_count = max(int(5000 * scale), 10)
+    users = User.objects.bulk_create([
+        User(
+            username=f"bench_{i}",
+            email=f"bench_{i}@salamene.app",
+            sign=rng.choice(SIGNS),
+            is_premium=i % 5 == 0,
+            premium_until=now + timedelta(days=30) if i % 5 == 0 else None,
+        )
+        for i in range(user_count)
+    ], batch_size=1000)
+    users = list(User.objects.filter(username__startswith='bench_').order_by('id'))
+
+    seed_default_plans()
+    plans = list(PaymentPlan.objects.filter(is_active=True))
+    transactions = [
+        Transaction(
+            transaction_id=f"tx_bench_{i}",
+            user=users[i % len(users)],
+            plan=plans[i % len(plans)],
+            amount=5,
+            currency='USD',
+            status=rng.choice(['pending', 'paid', 'paid', 'cancelled']),
+        )
+        for i in range(max(int(20000 * scale), 10))
+    ]
+    Transaction.objects.bulk_create(transactions, batch_size=2000)
+    Transaction.objects.filter(transaction_id__startswith='tx_bench_').update(
+        created_at=now - timedelta(days=3)
+    )
+
+    version_ids = intern_cache.ids_for(InternedString.APP_VERSION, {'1.0.0', '1.1.0', '1.2.0'})
+    session_count = max(int(2000 * scale), 10)
+    sessions = []
+    for i in range(session_count):
+        sessions.append(SessionMetrics(
+            session_id=f"s_bench_{i}",
+            user=users[i % len(users)] if i % 3 else None,
+            install_id=f"iid_bench_{i % (session_count // 2 or 1)}",
+            app_version=rng.choice(list(version_ids)),
+            user_props={'sign': rng.choice(SIGNS), 'is_premium': i % 5 == 0},
+            start_time=now - timedelta(minutes=i),
+        ))
+    SessionMetrics.objects.bulk_create(sessions, batch_size=1000)
+
+    names = [name for name, _ in AnalyticsEvent.EVENT_TYPES]
+    start_ms = int((now - timedelta(days=7)).timestamp() * 1000)
+    events = []
+    for i in range(max(int(100000 * scale), 100)):
+        name = rng.choice(names)
+        events.append(AnalyticsEvent(
+            event_code=AnalyticsEvent.code_for(name),
+            timestamp=start_ms + i * 5000,
+            session_id=f"s_bench_{i % session_count}",
+            version_id=version_ids[rng.choice(list(version_ids))],
+            params={'screen': 'today'} if name == 'screen_view' else {},
+        ))
+        if len(events) >= 5000:
+            AnalyticsEvent.objects.bulk_create(events)
+            events = []
+    AnalyticsEvent.objects.bulk_create(events)
+
+    return {
+        'tokens': [generate_jwt_token(user) for user in users[:200]],
+        'pending_transactions': list(
+            Transaction.objects.filter(status='pending').values_list('transaction_id', flat=True)[:5000]
+        ),
+        'run_id': uuid.uuid4().hex[:8],
+    }
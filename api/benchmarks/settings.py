@@ -0,0 +1,45 @@
+"""
+Settings for the benchmark suite (see benchmarks/run.py)
+
+Tables are created straight from the models, and the database is a throwaway
+SQLite file unless BENCH_DATABASE_URL points at a PostgreSQL stand-in.
+"""
+import os
+import tempfile
+
+from config.settings import *
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+MIGRATION_MODULES = {
+    app: None for app in ['accounts', 'predictions', 'compatibility', 'payments', 'analytics',
+                          'jobs', 'admin', 'auth', 'contenttypes', 'sessions']
+}
+
+if os.environ.get('BENCH_DATABASE_URL'):
+    import dj_database_url
+
+    DATABASES = {'default': dj_database_url.parse(os.environ['BENCH_DATABASE_URL'])}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_SQLITE_PATH') or os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.sqlite3'),
+            'OPTIONS': {'timeout': 30},
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': True,
+    'root': {'handlers': [], 'level': 'CRITICAL'},
+}
@@ -3,4 +3,12 @@ from django.apps import AppConfig
 
 class CompatibilityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'compatibility'
\ No newline at end of file
+    name = 'compatibility'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .matrix import compatibility_matrix
+        from .models import CompatibilityPair
+
+        post_save.connect(compatibility_matrix.invalidate, sender=CompatibilityPair)
+        post_delete.connect(compatibility_matrix.invalidate, sender=CompatibilityPair)
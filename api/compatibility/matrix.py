@@ -0,0 +1,70 @@
+"""
+In-memory compatibility matrix (preloaded by config/warmup.py)
+
+All 78 sign pairs are loaded with one query into a frozen mapping keyed by
+the alphabetically ordered pair. Pairs that are not in the database yet are
+generated and stored first, so after warm-up the view never needs a query.
+Saving or deleting a CompatibilityPair rebuilds the matrix in every process.
+"""
+from itertools import combinations_with_replacement
+
+from config.warmup import Snapshot, freeze
+
+from .data_generator import CompatibilityDataGenerator
+from .models import CompatibilityPair
+
+SIGNS = sorted(CompatibilityDataGenerator.ELEMENT_MAP)
+
+
+def pair_data(pair):
+    return freeze({
+        'overall': pair.overall_score,
+        'categories': {
+            'love': pair.love_score,
+            'career': pair.career_score,
+            'friendship': pair.friendship_score
+        },
+        'preview': pair.preview_text,
+        'premium_text': pair.premium_text
+    })
+
+
+def load_matrix():
+    pairs = {(pair.sign_a, pair.sign_b): pair for pair in CompatibilityPair.objects.all()}
+
+    missing = [key for key in combinations_with_replacement(SIGNS, 2) if key not in pairs]
+    if missing:
+        new_pairs = []
+        for sign_a, sign_b in missing:
+            data = CompatibilityDataGenerator.generate_compatibility(sign_a, sign_b)
+            new_pairs.append(CompatibilityPair(
+                sign_a=sign_a,
+                sign_b=sign_b,
+                overall_score=data['overall'],
+                love_score=data['categories']['love'],
+                career_score=data['categories']['career'],
+                friendship_score=data['categories']['friendship'],
+                preview_text=data['preview'],
+                premium_text=data['premium_text']
+            ))
+        # Another process may be filling the same pairs; keep whichever won
+        CompatibilityPair.objects.bulk_create(new_pairs, ignore_conflicts=True)
+        pairs = {(pair.sign_a, pair.sign_b): pair for pair in CompatibilityPair.objects.all()}
+
+    return freeze({key: pair_data(pair) for key, pair in pairs.items()})
+
+
+compatibility_matrix = Snapshot('compatibility.matrix', load_matrix)
+
+
+def get_pair(sign_a, sign_b):
+    """Frozen data for an alphabetically ordered pair, or None if it is not stored yet"""
+    pair = compatibility_matrix.get().get((sign_a, sign_b))
+    if pair is None:
+        row = CompatibilityPair.objects.filter(sign_a=sign_a, sign_b=sign_b).first()
+        pair = pair_data(row) if row is not None else None
+    return pair
+
+
+def warm_matrix():
+    return len(compatibility_matrix.get())
@@ -5,6 +5,8 @@ from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from .models import CompatibilityPair
 from .data_generator import CompatibilityDataGenerator
+from .matrix import get_pair
+from predictions.validation import is_valid_sign
 
 User = get_user_model()
 
@@ -23,8 +25,7 @@ def compatibility(request):
         )
 
     # Validate signs
-    valid_signs = [choice[0] for choice in CompatibilityPair.ZODIAC_SIGNS]
-    if sign_a not in valid_signs or sign_b not in valid_signs:
+    if not is_valid_sign(sign_a) or not is_valid_sign(sign_b):
         return Response(
             {"error": {"code": "INVALID_SIGN", "message": "Invalid zodiac sign"}},
             status=status.HTTP_400_BAD_REQUEST
@@ -36,59 +37,42 @@ def compatibility(request):
         if hasattr(request, 'user') and request.user.is_authenticated:
             is_premium_user = request.user.is_premium_active
 
-        # Try to get existing compatibility data from database
         # Order signs consistently for lookup
         ordered_signs = tuple(sorted([sign_a, sign_b]))
 
-        try:
-            compatibility_pair = CompatibilityPair.objects.get(
-                sign_a=ordered_signs[0],
-                sign_b=ordered_signs[1]
-            )
-
-            response_data = {
-                'signA': sign_a,
-                'signB': sign_b,
-                'overall': compatibility_pair.overall_score,
-                'categories': {
-                    'love': compatibility_pair.love_score,
-                    'career': compatibility_pair.career_score,
-                    'friendship': compatibility_pair.friendship_score
-                },
-                'preview': compatibility_pair.preview_text
-            }
+        # Preloaded matrix first (see compatibility/matrix.py)
+        pair = get_pair(*ordered_signs)
 
-            # Include premium text only for premium users
-            if is_premium_user:
-                response_data['premium_text'] = compatibility_pair.premium_text
-
-        except CompatibilityPair.DoesNotExist:
+        if pair is None:
             # Generate new compatibility data
-            compatibility_data = CompatibilityDataGenerator.generate_compatibility(sign_a, sign_b)
+            pair = CompatibilityDataGenerator.generate_compatibility(sign_a, sign_b)
 
-            # Save to database with ordered signs
-            CompatibilityPair.objects.create(
+            # Save to database with ordered signs (get_or_create: a concurrent
+            # request or a lagging read replica may have missed the row)
+            CompatibilityPair.objects.get_or_create(
                 sign_a=ordered_signs[0],
                 sign_b=ordered_signs[1],
-                overall_score=compatibility_data['overall'],
-                love_score=compatibility_data['categories']['love'],
-                career_score=compatibility_data['categories']['career'],
-                friendship_score=compatibility_data['categories']['friendship'],
-                preview_text=compatibility_data['preview'],
-                premium_text=compatibility_data['premium_text']
+                defaults={
+                    'overall_score': pair['overall'],
+                    'love_score': pair['categories']['love'],
+                    'career_score': pair['categories']['career'],
+                    'friendship_score': pair['categories']['friendship'],
+                    'preview_text': pair['preview'],
+                    'premium_text': pair['premium_text']
+                }
             )
 
-            response_data = {
-                'signA': sign_a,
-                'signB': sign_b,
-                'overall': compatibility_data['overall'],
-                'categories': compatibility_data['categories'],
-                'preview': compatibility_data['preview']
-            }
-
-            # Include premium text only for premium users
-            if is_premium_user:
-                response_data['premium_text'] = compatibility_data['premium_text']
+        response_data = {
+            'signA': sign_a,
+            'signB': sign_b,
+            'overall': pair['overall'],
+            'categories': dict(pair['categories']),
+            'preview': pair['preview']
+        }
+
+        # Include premium text only for premium users
+        if is_premium_user:
+            response_data['premium_text'] = pair['premium_text']
 
         return Response(response_data)
 
@@ -0,0 +1,137 @@
+"""
+Response body compression
+
+Encodings are negotiated from Accept-Encoding: brotli when the optional
+`brotli` package is installed and the client accepts it, gzip otherwise.
+Bodies smaller than COMPRESSION_MIN_BYTES are sent as they are.
+
+Hot bodies (banners, the products catalog, prediction and compatibility
+texts) are byte-identical across requests, so compressed variants are kept in
+a per-process LRU keyed by a hash of the raw body. A body is admitted the
+second time it is seen and is then compressed once at the highest level;
+one-off bodies are compressed at a fast level and not stored.
+"""
+from collections import OrderedDict
+import gzip
+import hashlib
+import threading
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+# (fast level for one-off bodies, level for cached variants)
+GZIP_LEVELS = (6, 9)
+BROTLI_QUALITIES = (4, 11)
+
+# Bodies remembered as "seen once" while waiting for a second sighting
+SEEN_DIGESTS = 4096
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """{encoding: q} for an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate(header):
+    """Best supported encoding the client accepts, or None"""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITIES[best], mode=brotli.MODE_TEXT)
+    return gzip.compress(body, compresslevel=GZIP_LEVELS[best], mtime=0)
+
+
+def is_compressible(content_type):
+    content_type = (content_type or '').lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+class CompressedVariants:
+    """Byte-bounded LRU of compressed bodies, keyed by (encoding, body digest)"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(
+            settings, 'COMPRESSION_CACHE_BYTES', 16 * 1024 * 1024
+        )
+        self._lock = threading.Lock()
+        self._variants = OrderedDict()
+        self._seen = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, body, encoding):
+        """Compressed body, from the cache when this body is hot"""
+        if not self.max_bytes:
+            return compress(body, encoding)
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        with self._lock:
+            compressed = self._variants.get(key)
+            if compressed is not None:
+                self._variants.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+            seen_before = self._seen.pop(key, None) is not None
+            if not seen_before:
+                self._seen[key] = True
+                if len(self._seen) > SEEN_DIGESTS:
+                    self._seen.popitem(last=False)
+
+        if not seen_before:
+            return compress(body, encoding)
+
+        compressed = compress(body, encoding, best=True)
+        with self._lock:
+            if key not in self._variants and len(compressed) <= self.max_bytes:
+                self._variants[key] = compressed
+                self._size += len(compressed)
+                while self._size > self.max_bytes:
+                    _, evicted = self._variants.popitem(last=False)
+                    self._size -= len(evicted)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._variants.clear()
+            self._seen.clear()
+            self._size = 0
+
+
+compressed_variants = CompressedVariants()
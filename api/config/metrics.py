@@ -0,0 +1,145 @@
+"""
+In-process request metrics in Prometheus text format
+
+RequestMetricsMiddleware (config/middleware.py) hands every finished request
+to the module registry, which keeps per-view histograms of wall time, DB time
+and query count plus counters for responses, cache hits/misses and bytes
+sent. Metrics are per worker process; Prometheus should scrape each worker
+(or aggregate them) the usual way. metrics_view serves them at /metrics,
+behind METRICS_TOKEN. Without a token the endpoint is only open with DEBUG on.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+import hmac
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (not thread safe; guarded by the registry lock)"""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.total:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class ViewMetrics:
+    __slots__ = ('duration', 'db_time', 'queries', 'responses', 'cache_hits', 'cache_misses', 'response_bytes')
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_time = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.responses = defaultdict(int)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.response_bytes = 0
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(ViewMetrics)
+
+    def observe(self, view, method, status_code, stats):
+        """Record one finished request (stats is a middleware RequestStats)"""
+        with self._lock:
+            metrics = self._views[(view, method)]
+            metrics.duration.observe(stats.duration)
+            metrics.db_time.observe(stats.db_time)
+            metrics.queries.observe(stats.queries)
+            metrics.responses[status_code] += 1
+            metrics.cache_hits += stats.cache_hits
+            metrics.cache_misses += stats.cache_misses
+            metrics.response_bytes += stats.response_bytes
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Prometheus text exposition of everything recorded so far"""
+        with self._lock:
+            views = sorted(self._views.items())
+            histograms = {
+                'http_request_duration_seconds': ('Request wall time', [
+                    (labels, m.duration) for labels, m in views]),
+                'http_request_db_seconds': ('Time spent in SQL per request', [
+                    (labels, m.db_time) for labels, m in views]),
+                'http_request_db_queries': ('SQL queries per request', [
+                    (labels, m.queries) for labels, m in views]),
+            }
+            counters = {
+                'http_request_cache_hits_total': ('Cache reads that found a value', [
+                    (labels, m.cache_hits) for labels, m in views]),
+                'http_request_cache_misses_total': ('Cache reads that found nothing', [
+                    (labels, m.cache_misses) for labels, m in views]),
+                'http_response_bytes_total': ('Response body bytes sent', [
+                    (labels, m.response_bytes) for labels, m in views]),
+            }
+
+            lines = [
+                '# HELP http_responses_total Responses by view, method and status',
+                '# TYPE http_responses_total counter',
+            ]
+            for (view, method), m in views:
+                for code, count in sorted(m.responses.items()):
+                    lines.append(
+                        f'http_responses_total{{view="{escape_label(view)}",method="{method}",status="{code}"}} {count}'
+                    )
+
+            for name, (help_text, series) in histograms.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (view, method), histogram in series:
+                    lines.extend(histogram.lines(name, f'view="{escape_label(view)}",method="{method}"'))
+
+            for name, (help_text, series) in counters.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (view, method), value in series:
+                    lines.append(f'{name}{{view="{escape_label(view)}",method="{method}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,346 @@
+"""
+Project-wide middleware
+
+RequestMetricsMiddleware times every request and counts what it cost: SQL
+queries and SQL time, cache hits and misses on the default cache and response
+bytes. Results are aggregated per resolved view in config.metrics. Requests
+slower than SLOW_REQUEST_MS are logged to the 'performance' logger together
+with their slowest statements.
+
+CompressionMiddleware gzip/brotli-encodes response bodies (see
+config/compression.py).
+
+The WebOnly* classes run Django's session, CSRF, auth, messages and
+clickjacking middleware everywhere except under API_PREFIX: the API is
+stateless, authenticates with JWT in DRF and never uses sessions, messages or
+CSRF cookies, so those layers are pure overhead there.
+
+ReplicaPinningMiddleware gives each request the read-replica routing state
+used by config.routers.PrimaryReplicaRouter.
+
+The current request's stats live in a context variable, which follows the
+request into sync_to_async threads. Every database connection gets a
+permanent execute wrapper that reports to it, so queries are counted for
+sync and async views alike, on any database alias.
+"""
+from contextvars import ContextVar
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+from .compression import compressed_variants, is_compressible, negotiate
+from .metrics import registry
+from .routers import begin_request, end_request, is_sticky, mark_sticky, replica_aliases
+
+logger = logging.getLogger('performance')
+
+# Statements kept per request for the slow-request log
+MAX_CAPTURED_QUERIES = 200
+SLOW_LOG_QUERIES = 10
+
+# Token-authenticated API routes that skip the web middleware
+API_PREFIX = '/api/'
+
+# Requests that are not measured (the scrape itself)
+SKIP_PATHS = ('/metrics',)
+
+_current = ContextVar('request_stats', default=None)
+_MISSING = object()
+
+
+class RequestStats:
+    __slots__ = ('duration', 'db_time', 'queries', 'cache_hits', 'cache_misses', 'response_bytes', 'statements')
+
+    def __init__(self, capture_sql):
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.response_bytes = 0
+        self.statements = [] if capture_sql else None
+
+    def record_query(self, sql, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        if self.statements is not None and len(self.statements) < MAX_CAPTURED_QUERIES:
+            self.statements.append((elapsed, sql))
+
+
+def record_queries(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+connection_created.connect(install_query_recorder)
+
+
+def instrument_cache(backend):
+    """
+    Count hits and misses of get/get_many on a cache backend instance.
+
+    Backends are per thread, so each instance is wrapped once; outside of a
+    request the wrappers only pass calls through.
+    """
+    if getattr(backend, '_metrics_instrumented', False):
+        return
+    original_get = backend.get
+    original_get_many = backend.get_many
+
+    def get(key, default=None, version=None):
+        value = original_get(key, _MISSING, version=version)
+        stats = _current.get()
+        if stats is not None:
+            if value is _MISSING:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(keys, version=None):
+        keys = list(keys)
+        # Some backends implement get_many with get(); count the keys once
+        token = _current.set(None)
+        try:
+            found = original_get_many(keys, version=version)
+        finally:
+            _current.reset(token)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+    backend.get = get
+    backend.get_many = get_many
+    backend._metrics_instrumented = True
+
+
+def view_name(request):
+    """Dotted path of the view that handled the request, e.g. predictions.views.daily_prediction"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match._func_path
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path in SKIP_PATHS:
+            return self.get_response(request)
+
+        stats, token = self.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if request.path in SKIP_PATHS:
+            return await self.get_response(request)
+
+        stats, token = self.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def start(self):
+        instrument_cache(caches['default'])
+        stats = RequestStats(capture_sql=self.slow_ms is not None)
+        return stats, _current.set(stats)
+
+    def finish(self, request, response, stats, started):
+        stats.duration = time.perf_counter() - started
+        if not response.streaming:
+            stats.response_bytes = len(response.content)
+        view = view_name(request)
+        registry.observe(view, request.method, response.status_code, stats)
+
+        if self.slow_ms is not None and stats.duration * 1000 >= self.slow_ms:
+            self.log_slow(request, view, response, stats)
+        return response
+
+    def log_slow(self, request, view, response, stats):
+        slowest = sorted(stats.statements, key=lambda s: s[0], reverse=True)[:SLOW_LOG_QUERIES]
+        statements = '\n'.join(f"  {elapsed * 1000:.1f}ms {sql}" for elapsed, sql in slowest)
+        logger.warning(
+            f"Slow request {request.method} {request.path} ({view}) -> {response.status_code}: "
+            f"{stats.duration * 1000:.0f}ms, {stats.queries} queries in {stats.db_time * 1000:.0f}ms, "
+            f"cache {stats.cache_hits} hits/{stats.cache_misses} misses"
+            + (f"\n{statements}" if statements else '')
+        )
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep a request's reads on the primary when it writes, or when the same
+    client wrote moments ago (see config/routers.py)
+    """
+    sync_capable = True
+    async_capable = True
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        client_id, token = self.start(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(client_id, token)
+
+    async def __acall__(self, request):
+        client_id, token = self.start(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(client_id, token)
+
+    def start(self, request):
+        if not replica_aliases():
+            return None, begin_request(pinned=False)
+        client_id = request.META.get('HTTP_AUTHORIZATION', '')
+        pinned = request.method not in self.SAFE_METHODS or is_sticky(client_id)
+        return client_id, begin_request(pinned=pinned)
+
+    def finish(self, client_id, token):
+        state = end_request(token)
+        if client_id and state.wrote:
+            mark_sticky(client_id)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least COMPRESSION_MIN_BYTES with the best
+    encoding the client accepts; hot bodies come from compressed_variants
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, 'COMPRESSION_MIN_BYTES', 512)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not is_compressible(response.get('Content-Type')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_bytes:
+            return response
+
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = compressed_variants.get(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed body is a different representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+def is_api_request(request):
+    return request.path_info.startswith(API_PREFIX)
+
+
+def skip_for_api(middleware_class, method_name):
+    """Hook that defers to middleware_class except on API requests"""
+    method = getattr(middleware_class, method_name)
+
+    def hook(self, request, *args):
+        if is_api_request(request):
+            # process_template_response must hand the response back
+            return args[0] if method_name == 'process_template_response' else None
+        return method(self, request, *args)
+    hook.__name__ = method_name
+    return hook
+
+
+def web_only(middleware_path):
+    """
+    Subclass of the middleware at `middleware_path` that does nothing under
+    API_PREFIX. Being a subclass keeps the admin's middleware checks happy.
+    """
+    middleware_class = import_string(middleware_path)
+
+    def __call__(self, request):
+        if is_api_request(request):
+            # A coroutine when the chain is async; the handler awaits it
+            return self.get_response(request)
+        return middleware_class.__call__(self, request)
+
+    namespace = {'__call__': __call__, '__module__': __name__}
+    for method_name in ('process_view', 'process_exception', 'process_template_response'):
+        if hasattr(middleware_class, method_name):
+            namespace[method_name] = skip_for_api(middleware_class, method_name)
+    return type(f"WebOnly{middleware_class.__name__}", (middleware_class,), namespace)
+
+
+WebOnlySessionMiddleware = web_only('django.contrib.sessions.middleware.SessionMiddleware')
+WebOnlyCsrfViewMiddleware = web_only('django.middleware.csrf.CsrfViewMiddleware')
+WebOnlyAuthenticationMiddleware = web_only('django.contrib.auth.middleware.AuthenticationMiddleware')
+WebOnlyMessageMiddleware = web_only('django.contrib.messages.middleware.MessageMiddleware')
+WebOnlyXFrameOptionsMiddleware = web_only('django.middleware.clickjacking.XFrameOptionsMiddleware')
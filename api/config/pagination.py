@@ -0,0 +1,173 @@
+"""
+Keyset pagination helpers for very large tables
+
+EstimatedCountPaginator replaces the exact COUNT(*) with planner statistics on
+PostgreSQL once a table is big enough for the estimate to be meaningful.
+KeysetPaginationMixin switches a ModelAdmin's default ordering to keyset
+("Next page" after the last row shown) navigation instead of OFFSET pages.
+encode_cursor/decode_cursor give API views the same opaque cursors.
+"""
+import base64
+import binascii
+import json
+
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after'
+
+
+def encode_cursor(*values):
+    """Opaque URL-safe cursor for a keyset position"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Values of a cursor made by encode_cursor; raises ValueError when malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, UnicodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def estimate_count(queryset):
+    """Planner row estimate for a queryset, or None when the backend has none"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] >= 0 else None
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts planner statistics above `exact_count_threshold` rows"""
+
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list) if hasattr(self.object_list, 'query') else None
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages with `?after=<cursor>` on (ordering field, pk).
+
+    Used for the admin's default ordering only; when a column header is
+    clicked the regular numbered pagination takes over.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filtering or sorting starts over from the first page
+        remove = list(remove or [])
+        if CURSOR_VAR not in (new_params or {}):
+            remove.append(CURSOR_VAR)
+        return super().get_query_string(new_params, remove)
+
+    @cached_property
+    def keyset_field(self):
+        ordering = list(self.model_admin.ordering or [])
+        if len(ordering) != 1 or ORDER_VAR in self.params or self.page_num != 1:
+            return None
+        return ordering[0]
+
+    def get_results(self, request):
+        if not self.keyset_field:
+            self.keyset = False
+            return super().get_results(request)
+
+        self.keyset = True
+        descending = self.keyset_field.startswith('-')
+        field_name = self.keyset_field.lstrip('-')
+        pk_name = self.opts.pk.name
+        direction = '-' if descending else ''
+
+        queryset = self.queryset.order_by(f'{direction}{field_name}', f'{direction}{pk_name}')
+        if self.cursor:
+            try:
+                value, pk = self.decode_cursor(field_name, self.cursor)
+            except (ValueError, TypeError):
+                value = pk = None
+            if pk is not None:
+                lookup = 'lt' if descending else 'gt'
+                queryset = queryset.filter(
+                    Q(**{f'{field_name}__{lookup}': value}) |
+                    Q(**{field_name: value, f'{pk_name}__{lookup}': pk})
+                )
+
+        rows = list(queryset[:self.list_per_page + 1])
+        has_next = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_next or bool(self.cursor)
+        self.next_cursor = self.encode_cursor(field_name, rows[-1]) if has_next else None
+
+    def encode_cursor(self, field_name, obj):
+        field = self.opts.get_field(field_name)
+        return encode_cursor(field.value_to_string(obj), obj.pk)
+
+    def decode_cursor(self, field_name, cursor):
+        value, pk = decode_cursor(cursor)
+        field = self.opts.get_field(field_name)
+        return field.to_python(value), self.opts.pk.to_python(pk)
+
+    @property
+    def next_page_url(self):
+        if self.next_cursor:
+            return self.get_query_string({CURSOR_VAR: self.next_cursor}, [PAGE_VAR])
+        return None
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(None, [PAGE_VAR, CURSOR_VAR])
+
+
+class KeysetPaginationMixin:
+    """ModelAdmin mixin: estimated counts and keyset navigation for big tables"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,74 @@
+"""
+Fast JSON rendering and parsing for the API
+
+FastJSONRenderer and FastJSONParser are drop-in replacements for DRF's
+JSONRenderer and JSONParser that use orjson when it is installed and fall
+back to DRF otherwise. Output follows DRF's encoder: datetimes end in 'Z'
+when in UTC, Decimals become numbers, UUIDs strings and U+2028/U+2029 are
+escaped, so clients see the same bytes either way.
+
+Views that already hold a serialized body (pre-rendered or cached) return
+Response(PreRenderedJSON(body)) and the renderer sends it as is.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder ('Z' suffix instead of '+00:00')
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = JSONEncoder()
+
+
+class PreRenderedJSON(bytes):
+    """UTF-8 JSON body that the renderer passes through without re-encoding"""
+
+
+def _escape_separators(body):
+    if b'\xe2\x80\xa8' in body or b'\xe2\x80\xa9' in body:
+        body = body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return body
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes, identical to DRF's JSONRenderer output"""
+    if orjson is not None:
+        try:
+            return _escape_separators(orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS))
+        except (orjson.JSONEncodeError, TypeError):
+            pass  # e.g. integers beyond 64 bits; let the stdlib encoder decide
+    return JSONRenderer().render(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, PreRenderedJSON):
+            return bytes(data)
+        if data is None:
+            return b''
+        # Indented output is only asked for when debugging; leave it to DRF
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read() if stream is not None else b''
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError, LookupError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,237 @@
+"""
+Database routing: the analytics database and read replicas
+
+AnalyticsRouter keeps the whole analytics app (events, session metrics and
+their rollups) on the ANALYTICS_DATABASE alias when it is configured, so the
+event insert stream does not compete with user-facing queries for locks, WAL
+and buffer cache. Analytics rows reference users by id only (no database
+constraint), and analytics_database() names the alias for transactions.
+
+PrimaryReplicaRouter sends reads of the read-mostly models listed in
+REPLICA_READ_MODELS (predictions, banners, compatibility, payment plans and
+session metrics) to a healthy replica from REPLICA_DATABASES; everything else,
+and every write, uses the primary. Without replicas configured it routes
+nothing.
+
+Reads stay on the primary when:
+
+- the request is a write (POST, PUT, PATCH, DELETE), so checkout, webhooks
+  and onboarding read their own writes;
+- the current request or job already wrote something;
+- the same client (Authorization header) wrote within the last
+  REPLICA_STICKY_SECONDS, so a follow-up GET sees its own change;
+- the read happens inside a transaction on the primary;
+- no replica is within REPLICA_MAX_LAG_SECONDS. Lag is sampled per process
+  every REPLICA_LAG_CHECK_SECONDS; unreachable replicas count as lagging.
+
+ReplicaPinningMiddleware (config/middleware.py) sets up the per-request state.
+"""
+from contextvars import ContextVar
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('performance')
+
+PRIMARY = 'default'
+ANALYTICS_APP = 'analytics'
+STICKY_KEY_PREFIX = 'db:primary-pin'
+
+REPLICA_READ_MODELS = {
+    'predictions.prediction',
+    'predictions.banner',
+    'compatibility.compatibilitypair',
+    'payments.paymentplan',
+    'analytics.sessionmetrics',
+}
+
+# Seconds behind the primary; None when the replica cannot be reached
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    """Per request (or per job) routing flags"""
+
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def routing_state():
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def begin_request(pinned=False):
+    """Fresh routing state for a request; returns the token for end_request"""
+    return _state.set(RoutingState(pinned=pinned))
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def pin_to_primary():
+    """Send the remaining reads of this request or job to the primary"""
+    routing_state().pinned = True
+
+
+def sticky_key(client_id):
+    return f"{STICKY_KEY_PREFIX}:{hashlib.sha1(client_id.encode()).hexdigest()}"
+
+
+def is_sticky(client_id):
+    return bool(client_id) and cache.get(sticky_key(client_id)) is not None
+
+
+def mark_sticky(client_id):
+    cache.set(sticky_key(client_id), 1, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+
+
+def replica_aliases():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+class ReplicaHealth:
+    """Replica lag, sampled at most every REPLICA_LAG_CHECK_SECONDS per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._healthy = None
+        self._checked_at = 0.0
+
+    def healthy(self):
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5)
+        if self._healthy is None or time.monotonic() - self._checked_at >= interval:
+            # One thread refreshes; the others keep using the last answer
+            if self._lock.acquire(blocking=self._healthy is None):
+                try:
+                    self._healthy = self.check()
+                    self._checked_at = time.monotonic()
+                finally:
+                    self._lock.release()
+        return self._healthy
+
+    def check(self):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10)
+        healthy = []
+        for alias in replica_aliases():
+            lag = self.lag(alias)
+            if lag is not None and lag <= max_lag:
+                healthy.append(alias)
+            else:
+                logger.warning(f"Replica {alias} skipped: {'unreachable' if lag is None else f'{lag:.1f}s behind'}")
+        return healthy
+
+    def lag(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(POSTGRES_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            return None
+
+    def reset(self):
+        self._healthy = None
+
+
+replica_health = ReplicaHealth()
+
+
+def analytics_database():
+    """Alias holding the analytics tables ('default' unless a separate one is configured)"""
+    alias = getattr(settings, 'ANALYTICS_DATABASE', None)
+    return alias if alias and alias in settings.DATABASES else PRIMARY
+
+
+class AnalyticsRouter:
+    def _route(self, model, hints):
+        alias = analytics_database()
+        if alias == PRIMARY:
+            return None
+        if model._meta.app_label == ANALYTICS_APP:
+            return alias
+        # Related lookups from an analytics row (e.g. event.user) would
+        # otherwise default to the row's database
+        instance = hints.get('instance')
+        if instance is not None and instance._meta.app_label == ANALYTICS_APP:
+            return PRIMARY
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Analytics rows point at users across databases (no FK constraint)
+        if ANALYTICS_APP in (obj1._meta.app_label, obj2._meta.app_label):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = analytics_database()
+        if alias == PRIMARY:
+            return None
+        if app_label == ANALYTICS_APP:
+            return db == alias
+        if db == alias:
+            return False
+        return None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICA_READ_MODELS or not replica_aliases():
+            return None
+        state = _state.get()
+        if state is not None and state.pinned:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        healthy = replica_health.healthy()
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = routing_state()
+        state.wrote = True
+        state.pinned = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,7 @@
+"""
+Settings package
+
+`config.settings` is the development profile (base.py). Deployments select
+`config.settings.production`, which builds on it from environment variables.
+"""
+from .base import *
@@ -14,7 +14,7 @@ from pathlib import Path
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
 # Quick-start development settings - unsuitable for production
@@ -45,17 +45,22 @@ INSTALLED_APPS = [
     'compatibility',
     'payments',
     'analytics',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'config.middleware.RequestMetricsMiddleware',
+    'config.middleware.CompressionMiddleware',
+    'config.middleware.ReplicaPinningMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Session, CSRF, auth, messages and clickjacking only run outside /api/
+    'config.middleware.WebOnlySessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'config.middleware.WebOnlyCsrfViewMiddleware',
+    'config.middleware.WebOnlyAuthenticationMiddleware',
+    'config.middleware.WebOnlyMessageMiddleware',
+    'config.middleware.WebOnlyXFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -63,7 +68,7 @@ ROOT_URLCONF = 'config.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'config' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -77,6 +82,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+APP_SERVER = os.environ.get('APP_SERVER', 'wsgi')  # 'asgi' when served by uvicorn workers (gunicorn.conf.py)
 
 
 # Database
@@ -89,6 +95,16 @@ DATABASES = {
     }
 }
 
+# Analytics tables move to this alias when it is defined in DATABASES
+ANALYTICS_DATABASE = 'analytics'
+
+# Read replicas (aliases in DATABASES) and how PrimaryReplicaRouter uses them
+DATABASE_ROUTERS = ['config.routers.AnalyticsRouter', 'config.routers.PrimaryReplicaRouter']
+REPLICA_DATABASES = []
+REPLICA_MAX_LAG_SECONDS = 10  # replicas further behind are skipped
+REPLICA_LAG_CHECK_SECONDS = 5
+REPLICA_STICKY_SECONDS = 5  # reads stay on the primary this long after a client writes
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -140,7 +156,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'config.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -161,6 +182,40 @@ JWT_SECRET_KEY = SECRET_KEY
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DELTA = 30  # days
 
+# Analytics settings
+ANALYTICS_DEDUP_WINDOW_SECONDS = 600  # how long client event ids are remembered in-process
+ANALYTICS_DEDUP_MAX_IDS = 200000
+ANALYTICS_RETENTION_DAYS = int(os.environ.get('ANALYTICS_RETENTION_DAYS', 90))  # older events go to the cold archive
+ANALYTICS_ARCHIVE_DIR = Path(os.environ.get('ANALYTICS_ARCHIVE_DIR', BASE_DIR / 'archive' / 'analytics'))
+ANALYTICS_LIVE_FLUSH_SECONDS = 5  # how often each worker pushes live counters to the cache
+ANALYTICS_LIVE_MAX_STREAMS = 1  # open live counter streams per process under WSGI, where each holds a thread
+ANALYTICS_MAX_BATCH_BYTES = 5 * 1024 * 1024  # decoded (post-gzip) size limit for one events POST
+ANALYTICS_SETTLE_SECONDS = 60  # incremental readers leave newer rows to their next run, so in-flight inserts are not skipped
+
+# Payments settings
+GEOIP_DATABASE_PATH = Path(os.environ.get('GEOIP_DATABASE_PATH', BASE_DIR / 'data' / 'geoip.bin'))  # built by build_geoip
+PAYMENT_PROVIDER = os.environ.get('PAYMENT_PROVIDER')  # dotted path to a payments.reconciliation.PaymentProvider
+
+# Request metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # bearer token for /metrics; without one it is only served with DEBUG on
+SLOW_REQUEST_MS = int(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None  # log slower requests with their SQL
+
+# Response compression
+COMPRESSION_MIN_BYTES = 512  # smaller bodies are sent uncompressed
+COMPRESSION_CACHE_BYTES = 16 * 1024 * 1024  # per-process cache of compressed hot bodies
+
+# Startup warm-up (config/warmup.py)
+CONTENT_DIR = Path(os.environ.get('CONTENT_DIR', BASE_DIR.parent / 'content'))  # content/*.json packs loaded into memory
+SNAPSHOT_CHECK_SECONDS = 30  # how often workers check whether a preloaded snapshot was invalidated
+
+# Background jobs (run by `manage.py run_jobs`)
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_SECONDS = 10  # delay before the first retry; doubles with every attempt
+JOB_BACKOFF_MAX_SECONDS = 3600
+JOB_HEARTBEAT_SECONDS = 30  # how often workers mark their running jobs as alive
+JOB_LEASE_SECONDS = 180  # running jobs without a heartbeat for this long are assumed lost with their worker and retried
+JOB_RETENTION_DAYS = 7  # finished jobs (and their timing) are kept this long
+
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -188,5 +243,15 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
@@ -3,9 +3,13 @@ Production settings for Salamene Horoscope API
 """
 
 from .base import *
+import logging
 import os
 import dj_database_url
 
+SECRET_KEY = os.environ['SECRET_KEY']
+JWT_SECRET_KEY = SECRET_KEY
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
@@ -26,6 +30,28 @@ DATABASES = {
     )
 }
 
+# Analytics events and sessions: own database and connection pool, tuned for
+# many small inserts. Asynchronous commit can lose the last few hundred
+# milliseconds of events on a crash but does not wait on WAL flushes.
+if os.environ.get('ANALYTICS_DATABASE_URL'):
+    DATABASES['analytics'] = dj_database_url.parse(
+        os.environ['ANALYTICS_DATABASE_URL'],
+        conn_max_age=600,
+        conn_health_checks=True,
+    )
+    DATABASES['analytics']['OPTIONS'] = {
+        'options': '-c synchronous_commit=off -c statement_timeout=30000 -c lock_timeout=2000',
+        'application_name': 'salamene-analytics',
+    }
+
+# Read replicas: comma-separated URLs, routed by config.routers.PrimaryReplicaRouter
+REPLICA_DATABASES = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+
 # Security
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SECURE_SSL_REDIRECT = True
@@ -36,6 +62,7 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # Static files (WhiteNoise)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Logging
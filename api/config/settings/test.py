@@ -0,0 +1,23 @@
+"""
+Settings for the test suite
+
+    python manage.py test --settings=config.settings.test
+
+No migration files are committed, so test databases are created straight
+from the models.
+"""
+from .base import *
+
+MIGRATION_MODULES = {
+    app: None for app in ['accounts', 'predictions', 'compatibility', 'payments', 'analytics',
+                          'jobs', 'admin', 'auth', 'contenttypes', 'sessions']
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'null': {'class': 'logging.NullHandler'}},
+    'root': {'handlers': ['null']},
+}
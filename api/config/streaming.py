@@ -0,0 +1,38 @@
+"""
+Streaming response bodies for both server profiles (gunicorn.conf.py)
+
+Under ASGI, Django 4.2 collects a StreamingHttpResponse whose iterator is
+synchronous into a list in a worker thread before sending anything, so a
+sync generator loses both streaming and its flat memory use. stream_body()
+hands such a generator to an ASGI server as an async iterator that runs each
+step with sync_to_async. Every step runs in the request's sync thread, so a
+server-side cursor keeps its connection. Under WSGI the generator is used as
+it is.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_done = object()
+
+
+async def iterate_in_thread(iterator):
+    """Async iterator over a sync one, advanced in the request's sync thread"""
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(iterator, _done)
+            if chunk is _done:
+                break
+            yield chunk
+    finally:
+        # Client went away or the stream ended: let the generator clean up (cursors)
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def stream_body(iterator):
+    """Streaming content suited to APP_SERVER: async under ASGI, as is under WSGI"""
+    if getattr(settings, 'APP_SERVER', 'wsgi') == 'asgi':
+        return iterate_in_thread(iter(iterator))
+    return iterator
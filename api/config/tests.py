@@ -0,0 +1,322 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import gzip
+import io
+import unittest
+from unittest import mock
+import uuid
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from config import compression, renderers, warmup
+from config.compression import CompressedVariants, compressed_variants, negotiate
+from config.metrics import metrics_view
+from config.middleware import (
+    CompressionMiddleware, WebOnlyAuthenticationMiddleware, WebOnlyCsrfViewMiddleware, WebOnlySessionMiddleware,
+    WebOnlyXFrameOptionsMiddleware,
+)
+from config.renderers import FastJSONParser, FastJSONRenderer, PreRenderedJSON, dumps
+from config.streaming import stream_body
+
+calls = []
+broken = set()
+
+
+def preload(name):
+    calls.append(name)
+    if name in broken:
+        raise ConnectionError(f"{name} unavailable")
+    return 1
+
+
+def load_matrix():
+    return preload('matrix')
+
+
+def load_banners():
+    return preload('banners')
+
+
+@mock.patch.object(warmup, 'PRELOADS', (
+    ('matrix', 'config.tests.load_matrix'),
+    ('banners', 'config.tests.load_banners'),
+))
+class WarmTests(SimpleTestCase):
+    def setUp(self):
+        calls.clear()
+        broken.clear()
+        patcher = mock.patch.object(warmup, 'state', warmup.WarmState())
+        self.state = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_runs_only_failed_preloads(self):
+        broken.add('banners')
+        warmup.warm()
+        self.assertFalse(self.state.ready)
+        self.assertEqual(calls, ['matrix', 'banners'])
+
+        broken.clear()
+        warmup.warm()
+
+        self.assertTrue(self.state.ready)
+        self.assertEqual(calls, ['matrix', 'banners', 'banners'])
+
+    def test_probe_backs_off_and_does_not_load_inline(self):
+        broken.add('banners')
+        warmup.warm()
+        calls.clear()
+
+        response = warmup.readiness_view(RequestFactory().get('/ready'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(calls, [])
+        self.assertFalse(warmup.retry_warm())
+        self.assertEqual(self.state.failures, 1)
+
+    def test_backoff_doubles_while_failing(self):
+        broken.add('banners')
+        with mock.patch.object(warmup.time, 'monotonic', return_value=100.0):
+            warmup.warm()
+            self.assertEqual(self.state.retry_at, 101.0)
+            warmup.warm()
+            self.assertEqual(self.state.retry_at, 102.0)
+            warmup.warm()
+            self.assertEqual(self.state.retry_at, 104.0)
+
+    def test_due_retry_runs_in_the_background(self):
+        broken.add('banners')
+        warmup.warm()
+        broken.clear()
+        self.state.retry_at = 0.0
+
+        self.assertTrue(warmup.retry_warm())
+        with warmup._retry_lock:  # released when the retry thread is done
+            pass
+
+        self.assertTrue(self.state.ready)
+        self.assertEqual(calls, ['matrix', 'banners', 'banners'])
+
+
+class MetricsAccessTests(SimpleTestCase):
+    def get(self, **headers):
+        return metrics_view(RequestFactory().get('/metrics', **headers))
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_refused_without_a_token_outside_debug(self):
+        self.assertEqual(self.get().status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=True)
+    def test_open_without_a_token_in_debug(self):
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret', DEBUG=False)
+    def test_token_is_checked(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class StreamBodyTests(SimpleTestCase):
+    def chunks(self, closed):
+        try:
+            yield b'a'
+            yield b'b'
+        finally:
+            closed.append(True)
+
+    @override_settings(APP_SERVER='wsgi')
+    def test_wsgi_keeps_the_generator(self):
+        stream = self.chunks([])
+
+        self.assertIs(stream_body(stream), stream)
+
+    @override_settings(APP_SERVER='asgi')
+    def test_asgi_gets_an_async_iterator(self):
+        closed = []
+        body = stream_body(self.chunks(closed))
+
+        async def collect():
+            return [chunk async for chunk in body]
+
+        self.assertTrue(hasattr(body, '__aiter__'))
+        self.assertEqual(async_to_sync(collect)(), [b'a', b'b'])
+        self.assertEqual(closed, [True])
+
+    @override_settings(APP_SERVER='asgi')
+    def test_abandoned_stream_closes_the_generator(self):
+        closed = []
+        body = stream_body(self.chunks(closed))
+
+        async def first():
+            chunk = await body.__anext__()
+            await body.aclose()
+            return chunk
+
+        self.assertEqual(async_to_sync(first)(), b'a')
+        self.assertEqual(closed, [True])
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        'when': datetime(2024, 1, 1, 12, 30, tzinfo=dt_timezone.utc),
+        'price': Decimal('4.99'),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'text': 'line\u2028break\u2029 \u2648 "quoted"',
+        'nested': [1, 2.5, None, True, {'k': 'v'}],
+        1: 'int key',
+        'big': 2 ** 70,
+    }
+
+    def test_output_matches_drf(self):
+        self.assertEqual(dumps(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_same_output_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(dumps(self.data), JSONRenderer().render(self.data))
+
+    def test_pre_rendered_body_is_passed_through(self):
+        body = PreRenderedJSON(b'{"cached":  true}')
+
+        self.assertEqual(FastJSONRenderer().render(body), b'{"cached":  true}')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent_falls_back_to_drf(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+    def test_parser(self):
+        parser = FastJSONParser()
+
+        self.assertEqual(parser.parse(io.BytesIO('{"sign": "\u2648"}'.encode())), {'sign': '\u2648'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{broken'))
+
+
+class NegotiationTests(SimpleTestCase):
+    def test_gzip_without_brotli(self):
+        with mock.patch.object(compression, 'brotli', None):
+            self.assertEqual(negotiate('gzip, deflate, br'), 'gzip')
+            self.assertEqual(negotiate('br'), None)
+            self.assertEqual(negotiate('*'), 'gzip')
+            self.assertEqual(negotiate('gzip;q=0, *;q=1'), None)
+            self.assertEqual(negotiate('identity'), None)
+            self.assertEqual(negotiate(''), None)
+
+    @unittest.skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred_unless_weighted_lower(self):
+        self.assertEqual(negotiate('gzip, br'), 'br')
+        self.assertEqual(negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(negotiate('gzip;q=bad, br;q=0.1'), 'br')
+
+
+@override_settings(COMPRESSION_MIN_BYTES=512)
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"text": "' + b'the stars align ' * 100 + b'"}'
+
+    def setUp(self):
+        compressed_variants.clear()
+        self.addCleanup(compressed_variants.clear)
+
+    def respond(self, response, accept='gzip'):
+        request = RequestFactory().get('/api/v1/banners/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json(self, body=None, **headers):
+        response = HttpResponse(self.body if body is None else body, content_type='application/json')
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_compresses_with_gzip_and_weakens_the_etag(self):
+        response = self.respond(self.json(ETag='"abc"'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_weak_etag_is_kept(self):
+        self.assertEqual(self.respond(self.json(ETag='W/"abc"'))['ETag'], 'W/"abc"')
+
+    def test_small_bodies_are_sent_as_is(self):
+        response = self.respond(self.json(b'{"ok": true}', ETag='"abc"'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['ETag'], '"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_skipped_responses(self):
+        streaming = StreamingHttpResponse(iter([self.body]), content_type='application/json')
+        image = HttpResponse(self.body, content_type='image/png')
+
+        self.assertFalse(self.respond(streaming).has_header('Content-Encoding'))
+        self.assertFalse(self.respond(image).has_header('Content-Encoding'))
+        self.assertFalse(self.respond(self.json(), accept='identity').has_header('Content-Encoding'))
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_hot_bodies_are_cached_from_the_second_sighting(self):
+        variants = CompressedVariants(max_bytes=1 << 20)
+
+        first = variants.get(self.body, 'gzip')
+        second = variants.get(self.body, 'gzip')
+        third = variants.get(self.body, 'gzip')
+
+        self.assertEqual((variants.hits, variants.misses), (1, 2))
+        self.assertIs(third, second)
+        self.assertEqual(gzip.decompress(first), gzip.decompress(third))
+
+
+class WebOnlyMiddlewareTests(TestCase):
+    def run_chain(self, path):
+        request = RequestFactory().post(path)
+        handler = WebOnlySessionMiddleware(WebOnlyAuthenticationMiddleware(WebOnlyXFrameOptionsMiddleware(
+            lambda request: HttpResponse('ok')
+        )))
+        return request, handler(request)
+
+    def test_api_requests_skip_session_auth_and_framing(self):
+        request, response = self.run_chain('/api/v1/banners/')
+
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(hasattr(request, 'user'))
+        self.assertFalse(response.has_header('X-Frame-Options'))
+
+    def test_other_requests_keep_them(self):
+        request, response = self.run_chain('/admin/login/')
+
+        self.assertTrue(hasattr(request, 'session'))
+        self.assertFalse(request.user.is_authenticated)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+    def test_csrf_is_only_checked_outside_the_api(self):
+        def view(request):
+            return HttpResponse('ok')
+        middleware = WebOnlyCsrfViewMiddleware(view)
+
+        self.assertIsNone(middleware.process_view(RequestFactory().post('/api/v1/banners/'), view, (), {}))
+        refused = middleware.process_view(RequestFactory().post('/admin/login/'), view, (), {})
+        self.assertEqual(refused.status_code, 403)
+
+    def test_admin_is_still_protected(self):
+        client = Client(enforce_csrf_checks=True)
+
+        page = client.get('/admin/login/')
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(page['X-Frame-Options'], 'DENY')
+        self.assertEqual(client.post('/admin/login/', {'username': 'a', 'password': 'b'}).status_code, 403)
+        self.assertEqual(client.get('/admin/').status_code, 302)
+
+    def test_api_responses_set_no_cookies(self):
+        response = Client(enforce_csrf_checks=True).get('/api/v1/payments/products/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.cookies)
+        self.assertFalse(response.has_header('X-Frame-Options'))
@@ -17,8 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+from .warmup import readiness_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('ready', readiness_view, name='ready'),
     path('api/v1/', include([
         path('auth/', include('accounts.urls')),
         path('users/', include('accounts.user_urls')),
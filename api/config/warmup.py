@@ -0,0 +1,200 @@
+"""
+Startup warm-up and fork-shared snapshots
+
+The read-mostly data every worker needs (the compatibility matrix, the active
+banners, the plan catalog, the prediction templates and the content/*.json
+packs) is loaded by warm() into immutable structures. Under gunicorn with
+preload_app (gunicorn.conf.py), prefork() runs it once in the master process
+and then calls gc.freeze(), so the objects sit in the permanent generation:
+the collector in the workers never writes to their headers and the pages
+stay shared copy-on-write instead of being duplicated per worker. Without
+preloading, each worker warms itself after it starts.
+
+Snapshot holds one of those structures. It is rebuilt only when the data
+changes: invalidate() (connected to the models' save/delete signals) stores a
+new generation in the cache, and every process compares generations at most
+every SNAPSHOT_CHECK_SECONDS.
+
+readiness_view serves the warm state at /ready and answers 503 until every
+preload has succeeded. The probe never loads anything itself: while some
+preloads are failing it starts a background retry of just those, at most
+once per backoff interval (doubling up to WARM_RETRY_MAX_SECONDS), so a
+database outage does not turn probes into a stream of queries and writes.
+"""
+import gc
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('performance')
+
+GENERATION_KEY_PREFIX = 'snapshot:generation'
+
+# Backoff between retries of failed preloads
+WARM_RETRY_MIN_SECONDS = 1
+WARM_RETRY_MAX_SECONDS = 60
+
+# (name, dotted path of a callable that loads the data and returns its size)
+PRELOADS = (
+    ('prediction_templates', 'predictions.content.warm_templates'),
+    ('content_packs', 'predictions.content.warm_content_packs'),
+    ('banners', 'predictions.content.warm_banners'),
+    ('compatibility_matrix', 'compatibility.matrix.warm_matrix'),
+    ('plan_catalog', 'payments.catalog.warm_catalog'),
+    ('geoip', 'payments.geoip.warm_database'),
+)
+
+
+def freeze(value):
+    """Read-only copy of decoded JSON: dicts become mapping proxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Snapshot:
+    """Process-wide immutable value built by `loader`, rebuilt after invalidate()"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.cache_key = f"{GENERATION_KEY_PREFIX}:{name}"
+        self._lock = threading.Lock()
+        self._value = None
+        self._generation = None
+        self._checked_at = 0.0
+
+    def get(self):
+        interval = getattr(settings, 'SNAPSHOT_CHECK_SECONDS', 30)
+        value = self._value
+        if value is not None and time.monotonic() - self._checked_at < interval:
+            return value
+
+        with self._lock:
+            if self._value is None or time.monotonic() - self._checked_at >= interval:
+                # Read the generation first so a change made while loading
+                # is picked up by the next check
+                generation = cache.get(self.cache_key)
+                if self._value is None or generation != self._generation:
+                    self._value = self.loader()
+                    self._generation = generation
+                self._checked_at = time.monotonic()
+            return self._value
+
+    def invalidate(self, **kwargs):
+        """Make every process rebuild the snapshot (usable as a signal receiver)"""
+        cache.set(self.cache_key, uuid.uuid4().hex, None)
+        self._value = None
+
+
+class WarmState:
+    def __init__(self):
+        self.ready = False
+        self.pid = None
+        self.duration_ms = None
+        self.frozen_objects = 0
+        self.items = {}
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def as_dict(self):
+        return {
+            'status': 'ready' if self.ready else 'warming',
+            'pid': os.getpid(),
+            'preloaded': self.pid is not None and self.pid != os.getpid(),
+            'duration_ms': self.duration_ms,
+            'frozen_objects': self.frozen_objects,
+            'items': self.items,
+        }
+
+
+state = WarmState()
+_lock = threading.Lock()
+_retry_lock = threading.Lock()
+
+
+def warm():
+    """Run the preloads that have not succeeded in this process yet"""
+    with _lock:
+        if state.ready:
+            return state
+
+        started = time.perf_counter()
+        items = dict(state.items)
+        for name, path in PRELOADS:
+            if items.get(name, {}).get('ok'):
+                continue
+            item_started = time.perf_counter()
+            try:
+                items[name] = {'ok': True, 'size': import_string(path)()}
+            except Exception as e:
+                logger.exception(f"Warm-up of {name} failed")
+                items[name] = {'ok': False, 'error': str(e)}
+            items[name]['ms'] = round((time.perf_counter() - item_started) * 1000, 1)
+
+        state.items = items
+        if state.pid is None:
+            state.pid = os.getpid()
+        state.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        state.ready = all(item['ok'] for item in items.values())
+        if not state.ready:
+            state.failures += 1
+            delay = min(WARM_RETRY_MAX_SECONDS, WARM_RETRY_MIN_SECONDS * 2 ** (state.failures - 1))
+            state.retry_at = time.monotonic() + delay
+        logger.info(f"Warm-up {'finished' if state.ready else 'incomplete'} in {state.duration_ms}ms")
+        return state
+
+
+def retry_warm():
+    """Start a background retry of the failed preloads if one is due; never blocks"""
+    if state.ready or time.monotonic() < state.retry_at:
+        return False
+    if not _retry_lock.acquire(blocking=False):
+        return False  # a retry is already running
+
+    def run():
+        try:
+            warm()
+        finally:
+            connections.close_all()
+            _retry_lock.release()
+
+    threading.Thread(target=run, name='warm-retry', daemon=True).start()
+    return True
+
+
+def prefork():
+    """
+    Warm up in the gunicorn master, right before the first worker is forked
+
+    gunicorn.conf.py disables the collector while the app is imported so the
+    heap is not fragmented by collections; it is re-enabled after the freeze.
+    """
+    warm()
+
+    # Workers must open their own database and cache connections
+    connections.close_all()
+    for backend in caches.all(initialized_only=True):
+        backend.close()
+
+    gc.freeze()
+    gc.enable()
+    state.frozen_objects = gc.get_freeze_count()
+
+
+def readiness_view(request):
+    """Readiness probe: 200 once this process is warm, 503 before"""
+    if not state.ready:
+        retry_warm()
+    return JsonResponse(state.as_dict(), status=200 if state.ready else 503)
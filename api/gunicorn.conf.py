@@ -0,0 +1,68 @@
+"""
+Gunicorn settings for the API (picked up automatically from the api/ directory)
+
+APP_SERVER selects the deployment profile:
+
+- wsgi (default): threaded sync workers serving config.wsgi.
+- asgi: uvicorn workers serving config.asgi. Async views (social login) wait
+  on outbound calls on the event loop, so one worker keeps thousands of them
+  in flight; sync views still run in Django's thread pool. Streaming
+  responses use async iterators there (config/streaming.py). Needs the
+  `uvicorn` and `httpx` packages.
+
+With preload_app (GUNICORN_PRELOAD, on by default) the master imports the app
+and runs config.warmup.prefork() before forking, so workers start warm and
+share the preloaded data copy-on-write. Without it, each worker warms itself.
+"""
+import gc
+import multiprocessing
+import os
+
+APP_SERVER = os.environ.get('APP_SERVER', 'wsgi')
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() not in ('0', 'false', 'no')
+
+if preload_app:
+    # Re-enabled by prefork() once the preloaded heap is frozen. This file is
+    # executed again on SIGHUP, when prefork() does not run: on_reload and
+    # post_fork turn the collector back on then.
+    gc.disable()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+if APP_SERVER == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def when_ready(server):
+    # Master process, before the first worker is forked
+    if preload_app:
+        from config.warmup import prefork
+        prefork()
+
+
+def on_reload(server):
+    # Master process, after the configuration was re-read on SIGHUP
+    gc.enable()
+
+
+def post_fork(server, worker):
+    # Worker process: keep inherited objects out of collections, and turn the
+    # collector on in case the master was reloaded with it off
+    gc.freeze()
+    gc.enable()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from config.warmup import warm
+        warm()
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'queue', 'state', 'attempts', 'run_at', 'wait_ms', 'duration_ms', 'finished_at']
+    list_filter = ['state', 'queue', 'name']
+    search_fields = ['=id', 'name', 'key']
+    readonly_fields = ['locked_by', 'started_at', 'heartbeat_at', 'finished_at', 'wait_ms', 'duration_ms', 'result', 'last_error', 'created_at']
+    ordering = ['-id']
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(state='running').update(state='pending', run_at=timezone.now(), attempts=0)
+        self.message_user(request, f"{updated} jobs queued")
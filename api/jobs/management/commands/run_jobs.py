@@ -0,0 +1,42 @@
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import job_stats
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs and enqueue periodic ones (see jobs/worker.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Only run jobs from this queue (repeatable; default: all)')
+        parser.add_argument('--concurrency', type=int, default=1, help='Jobs run at the same time (default: 1)')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds between polls when no job is due (default: 1)')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is due instead of waiting for more')
+        parser.add_argument('--no-schedule', action='store_true', help='Do not enqueue periodic tasks')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print per-task outcomes, timing and backlog as JSON and exit')
+        parser.add_argument('--hours', type=float, default=24, help='Window for --stats (default: 24)')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(job_stats(options['hours']), indent=2))
+            return
+
+        worker = Worker(
+            queues=options['queues'],
+            concurrency=options['concurrency'],
+            poll_interval=options['interval'],
+            run_schedules=not options['no_schedule'],
+            burst=options['burst'],
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        processed = worker.run()
+        self.stdout.write(f"{processed} jobs processed")
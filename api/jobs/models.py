@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A queued run of a registered task (see jobs/registry.py), executed by run_jobs"""
+
+    STATE_CHOICES = [
+        ('pending', 'Pending'),  # waiting for run_at, including retries
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),  # out of attempts
+    ]
+
+    name = models.CharField(max_length=100)  # registered task name
+    kwargs = models.JSONField(default=dict)
+    queue = models.CharField(max_length=50, default='default')
+    priority = models.SmallIntegerField(default=0)  # lower runs first
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True)  # deduplication key
+
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)
+
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)  # worker running it
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # refreshed by the worker while running
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Timing of the latest attempt
+    wait_ms = models.FloatField(null=True, blank=True)  # due until claimed
+    duration_ms = models.FloatField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'queue', 'priority', 'run_at']),
+            models.Index(fields=['name', 'state']),
+            models.Index(fields=['finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} - {self.state}"
@@ -0,0 +1,218 @@
+"""
+Database-backed job queue
+
+Jobs are rows in the jobs table; there is no broker. A worker claims the next
+due job with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can
+poll side by side without blocking each other, and marks it running in the
+same transaction. The job then runs outside any transaction. SQLite has no
+row locks (and cannot upgrade a read transaction while another thread writes),
+so there the conditional UPDATE of the claim alone decides who gets a job.
+
+A failed attempt is retried after an exponential backoff until max_attempts
+is reached. While a job runs, its worker refreshes heartbeat_at every
+JOB_HEARTBEAT_SECONDS, however long the job takes. A running job whose
+heartbeat is older than JOB_LEASE_SECONDS belongs to a worker that died, and
+it is put back. Finished jobs keep their timing (wait and duration of the
+latest attempt) for job_stats() until JOB_RETENTION_DAYS.
+"""
+from contextlib import nullcontext
+from datetime import timedelta
+import json
+import random
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task
+
+PENDING, RUNNING, SUCCEEDED, FAILED = 'pending', 'running', 'succeeded', 'failed'
+
+MAX_ERROR_CHARS = 4000
+
+
+def enqueue(name, kwargs=None, *, run_at=None, delay=None, key=None, queue=None, priority=0, max_attempts=None):
+    """
+    Queue a run of a registered task.
+
+    With `key`, at most one job with that key exists: enqueueing it again
+    returns the existing job.
+    """
+    task = get_task(name)
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    fields = {
+        'name': name,
+        'kwargs': kwargs or {},
+        'queue': queue or task.queue,
+        'priority': priority,
+        'max_attempts': max_attempts or task.max_attempts,
+        'run_at': run_at,
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    job, _ = Job.objects.get_or_create(key=key, defaults=fields)
+    return job
+
+
+def claim(worker_id, queues=None):
+    """Mark the next due job as running for this worker; None when nothing is due"""
+    database = router.db_for_write(Job)
+    locking = connections[database].features.has_select_for_update_skip_locked
+    claimed = 0
+    while not claimed:
+        now = timezone.now()
+        with transaction.atomic(using=database) if locking else nullcontext():
+            due = Job.objects.select_for_update(skip_locked=True).filter(state=PENDING, run_at__lte=now)
+            if queues:
+                due = due.filter(queue__in=queues)
+            job = due.order_by('priority', 'run_at', 'id').first()
+            if job is None:
+                return None
+
+            wait_ms = max(0.0, (now - job.run_at).total_seconds() * 1000)
+            # Always 1 with row locks; 0 when another worker got it first (SQLite).
+            # Matching attempts also rejects a job that was run and put back meanwhile
+            claimed = Job.objects.filter(id=job.id, state=PENDING, attempts=job.attempts).update(
+                state=RUNNING, locked_by=worker_id, started_at=now, heartbeat_at=now, finished_at=None,
+                attempts=F('attempts') + 1, wait_ms=wait_ms, duration_ms=None,
+            )
+
+    job.state = RUNNING
+    job.locked_by = worker_id
+    job.started_at = now
+    job.heartbeat_at = now
+    job.attempts += 1
+    job.wait_ms = wait_ms
+    return job
+
+
+def to_json(value):
+    """`value` as stored in a JSONField, or its repr when it is not serializable"""
+    try:
+        return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def complete(job, result, duration_ms):
+    # Matching locked_by ignores workers whose lease already expired
+    Job.objects.filter(id=job.id, state=RUNNING, locked_by=job.locked_by).update(
+        state=SUCCEEDED, result=to_json(result), last_error='', locked_by='',
+        finished_at=timezone.now(), duration_ms=duration_ms,
+    )
+
+
+def backoff_seconds(attempts):
+    """Delay before retry number `attempts`: doubling from JOB_BACKOFF_SECONDS, with jitter"""
+    base = getattr(settings, 'JOB_BACKOFF_SECONDS', 10)
+    ceiling = getattr(settings, 'JOB_BACKOFF_MAX_SECONDS', 3600)
+    return min(ceiling, base * 2 ** max(0, attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def fail(job, error, duration_ms):
+    """Record a failed attempt; the job is retried later unless it is out of attempts"""
+    now = timezone.now()
+    fields = {'last_error': error[-MAX_ERROR_CHARS:], 'locked_by': '', 'finished_at': now, 'duration_ms': duration_ms}
+    if job.attempts < job.max_attempts:
+        fields.update(state=PENDING, run_at=now + timedelta(seconds=backoff_seconds(job.attempts)))
+    else:
+        fields.update(state=FAILED)
+    Job.objects.filter(id=job.id, state=RUNNING, locked_by=job.locked_by).update(**fields)
+    return fields['state']
+
+
+def heartbeat(worker_id, now=None):
+    """Mark the jobs this worker is running as alive; returns how many"""
+    return Job.objects.filter(state=RUNNING, locked_by=worker_id).update(heartbeat_at=now or timezone.now())
+
+
+def recover_stale(now=None):
+    """Put back running jobs without a heartbeat for JOB_LEASE_SECONDS (their worker died)"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'JOB_LEASE_SECONDS', 180))
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), state=RUNNING
+    )
+    error = 'Lease expired: the worker stopped before finishing the job'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        state=FAILED, last_error=error, locked_by='', finished_at=now,
+    )
+    retried = stale.update(state=PENDING, run_at=now, last_error=error, locked_by='')
+    return failed + retried
+
+
+def schedule(task, now=None):
+    """
+    Enqueue the periodic task for the current `every`-second slot.
+
+    The slot key makes this safe to call from every worker. Nothing is queued
+    while an earlier run is still pending or running. Returns the job, or
+    None when a run is already in progress.
+    """
+    now = now or timezone.now()
+    if Job.objects.filter(name=task.name, state__in=(PENDING, RUNNING)).exists():
+        return None
+    slot = int(now.timestamp() // task.every)
+    return enqueue(task.name, key=f"schedule:{task.name}:{slot}", run_at=now)
+
+
+def prune(now=None):
+    """Delete finished jobs older than JOB_RETENTION_DAYS"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=getattr(settings, 'JOB_RETENTION_DAYS', 7))
+    deleted, _ = Job.objects.filter(state__in=(SUCCEEDED, FAILED), finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list, rounded to 0.1"""
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))], 1)
+
+
+def job_stats(hours=24, now=None):
+    """Per task: outcomes, timing of jobs finished in the last `hours`, and backlog"""
+    now = now or timezone.now()
+    stats = {}
+
+    def entry(name):
+        return stats.setdefault(name, {
+            'succeeded': 0, 'failed': 0, 'retrying': 0, 'running': 0, 'due': 0,
+            'oldest_due_seconds': None, 'durations': [], 'waits': [],
+        })
+
+    finished = Job.objects.filter(finished_at__gte=now - timedelta(hours=hours)).values_list(
+        'name', 'state', 'duration_ms', 'wait_ms'
+    )
+    for name, state, duration_ms, wait_ms in finished.iterator(chunk_size=5000):
+        row = entry(name)
+        row['retrying' if state == PENDING else state] += 1
+        if duration_ms is not None:
+            row['durations'].append(duration_ms)
+        if wait_ms is not None:
+            row['waits'].append(wait_ms)
+
+    for name in Job.objects.filter(state=RUNNING).values_list('name', flat=True):
+        entry(name)['running'] += 1
+
+    backlog = Job.objects.filter(state=PENDING, run_at__lte=now).values('name').annotate(
+        due=Count('id'), oldest=Min('run_at')
+    )
+    for row in backlog:
+        entry(row['name']).update(due=row['due'], oldest_due_seconds=round((now - row['oldest']).total_seconds(), 1))
+
+    for row in stats.values():
+        durations = sorted(row.pop('durations'))
+        waits = sorted(row.pop('waits'))
+        row['duration_ms'] = {
+            'p50': percentile(durations, 0.5),
+            'p95': percentile(durations, 0.95),
+            'max': percentile(durations, 1.0),
+        }
+        row['wait_ms'] = {'p50': percentile(waits, 0.5), 'p95': percentile(waits, 0.95)}
+    return stats
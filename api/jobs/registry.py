@@ -0,0 +1,52 @@
+"""
+Background task registry
+
+Apps register tasks in their tasks.py (imported when the jobs app is ready):
+
+    @task('payments.expire_premium', every=600)
+    def expire_premium():
+        ...
+
+Task functions take JSON-serializable keyword arguments and may return a
+JSON-serializable result, which is stored on the job. `every` (seconds)
+makes run_jobs workers enqueue the task periodically.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class Task:
+    __slots__ = ('name', 'func', 'queue', 'max_attempts', 'every')
+
+    def __init__(self, name, func, queue='default', max_attempts=None, every=None):
+        self.name = name
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+        self.every = every.total_seconds() if isinstance(every, timedelta) else every
+
+
+tasks = {}
+
+
+def task(name, *, queue='default', max_attempts=None, every=None):
+    def decorator(func):
+        registered = tasks.get(name)
+        if registered is not None and registered.func is not func:
+            raise ImproperlyConfigured(f"Task '{name}' is registered twice")
+        tasks[name] = Task(name, func, queue, max_attempts, every)
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return tasks[name]
+    except KeyError:
+        raise LookupError(f"No task registered as '{name}'") from None
+
+
+def scheduled_tasks():
+    return [registered for registered in tasks.values() if registered.every]
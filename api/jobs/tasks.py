@@ -0,0 +1,8 @@
+from .queue import prune
+from .registry import task
+
+
+@task('jobs.prune', every=3600)
+def prune_finished_jobs():
+    """Delete finished jobs past JOB_RETENTION_DAYS"""
+    return prune()
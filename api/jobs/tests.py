@@ -0,0 +1,194 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import (
+    FAILED, PENDING, RUNNING, SUCCEEDED, claim, enqueue, heartbeat, job_stats, recover_stale, schedule,
+)
+from jobs.registry import Task, task
+from jobs.worker import Worker, run_job
+
+calls = []
+
+
+@task('jobs_tests.record', max_attempts=2)
+def record(value=None):
+    calls.append(value)
+    return {'value': value}
+
+
+@task('jobs_tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class ClaimTests(TestCase):
+    def test_claims_due_jobs_once_in_priority_order(self):
+        low = enqueue('jobs_tests.record', {'value': 'low'}, priority=5)
+        high = enqueue('jobs_tests.record', {'value': 'high'}, priority=0)
+        enqueue('jobs_tests.record', delay=3600)
+
+        first = claim('worker-a')
+        second = claim('worker-b')
+
+        self.assertEqual([first.id, second.id], [high.id, low.id])
+        self.assertIsNone(claim('worker-c'))
+        first.refresh_from_db()
+        self.assertEqual((first.state, first.locked_by, first.attempts), (RUNNING, 'worker-a', 1))
+        self.assertIsNotNone(first.heartbeat_at)
+
+    def test_only_claims_from_the_requested_queues(self):
+        enqueue('jobs_tests.record', queue='reports')
+
+        self.assertIsNone(claim('worker', queues=['default']))
+        self.assertIsNotNone(claim('worker', queues=['reports']))
+
+    def test_skips_a_job_another_worker_claimed_first(self):
+        job = enqueue('jobs_tests.record')
+        stale_read = Job.objects.get(id=job.id)
+        claim('worker-a')
+
+        # The other worker read the row before worker-a marked it running
+        with mock.patch('jobs.queue.Job.objects.select_for_update') as select:
+            select.return_value.filter.return_value.order_by.return_value.first.side_effect = [stale_read, None]
+            self.assertIsNone(claim('worker-b'))
+        self.assertEqual(Job.objects.get(id=job.id).locked_by, 'worker-a')
+
+    def test_key_deduplicates(self):
+        first = enqueue('jobs_tests.record', key='once')
+        again = enqueue('jobs_tests.record', key='once')
+
+        self.assertEqual(first.id, again.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+
+class RunJobTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_success_stores_the_result(self):
+        enqueue('jobs_tests.record', {'value': 3})
+
+        self.assertEqual(run_job(claim('worker')), SUCCEEDED)
+
+        job = Job.objects.get()
+        self.assertEqual((job.state, job.result, job.locked_by), (SUCCEEDED, {'value': 3}, ''))
+        self.assertIsNotNone(job.duration_ms)
+        self.assertEqual(calls, [3])
+
+    @override_settings(JOB_BACKOFF_SECONDS=10)
+    def test_failures_back_off_then_fail(self):
+        enqueue('jobs_tests.explode')
+
+        before = timezone.now()
+        self.assertEqual(run_job(claim('worker')), PENDING)
+        job = Job.objects.get()
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=8))
+        self.assertIsNone(claim('worker'))  # not due until the backoff is over
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_job(claim('worker')), FAILED)
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+
+@override_settings(JOB_LEASE_SECONDS=180)
+class RecoverStaleTests(TestCase):
+    def test_puts_back_jobs_without_a_recent_heartbeat(self):
+        enqueue('jobs_tests.record')
+        job = claim('worker')
+        later = timezone.now() + timedelta(seconds=600)
+
+        self.assertEqual(recover_stale(later), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.locked_by), (PENDING, ''))
+
+    def test_long_running_job_with_a_heartbeat_is_kept(self):
+        enqueue('jobs_tests.record')
+        job = claim('worker')
+        later = timezone.now() + timedelta(hours=2)
+
+        self.assertEqual(heartbeat('worker', now=later - timedelta(seconds=30)), 1)
+        self.assertEqual(recover_stale(later), 0)
+        self.assertEqual(Job.objects.get(id=job.id).state, RUNNING)
+
+    def test_job_out_of_attempts_fails(self):
+        enqueue('jobs_tests.record', max_attempts=1)
+        job = claim('worker')
+
+        recover_stale(timezone.now() + timedelta(seconds=600))
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, FAILED)
+        self.assertIn('Lease expired', job.last_error)
+
+    def test_finishing_after_the_lease_expired_changes_nothing(self):
+        enqueue('jobs_tests.record')
+        job = claim('worker-a')
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(seconds=600))
+        recover_stale()
+        claim('worker-b')
+
+        run_job(job)
+
+        self.assertEqual(Job.objects.get(id=job.id).locked_by, 'worker-b')
+
+
+class ScheduleTests(TestCase):
+    tick = Task('jobs_tests.record', record, every=60)
+
+    def test_one_job_per_slot(self):
+        now = timezone.now().replace(second=10)
+        first = schedule(self.tick, now)
+        Job.objects.update(state=SUCCEEDED)
+
+        self.assertEqual(schedule(self.tick, now + timedelta(seconds=20)).id, first.id)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertNotEqual(schedule(self.tick, now + timedelta(seconds=60)).id, first.id)
+
+    def test_nothing_is_queued_while_a_run_is_in_progress(self):
+        now = timezone.now()
+        schedule(self.tick, now)
+
+        self.assertIsNone(schedule(self.tick, now + timedelta(seconds=120)))
+
+
+class WorkerTests(TransactionTestCase):
+    # Worker threads use their own connections, so the jobs must be committed
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_runs_everything_due(self):
+        for value in range(3):
+            enqueue('jobs_tests.record', {'value': value})
+
+        processed = Worker(run_schedules=False, burst=True).run()
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Job.objects.exclude(state=SUCCEEDED).exists())
+
+
+class JobStatsTests(TestCase):
+    def test_reports_outcomes_timing_and_backlog(self):
+        now = timezone.now()
+        for duration in (10.0, 20.0, 30.0):
+            Job.objects.create(name='jobs_tests.record', state=SUCCEEDED, finished_at=now,
+                               duration_ms=duration, wait_ms=duration / 10)
+        Job.objects.create(name='jobs_tests.record', state=FAILED, finished_at=now, duration_ms=5.0)
+        Job.objects.create(name='jobs_tests.record', state=RUNNING)
+        Job.objects.create(name='jobs_tests.explode', run_at=now - timedelta(seconds=30))
+
+        stats = job_stats(now=now)
+
+        record_stats = stats['jobs_tests.record']
+        self.assertEqual(
+            {key: record_stats[key] for key in ('succeeded', 'failed', 'running', 'due')},
+            {'succeeded': 3, 'failed': 1, 'running': 1, 'due': 0},
+        )
+        self.assertEqual(record_stats['duration_ms'], {'p50': 10.0, 'p95': 30.0, 'max': 30.0})
+        self.assertEqual(stats['jobs_tests.explode']['due'], 1)
+        self.assertEqual(stats['jobs_tests.explode']['oldest_due_seconds'], 30.0)
@@ -0,0 +1,169 @@
+"""
+Job worker used by the run_jobs command
+
+A worker process runs `concurrency` threads. Each thread claims and runs one
+job at a time. A heartbeat thread refreshes heartbeat_at of the process's
+running jobs every JOB_HEARTBEAT_SECONDS, so long jobs keep their lease. The
+main thread enqueues periodic tasks when their slot comes up, and regularly
+puts back jobs whose worker died. Scale out by running more processes;
+claiming with SKIP LOCKED keeps them from getting in each other's way.
+
+Each job runs with fresh database routing state (config/routers.py), like a
+request, and connections are recycled between jobs as they are between
+requests.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.utils import timezone
+
+from config.routers import begin_request, end_request
+
+from .queue import FAILED, claim, complete, fail, heartbeat, recover_stale, schedule
+from .registry import get_task, scheduled_tasks
+
+logger = logging.getLogger('jobs')
+
+# How often the main thread looks for jobs whose worker died
+RECOVER_INTERVAL_SECONDS = 60
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; returns its new state"""
+    started = time.perf_counter()
+    token = begin_request()
+    try:
+        result = get_task(job.name).func(**job.kwargs)
+    except Exception:
+        duration_ms = (time.perf_counter() - started) * 1000
+        state = fail(job, traceback.format_exc(), duration_ms)
+        log = logger.error if state == FAILED else logger.warning
+        log(f"Job {job.id} {job.name} attempt {job.attempts}/{job.max_attempts} failed "
+            f"after {duration_ms:.1f}ms ({'giving up' if state == FAILED else 'will retry'})", exc_info=True)
+        return state
+    else:
+        duration_ms = (time.perf_counter() - started) * 1000
+        complete(job, result, duration_ms)
+        logger.info(f"Job {job.id} {job.name} succeeded in {duration_ms:.1f}ms (waited {job.wait_ms:.1f}ms)")
+        return 'succeeded'
+    finally:
+        end_request(token)
+        close_old_connections()
+
+
+class Worker:
+    def __init__(self, queues=None, concurrency=1, poll_interval=1.0, run_schedules=True, burst=False):
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.queues = queues or None
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.run_schedules = run_schedules
+        self.burst = burst
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._count_lock = threading.Lock()
+        self._scheduled_slots = {}
+
+    def stop(self, *args):
+        """Finish the running jobs and exit (usable as a signal handler)"""
+        if not self.stopping.is_set():
+            logger.info(f"Worker {self.id} stopping after the current jobs")
+        self.stopping.set()
+
+    def run(self):
+        """Work until stopped, or in burst mode until no job is due; returns jobs processed"""
+        logger.info(f"Worker {self.id} started: {self.concurrency} threads, queues {self.queues or 'all'}")
+        self.schedule_due()
+        threads = [
+            threading.Thread(target=self.work, name=f"jobs-{n}", daemon=True)
+            for n in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        beating = threading.Event()
+        beat = threading.Thread(target=self.heartbeat, args=(beating,), name='jobs-heartbeat', daemon=True)
+        beat.start()
+
+        last_recover = None
+        while not self.burst and not self.stopping.is_set() and any(thread.is_alive() for thread in threads):
+            if last_recover is None or time.monotonic() - last_recover >= RECOVER_INTERVAL_SECONDS:
+                last_recover = time.monotonic()
+                try:
+                    recovered = recover_stale()
+                except DatabaseError:
+                    logger.exception('Recovering stale jobs failed')
+                    close_old_connections()
+                else:
+                    if recovered:
+                        logger.warning(f"Put back {recovered} jobs whose worker stopped")
+            self.schedule_due()
+            self.stopping.wait(self.poll_interval)
+
+        for thread in threads:
+            thread.join()
+        beating.set()
+        beat.join()
+        close_old_connections()
+        connections.close_all()
+        return self.processed
+
+    def heartbeat(self, stopped):
+        """Keep this worker's running jobs alive until `stopped` is set"""
+        interval = getattr(settings, 'JOB_HEARTBEAT_SECONDS', 30)
+        try:
+            while not stopped.wait(interval):
+                try:
+                    heartbeat(self.id)
+                except DatabaseError:
+                    # Jobs are only put back after JOB_LEASE_SECONDS without a heartbeat
+                    logger.exception('Job heartbeat failed')
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+    def schedule_due(self):
+        """Enqueue periodic tasks whose slot started since this worker last looked"""
+        if not self.run_schedules:
+            return
+        now = timezone.now()
+        for task in scheduled_tasks():
+            slot = int(now.timestamp() // task.every)
+            if self._scheduled_slots.get(task.name) == slot:
+                continue
+            try:
+                # A run still in progress makes this slot's run a no-op
+                schedule(task, now)
+                self._scheduled_slots[task.name] = slot
+            except Exception:
+                logger.exception(f"Scheduling {task.name} failed")
+
+    def work(self):
+        try:
+            while not self.stopping.is_set():
+                try:
+                    job = claim(self.id, self.queues)
+                    if job is not None:
+                        run_job(job)
+                except DatabaseError:
+                    # Database unavailable; a job left running is put back after its lease
+                    logger.exception('Job bookkeeping failed')
+                    close_old_connections()
+                    if self.burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if job is None:
+                    if self.burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                with self._count_lock:
+                    self.processed += 1
+        finally:
+            connections.close_all()
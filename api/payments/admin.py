@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentPlan, Transaction
+from .models import PaymentPlan, Transaction, WebhookDelivery
 
 
 @admin.register(PaymentPlan)
@@ -21,4 +21,13 @@ class TransactionAdmin(admin.ModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         if obj:  # editing an existing object
             return self.readonly_fields + ['user', 'plan', 'amount', 'currency']
-        return self.readonly_fields
\ No newline at end of file
+        return self.readonly_fields
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'transaction_id', 'status', 'state', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['state', 'status', 'received_at']
+    search_fields = ['event_id', 'transaction_id']
+    readonly_fields = ['event_id', 'transaction_id', 'status', 'payload', 'received_at', 'processed_at']
+    ordering = ['-received_at']
@@ -3,4 +3,19 @@ from django.apps import AppConfig
 
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'payments'
\ No newline at end of file
+    name = 'payments'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_migrate, post_save
+        from .catalog import invalidate_catalog, seed_default_plans
+        from .entitlement import invalidate_transaction_entitlement, invalidate_user_entitlement
+        from .models import PaymentPlan, Transaction
+
+        post_migrate.connect(seed_default_plans, sender=self)
+        post_save.connect(invalidate_catalog, sender=PaymentPlan)
+        post_delete.connect(invalidate_catalog, sender=PaymentPlan)
+
+        # Premium changes made through the admin or model saves
+        post_save.connect(invalidate_user_entitlement, sender=get_user_model())
+        post_save.connect(invalidate_transaction_entitlement, sender=Transaction)
@@ -0,0 +1,123 @@
+"""
+Pre-rendered product catalog for the paywall
+
+The catalog is built from the active PaymentPlan rows with a single query and
+kept per process as an immutable snapshot (preloaded by config/warmup.py).
+Response bodies are rendered to bytes once per country with its own currency
+and reused, so `products` only has to resolve the country; other countries
+are rendered per request. Saving or deleting a plan
+rebuilds the snapshot in every process.
+"""
+from decimal import Decimal
+from types import MappingProxyType
+
+from config.renderers import dumps
+from config.warmup import Snapshot
+
+from .models import PaymentPlan
+from .pricing import RegionalPricingService
+
+DEFAULT_PLANS = [
+    {
+        'plan_id': 'weekly_plan',
+        'name': 'Weekly Premium',
+        'plan_type': 'weekly',
+        'duration_days': 7,
+        'price_usd': Decimal('2.49'),
+        'price_eur': Decimal('2.49'),
+        'price_gel': Decimal('2.49')
+    },
+    {
+        'plan_id': 'monthly_plan',
+        'name': 'Monthly Premium',
+        'plan_type': 'monthly',
+        'duration_days': 30,
+        'price_usd': Decimal('5.00'),
+        'price_eur': Decimal('5.00'),
+        'price_gel': Decimal('5.00')
+    },
+    {
+        'plan_id': 'yearly_plan',
+        'name': 'Yearly Premium',
+        'plan_type': 'yearly',
+        'duration_days': 365,
+        'price_usd': Decimal('49.00'),
+        'price_eur': Decimal('49.00'),
+        'price_gel': Decimal('49.00')
+    }
+]
+
+
+def seed_default_plans(**kwargs):
+    """Create the default plans if they are missing (runs after migrate)"""
+    for plan_data in DEFAULT_PLANS:
+        PaymentPlan.objects.get_or_create(plan_id=plan_data['plan_id'], defaults=plan_data)
+
+
+class CatalogSnapshot:
+    """Immutable per-currency catalog with lazily rendered per-country bodies"""
+
+    def __init__(self, plans):
+        self._plans = tuple(plans)
+        self._currencies = MappingProxyType({
+            currency: self._build_currency(currency)
+            for currency in RegionalPricingService.CURRENCY_PRICES
+        })
+        self._rendered = {}
+
+    def _build_currency(self, currency):
+        pricing_data = RegionalPricingService.get_pricing_for_currency(currency)
+        plans = []
+        for plan in self._plans:
+            plan_pricing = pricing_data['pricing'][plan.plan_type]
+            plans.append({
+                'id': plan.plan_id,
+                'name': plan.name,
+                'type': plan.plan_type,
+                'duration_days': plan.duration_days,
+                'price': plan_pricing['amount'],
+                'currency': plan_pricing['currency'],
+                'display_price': plan_pricing['display']
+            })
+        return {
+            'currency': currency,
+            'pricing': pricing_data['pricing'],
+            'monthly_display': pricing_data['monthly_display'],
+            'plans': plans,
+        }
+
+    def render(self, country):
+        """JSON body of the products response for a country"""
+        body = self._rendered.get(country)
+        if body is None:
+            currency = RegionalPricingService.get_currency_for_country(country)
+            data = self._currencies.get(currency) or self._currencies['USD']
+            body = dumps({'country': country, **data})
+            # The country comes from a client header: only known countries are kept,
+            # so the cache cannot grow without bound
+            if country in RegionalPricingService.CURRENCY_MAP:
+                self._rendered[country] = body
+        return body
+
+
+def build_catalog():
+    return CatalogSnapshot(PaymentPlan.objects.filter(is_active=True).order_by('duration_days'))
+
+
+catalog = Snapshot('payments.catalog', build_catalog)
+
+
+def get_catalog():
+    return catalog.get()
+
+
+def invalidate_catalog(**kwargs):
+    catalog.invalidate()
+
+
+def warm_catalog():
+    """Build the catalog and render the body of every country with its own currency"""
+    snapshot = get_catalog()
+    for country in ('US', *RegionalPricingService.CURRENCY_MAP):
+        snapshot.render(country)
+    return len(snapshot._plans)
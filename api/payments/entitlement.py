@@ -0,0 +1,63 @@
+"""
+Cached entitlement snapshots
+
+The subscription store polls `payments/entitlement/`, so the answer is kept
+in the shared cache per user. The snapshot stores `premium_until` rather than
+a premium flag, so expiry needs no invalidation; anything that changes a
+user's premium time or transactions calls invalidate_entitlements().
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Transaction
+
+User = get_user_model()
+
+ENTITLEMENT_TTL_SECONDS = 15 * 60
+
+
+def entitlement_key(user_id):
+    return f"payments:entitlement:{user_id}"
+
+
+def build_snapshot(user_id):
+    user = User.objects.only('is_premium', 'premium_until', 'subscription_status').get(pk=user_id)
+    last_paid = Transaction.objects.filter(user_id=user_id, status='paid').select_related('plan').order_by(
+        '-created_at', '-id'
+    ).first()
+    return {
+        'premium_until': user.premium_until.isoformat() if user.is_premium and user.premium_until else None,
+        'subscription_status': user.subscription_status,
+        'plan': last_paid.plan.plan_type if last_paid else None,
+        'transaction_id': last_paid.transaction_id if last_paid else None,
+        'paid_at': last_paid.paid_at.isoformat() if last_paid and last_paid.paid_at else None,
+    }
+
+
+def get_entitlement(user_id):
+    """Current entitlement for a user, from the cache when possible"""
+    key = entitlement_key(user_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(user_id)
+        cache.set(key, snapshot, ENTITLEMENT_TTL_SECONDS)
+
+    premium_until = parse_datetime(snapshot['premium_until']) if snapshot['premium_until'] else None
+    return {
+        'is_premium': bool(premium_until and premium_until > timezone.now()),
+        **snapshot,
+    }
+
+
+def invalidate_entitlements(user_ids):
+    cache.delete_many([entitlement_key(user_id) for user_id in user_ids])
+
+
+def invalidate_user_entitlement(sender, instance, **kwargs):
+    invalidate_entitlements([instance.pk])
+
+
+def invalidate_transaction_entitlement(sender, instance, **kwargs):
+    invalidate_entitlements([instance.user_id])
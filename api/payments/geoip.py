@@ -0,0 +1,237 @@
+"""
+Offline IP-to-country lookups
+
+The dataset is compiled by the build_geoip command into one binary file:
+
+    header   b'GEOIP1\\0\\0', IPv4 range count, IPv6 range count (uint32 BE)
+    IPv4     range starts, 4-byte big-endian, sorted
+    IPv4     country codes, 2 ASCII bytes per range ('\\0\\0' for gaps)
+    IPv6     range starts, 16-byte big-endian, sorted
+    IPv6     country codes, 2 ASCII bytes per range
+
+The file is memory-mapped and searched with a binary search over the
+fixed-width keys, which compare correctly as bytes because they are
+big-endian. Hot addresses are memoised per process.
+"""
+import csv
+from functools import lru_cache
+import heapq
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('payments')
+
+MAGIC = b'GEOIP1\0\0'
+HEADER = struct.Struct('>8sII')
+NO_COUNTRY = b'\0\0'
+
+# How often workers check whether the database file was rebuilt
+RELOAD_CHECK_SECONDS = 60
+
+
+class GeoIPDatabase:
+    """Read-only view of a compiled GeoIP file"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as fh:
+            self.mtime = os.fstat(fh.fileno()).st_mtime
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.v4_count, self.v6_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a GeoIP database")
+
+        self._v4_starts = HEADER.size
+        self._v4_codes = self._v4_starts + 4 * self.v4_count
+        self._v6_starts = self._v4_codes + 2 * self.v4_count
+        self._v6_codes = self._v6_starts + 16 * self.v6_count
+        if len(self._map) != self._v6_codes + 2 * self.v6_count:
+            raise ValueError(f"{self.path} is truncated")
+
+    def country_for(self, ip_address):
+        """ISO country code for an address, or None when unknown/invalid"""
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        if address.version == 4:
+            return self._search(address.packed, self._v4_starts, self._v4_codes, self.v4_count, 4)
+        return self._search(address.packed, self._v6_starts, self._v6_codes, self.v6_count, 16)
+
+    def _search(self, key, starts, codes, count, width):
+        # Rightmost range start <= key
+        data = self._map
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            offset = starts + middle * width
+            if data[offset:offset + width] <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        code = data[codes + 2 * (low - 1):codes + 2 * low]
+        return None if code == NO_COUNTRY else code.decode('ascii')
+
+    def close(self):
+        self._map.close()
+
+
+def parse_source(path):
+    """
+    Yield (version, start, end, country) from a CSV dataset.
+
+    Rows are either `cidr,country` or `first_ip,last_ip,country[,...]`;
+    blank lines and lines starting with '#' are ignored.
+    """
+    with open(path, newline='') as fh:
+        for line_number, row in enumerate(csv.reader(fh), start=1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                if len(row) == 2:
+                    network = ipaddress.ip_network(row[0].strip(), strict=False)
+                    first, last, country = network.network_address, network.broadcast_address, row[1]
+                else:
+                    first, last, country = ipaddress.ip_address(row[0].strip()), ipaddress.ip_address(row[1].strip()), row[2]
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: {e}")
+
+            country = country.strip().upper()
+            if len(country) != 2 or not country.isalpha():
+                raise ValueError(f"{path}:{line_number}: invalid country code '{country}'")
+            if first.version != last.version or int(last) < int(first):
+                raise ValueError(f"{path}:{line_number}: invalid range")
+            yield first.version, int(first), int(last), country
+
+
+def compile_ranges(ranges, width):
+    """
+    Sorted (start, code) boundaries with explicit gaps, and the overlap count.
+
+    Where ranges overlap the narrowest one wins, so a nested CIDR overrides
+    the block around it (longest-prefix match) and the block resumes after
+    it. Ranges of equal size that overlap keep the one listed first.
+    """
+    ranges = list(ranges)
+    pending = sorted(range(len(ranges)), key=lambda index: ranges[index][0])
+    boundaries = sorted({start for start, _, _ in ranges} | {end + 1 for _, end, _ in ranges})
+    max_value = (1 << (8 * width)) - 1
+
+    starts, codes = [], []
+    active = []  # heap of (size, order, end, code); the narrowest covering range on top
+    overlaps = 0
+    next_range = 0
+    for boundary in boundaries:
+        # Drop ranges that ended before this boundary; the top is then still covering
+        while active and active[0][2] < boundary:
+            heapq.heappop(active)
+        while next_range < len(pending) and ranges[pending[next_range]][0] == boundary:
+            index = pending[next_range]
+            start, end, country = ranges[index]
+            if active:
+                overlaps += 1
+            heapq.heappush(active, (end - start, index, end, country.encode('ascii')))
+            next_range += 1
+
+        if boundary > max_value:
+            break
+        code = active[0][3] if active else NO_COUNTRY
+        if (codes and codes[-1] == code) or (not codes and code == NO_COUNTRY):
+            continue
+        starts.append(boundary.to_bytes(width, 'big'))
+        codes.append(code)
+    return starts, codes, overlaps
+
+
+def build_database(sources, output):
+    """Compile CSV datasets into a GeoIP file, replacing `output` atomically"""
+    v4, v6 = [], []
+    for source in sources:
+        for version, start, end, country in parse_source(source):
+            (v4 if version == 4 else v6).append((start, end, country))
+
+    v4_starts, v4_codes, v4_overlaps = compile_ranges(v4, 4)
+    v6_starts, v6_codes, v6_overlaps = compile_ranges(v6, 16)
+
+    output = str(output)
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, len(v4_starts), len(v6_starts)))
+        fh.write(b''.join(v4_starts))
+        fh.write(b''.join(v4_codes))
+        fh.write(b''.join(v6_starts))
+        fh.write(b''.join(v6_codes))
+    os.replace(tmp_path, output)
+
+    return {
+        'ipv4_ranges': len(v4),
+        'ipv6_ranges': len(v6),
+        'overlapping_ranges': v4_overlaps + v6_overlaps,
+        'size_bytes': os.path.getsize(output),
+    }
+
+
+_database = None
+_last_check = None
+
+
+def get_database():
+    """The process-wide database, reopened when the file has been rebuilt"""
+    global _database, _last_check
+
+    now = time.monotonic()
+    if _last_check is not None and now - _last_check < RELOAD_CHECK_SECONDS:
+        return _database
+    _last_check = now
+
+    path = getattr(settings, 'GEOIP_DATABASE_PATH', None)
+    try:
+        mtime = os.stat(path).st_mtime if path else None
+    except OSError:
+        mtime = None
+
+    if mtime is None:
+        if _database is None:
+            logger.warning(f"GeoIP database not found at {path}; run build_geoip")
+        return _database
+
+    if _database is None or _database.path != str(path) or _database.mtime != mtime:
+        try:
+            _database = GeoIPDatabase(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to open GeoIP database: {e}")
+        _lookup.cache_clear()
+    return _database
+
+
+@lru_cache(maxsize=65536)
+def _lookup(ip_address):
+    database = _database
+    return database.country_for(ip_address) if database else None
+
+
+def lookup_country(ip_address):
+    """Country code for an IP address from the local database, or None"""
+    if not ip_address:
+        return None
+    get_database()
+    return _lookup(ip_address)
+
+
+def warm_database():
+    """Open the database before workers fork so they share the mapping"""
+    database = get_database()
+    return database.v4_count + database.v6_count if database else 0
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.geoip import GeoIPDatabase, build_database
+
+
+class Command(BaseCommand):
+    help = 'Compile CIDR/range-to-country CSV files into the binary GeoIP database used for pricing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+',
+                            help='CSV files with `cidr,country` or `first_ip,last_ip,country` rows (IPv4 and/or IPv6)')
+        parser.add_argument('--output', default=str(settings.GEOIP_DATABASE_PATH),
+                            help='Database file to write (default: GEOIP_DATABASE_PATH)')
+        parser.add_argument('--check', action='append', default=[], metavar='IP',
+                            help='Look up an address in the new database after building')
+
+    def handle(self, *args, **options):
+        try:
+            stats = build_database(options['sources'], options['output'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Wrote {options['output']}: {stats['ipv4_ranges']} IPv4 and {stats['ipv6_ranges']} IPv6 ranges, "
+            f"{stats['overlapping_ranges']} overlapping (the narrowest range wins), {stats['size_bytes']} bytes"
+        )
+
+        if options['check']:
+            database = GeoIPDatabase(options['output'])
+            for ip_address in options['check']:
+                self.stdout.write(f"{ip_address}: {database.country_for(ip_address) or 'unknown'}")
+            database.close()
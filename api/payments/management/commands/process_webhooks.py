@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.webhooks import BATCH_SIZE, drain_deliveries
+
+
+class Command(BaseCommand):
+    help = 'Apply received payment webhook deliveries (transactions and premium status)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new deliveries instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait between passes over the queue with --loop (default: 1)')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            # A delivery that failed is retried on the next pass, not straight away
+            total += drain_deliveries(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(f"{total} webhook deliveries handled")
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.reconciliation import LocalPaymentProvider, reconcile_pending
+
+
+class Command(BaseCommand):
+    help = 'Resolve stale pending transactions (expire them, or verify them with the payment provider)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=float, default=24,
+                            help='Only transactions pending for longer than this (default: 24)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--verify', action='store_true',
+                            help='Ask PAYMENT_PROVIDER for the real status before marking rows')
+        parser.add_argument('--local-provider', action='store_true',
+                            help='Verify against the local stand-in provider (every checkout reported cancelled)')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent provider requests (default: 4)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        provider = LocalPaymentProvider() if options['local_provider'] else None
+        try:
+            stats = reconcile_pending(
+                older_than_hours=options['older_than_hours'],
+                batch_size=options['batch_size'],
+                verify=options['verify'] or provider is not None,
+                provider=provider,
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(stats))
@@ -61,4 +61,42 @@ class Transaction(models.Model):
         return f"{self.transaction_id} - {self.user.username} - {self.status}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+
+class WebhookDelivery(models.Model):
+    """A payment provider webhook call, stored on receipt and applied by the payments.process_webhooks job"""
+
+    STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),  # duplicate or superseded, nothing to apply
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=200, unique=True)  # provider event id (idempotency key)
+    transaction_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'webhook deliveries'
+        indexes = [
+            models.Index(fields=['state', 'id']),
+            models.Index(fields=['transaction_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} - {self.transaction_id} - {self.state}"
@@ -1,9 +1,10 @@
 """
 Regional pricing logic for Salamene Horoscope app
 """
-import requests
 from decimal import Decimal
 
+from .geoip import lookup_country
+
 
 class RegionalPricingService:
     """Handle region-based pricing logic"""
@@ -52,23 +53,13 @@ class RegionalPricingService:
     @classmethod
     def detect_country_from_ip(cls, ip_address):
         """
-        Detect country from IP address
-        In production, you'd use a service like MaxMind GeoIP2 or ipapi.co
-        For demo purposes, we'll use a simple mock implementation
+        Detect country from IP address using the local GeoIP database
+        (see payments/geoip.py); never makes a network call
         """
         if not ip_address or ip_address in ['127.0.0.1', 'localhost']:
             return 'US'  # Default to US for local development
 
-        try:
-            # Simple IP geolocation service (in production, use a proper service)
-            response = requests.get(f'http://ip-api.com/json/{ip_address}', timeout=2)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('countryCode', 'US')
-        except:
-            pass
-
-        return 'US'  # Default fallback
+        return lookup_country(ip_address) or 'US'  # Default fallback
 
     @classmethod
     def get_country_from_request(cls, request):
@@ -97,6 +88,11 @@ class RegionalPricingService:
         """Get complete pricing structure for a request"""
         country = cls.get_country_from_request(request)
         currency = cls.get_currency_for_country(country)
+        return {'country': country, **cls.get_pricing_for_currency(currency)}
+
+    @classmethod
+    def get_pricing_for_currency(cls, currency):
+        """Get pricing structure for a currency"""
         prices = cls.CURRENCY_PRICES.get(currency, cls.CURRENCY_PRICES['USD'])
 
         # Format display prices
@@ -109,7 +105,6 @@ class RegionalPricingService:
         symbol = currency_symbols.get(currency, '$')
 
         return {
-            'country': country,
             'currency': currency,
             'pricing': {
                 'weekly': {
@@ -0,0 +1,176 @@
+"""
+Reconciliation of stale pending transactions
+
+Checkouts that never complete leave `pending` Transaction rows behind. The
+reconcile_transactions command scans pending rows older than a cutoff with the
+(status, created_at) index and resolves them in bulk:
+
+- without a provider every stale row is marked cancelled (expired checkout);
+- with a provider the rows are verified in concurrent batches; payments the
+  provider reports as paid go through the webhook pipeline so premium is
+  granted exactly as for a real webhook, failed ones are marked failed,
+  cancelled ones and ids the provider does not know are marked cancelled, and
+  checkouts still pending at the provider are left alone. Rows whose lookup
+  failed are counted as errors and retried on the next run.
+
+Rows are only updated while still pending, so a webhook arriving mid-run wins.
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Transaction
+from .webhooks import process_events, record_delivery
+
+logger = logging.getLogger('payments')
+
+
+class PaymentProvider(ABC):
+    """Looks up the provider-side status of checkouts"""
+
+    # Transactions per provider request
+    batch_size = 50
+
+    @abstractmethod
+    def fetch_statuses(self, transactions):
+        """
+        Return {transaction_id: status} for a list of Transaction rows.
+
+        Status is one of Transaction.STATUS_CHOICES; ids the provider does not
+        know may be left out (they are cancelled). Raise when the lookup itself
+        fails.
+        """
+
+
+class LocalPaymentProvider(PaymentProvider):
+    """Stand-in provider answering from a dict, for tests and local runs"""
+
+    def __init__(self, statuses=None, default='cancelled'):
+        self.statuses = dict(statuses or {})
+        self.default = default
+
+    def fetch_statuses(self, transactions):
+        return {tx.transaction_id: self.statuses.get(tx.transaction_id, self.default) for tx in transactions}
+
+
+def get_provider():
+    """Provider configured in PAYMENT_PROVIDER (dotted path), or None"""
+    path = getattr(settings, 'PAYMENT_PROVIDER', None)
+    return import_string(path)() if path else None
+
+
+def iter_stale_pending(cutoff, batch_size):
+    """Batches of pending transactions created before cutoff, oldest first"""
+    queryset = Transaction.objects.filter(status='pending', created_at__lt=cutoff).order_by('created_at', 'id')
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(created_at__gt=last[0]) | Q(created_at=last[0], id__gt=last[1]))
+        batch = list(page.only('id', 'transaction_id', 'created_at', 'plan_id', 'user_id')[:batch_size])
+        if not batch:
+            return
+        last = (batch[-1].created_at, batch[-1].id)
+        yield batch
+
+
+def verify_batch(provider, transactions, workers):
+    """
+    Query the provider for a batch in parallel chunks.
+
+    Returns (statuses, ids whose lookup failed, provider requests made).
+    """
+    chunks = [transactions[i:i + provider.batch_size] for i in range(0, len(transactions), provider.batch_size)]
+    statuses = {}
+    unverified = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(provider.fetch_statuses, chunk) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                statuses.update(future.result())
+            except Exception as e:
+                unverified.update(tx.transaction_id for tx in chunk)
+                logger.error(f"Provider lookup failed for {len(chunk)} transactions: {e}")
+    return statuses, unverified, len(chunks)
+
+
+def mark(transactions, new_status, now):
+    """Bulk status change, applied only to rows that are still pending"""
+    if not transactions:
+        return 0
+    return Transaction.objects.filter(
+        id__in=[tx.id for tx in transactions], status='pending'
+    ).update(status=new_status, updated_at=now)
+
+
+def reconcile_pending(older_than_hours=24, batch_size=500, verify=False, provider=None, workers=4, dry_run=False):
+    """Resolve stale pending transactions; returns counters and throughput"""
+    if verify and provider is None:
+        provider = get_provider()
+        if provider is None:
+            raise ValueError('PAYMENT_PROVIDER is not configured')
+
+    started = time.monotonic()
+    now = timezone.now()
+    cutoff = now - timedelta(hours=older_than_hours)
+    stats = {'scanned': 0, 'paid': 0, 'failed': 0, 'cancelled': 0, 'pending': 0, 'errors': 0, 'provider_requests': 0}
+
+    for batch in iter_stale_pending(cutoff, batch_size):
+        stats['scanned'] += len(batch)
+
+        statuses, unverified = {}, set()
+        if verify:
+            statuses, unverified, requests = verify_batch(provider, batch, workers)
+            stats['provider_requests'] += requests
+
+        paid, failed, cancelled = [], [], []
+        for tx in batch:
+            if tx.transaction_id in unverified:
+                stats['errors'] += 1  # lookup failed; try again on the next run
+                continue
+            # Without verification, and for ids the provider does not know, the checkout expired
+            result = statuses.get(tx.transaction_id, 'cancelled')
+            if result == 'paid':
+                paid.append(tx)
+            elif result == 'failed':
+                failed.append(tx)
+            elif result == 'cancelled':
+                cancelled.append(tx)
+            elif result == 'pending':
+                stats['pending'] += 1  # checkout still in progress at the provider
+            else:
+                stats['errors'] += 1
+                logger.error(f"Provider returned unknown status {result!r} for transaction {tx.transaction_id}")
+
+        if dry_run:
+            stats['paid'] += len(paid)
+            stats['failed'] += len(failed)
+            stats['cancelled'] += len(cancelled)
+            continue
+
+        event_ids = [f"reconcile:{tx.transaction_id}:paid" for tx in paid]
+        for event_id, tx in zip(event_ids, paid):
+            record_delivery(event_id, {'tx_id': tx.transaction_id, 'status': 'paid', 'source': 'reconciliation'})
+        # Only this run's deliveries; the webhook job applies the rest of the queue
+        if event_ids:
+            process_events(event_ids)
+        stats['paid'] += len(paid)
+        stats['failed'] += mark(failed, 'failed', now)
+        stats['cancelled'] += mark(cancelled, 'cancelled', now)
+
+    elapsed = time.monotonic() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['scanned'] / elapsed, 1) if elapsed else 0.0
+    logger.info(
+        f"Reconciled {stats['scanned']} pending transactions in {stats['seconds']}s "
+        f"({stats['rows_per_second']}/s): {stats['paid']} paid, {stats['failed']} failed, "
+        f"{stats['cancelled']} cancelled, {stats['pending']} still pending, {stats['errors']} errors"
+    )
+    return stats
@@ -0,0 +1,47 @@
+"""
+Background tasks (see jobs/registry.py)
+"""
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from jobs.registry import task
+
+from .entitlement import invalidate_entitlements
+from .reconciliation import get_provider, reconcile_pending
+from .webhooks import drain_deliveries
+
+User = get_user_model()
+
+EXPIRY_BATCH_SIZE = 1000
+
+
+@task('payments.expire_premium', every=600)
+def expire_premium():
+    """Turn off premium for users whose premium_until has passed"""
+    expired = 0
+    while True:
+        now = timezone.now()
+        user_ids = list(User.objects.filter(
+            is_premium=True, premium_until__lte=now
+        ).values_list('id', flat=True)[:EXPIRY_BATCH_SIZE])
+        if not user_ids:
+            return expired
+
+        # premium_until is re-checked so a renewal in between is kept
+        expired += User.objects.filter(id__in=user_ids, is_premium=True, premium_until__lte=now).update(
+            is_premium=False, subscription_status='expired'
+        )
+        invalidate_entitlements(user_ids)
+
+
+@task('payments.reconcile_pending', every=3600)
+def reconcile(older_than_hours=24):
+    """Resolve stale pending transactions, verifying them when PAYMENT_PROVIDER is set"""
+    provider = get_provider()
+    return reconcile_pending(older_than_hours=older_than_hours, verify=provider is not None, provider=provider)
+
+
+@task('payments.process_webhooks', every=60)
+def process_webhooks():
+    """Apply received webhook deliveries; the webhook view queues a run for each new one"""
+    return drain_deliveries()
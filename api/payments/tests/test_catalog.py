@@ -0,0 +1,31 @@
+import json
+
+from django.test import TestCase
+
+from payments.catalog import build_catalog
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        # The default plans are seeded after migrate
+        self.catalog = build_catalog()
+
+    def test_body_uses_the_countrys_currency(self):
+        body = json.loads(self.catalog.render('GE'))
+
+        self.assertEqual((body['country'], body['currency']), ('GE', 'GEL'))
+        self.assertEqual([plan['type'] for plan in body['plans']], ['weekly', 'monthly', 'yearly'])
+        self.assertIs(self.catalog.render('GE'), self.catalog.render('GE'))
+
+    def test_unknown_countries_are_rendered_but_not_kept(self):
+        for country in ('ZZ', 'Q1', 'xx'):
+            body = json.loads(self.catalog.render(country))
+            self.assertEqual((body['country'], body['currency']), (country, 'USD'))
+
+        self.assertEqual(set(self.catalog._rendered), set())
+
+    def test_products_view(self):
+        response = self.client.get('/api/v1/payments/products/', HTTP_X_COUNTRY_CODE='DE')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['currency'], 'EUR')
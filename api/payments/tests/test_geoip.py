@@ -0,0 +1,86 @@
+from pathlib import Path
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from payments import geoip
+from payments.geoip import GeoIPDatabase, build_database, lookup_country
+
+DATASET = """\
+# cidr,country
+10.0.0.0/8,US
+10.1.0.0/16,GE
+10.1.2.0/24,DE
+10.2.0.0/16,US
+192.168.0.10,192.168.0.20,FR
+2001:db8::/32,NL
+2001:db8:1::/48,BE
+"""
+
+
+class GeoIPTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        source = self.directory / 'ranges.csv'
+        source.write_text(DATASET)
+        self.path = self.directory / 'geoip.bin'
+        self.stats = build_database([source], self.path)
+        self.database = GeoIPDatabase(self.path)
+        self.addCleanup(self.database.close)
+
+    def test_lookup(self):
+        lookups = {
+            '10.200.0.1': 'US',
+            '192.168.0.10': 'FR',
+            '192.168.0.20': 'FR',
+            '192.168.0.21': None,
+            '9.255.255.255': None,
+            '11.0.0.0': None,
+            '::ffff:192.168.0.15': 'FR',
+            '2001:db8:ffff::1': 'NL',
+            'not an ip': None,
+        }
+        for ip_address, country in lookups.items():
+            with self.subTest(ip_address):
+                self.assertEqual(self.database.country_for(ip_address), country)
+
+    def test_nested_ranges_use_the_longest_prefix(self):
+        lookups = {
+            '10.0.255.255': 'US',
+            '10.1.0.0': 'GE',
+            '10.1.2.7': 'DE',
+            '10.1.3.0': 'GE',  # the enclosing block resumes after the nested one
+            '10.1.255.255': 'GE',
+            '10.2.0.1': 'US',
+            '2001:db8:1::1': 'BE',
+            '2001:db8:2::1': 'NL',
+        }
+        for ip_address, country in lookups.items():
+            with self.subTest(ip_address):
+                self.assertEqual(self.database.country_for(ip_address), country)
+        self.assertEqual(self.stats['overlapping_ranges'], 4)
+
+    def test_invalid_dataset_is_reported_with_its_line(self):
+        source = self.directory / 'bad.csv'
+        source.write_text('10.0.0.0/8,US\n10.0.0.0/8,USA\n')
+
+        with self.assertRaisesMessage(ValueError, 'bad.csv:2'):
+            build_database([source], self.directory / 'bad.bin')
+
+    def test_missing_dataset_gives_no_country(self):
+        with mock.patch.object(geoip, '_database', None), mock.patch.object(geoip, '_last_check', None), \
+                override_settings(GEOIP_DATABASE_PATH=self.directory / 'missing.bin'):
+            geoip._lookup.cache_clear()
+            self.assertIsNone(lookup_country('10.1.2.3'))
+        geoip._lookup.cache_clear()
+
+    def test_process_database_is_opened_from_settings(self):
+        with mock.patch.object(geoip, '_database', None), mock.patch.object(geoip, '_last_check', None), \
+                override_settings(GEOIP_DATABASE_PATH=self.path):
+            geoip._lookup.cache_clear()
+            self.assertEqual(lookup_country('10.1.2.3'), 'DE')
+            geoip._database.close()
+        geoip._lookup.cache_clear()
@@ -0,0 +1,52 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from payments.models import PaymentPlan, Transaction
+
+User = get_user_model()
+
+URL = '/api/v1/payments/history/'
+
+
+class HistoryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='payer', password='secret')
+        self.client.force_authenticate(self.user)
+        plan = PaymentPlan.objects.create(
+            plan_id='monthly', name='Monthly', plan_type='monthly', duration_days=30,
+            price_usd=Decimal('4.99'), price_eur=Decimal('4.99'), price_gel=Decimal('12.99'),
+        )
+        other = User.objects.create_user(username='other', password='secret')
+        now = timezone.now()
+        # tx-1 and tx-2 share a created_at, so paging has to break the tie on id
+        for transaction_id, user, minutes in [('tx-0', self.user, 0), ('tx-1', self.user, 1), ('tx-2', self.user, 1),
+                                              ('tx-3', self.user, 2), ('tx-other', other, 0)]:
+            tx = Transaction.objects.create(
+                transaction_id=transaction_id, user=user, plan=plan, amount=Decimal('4.99'), currency='USD',
+            )
+            Transaction.objects.filter(id=tx.id).update(created_at=now - timedelta(minutes=minutes))
+
+    def get(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_walks_the_users_transactions_newest_first(self):
+        pages = []
+        page = self.get(limit=2)
+        pages.append([tx['transaction_id'] for tx in page['results']])
+        while page['next_cursor']:
+            page = self.get(limit=2, after=page['next_cursor'])
+            pages.append([tx['transaction_id'] for tx in page['results']])
+
+        self.assertEqual(pages, [['tx-0', 'tx-2'], ['tx-1', 'tx-3']])
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', 'WyJub3QtYS1kYXRlIiwgMV0='):
+            response = self.client.get(URL, {'after': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error']['code'], 'INVALID_DATA')
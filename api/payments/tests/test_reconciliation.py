@@ -0,0 +1,96 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from payments.models import PaymentPlan, Transaction, WebhookDelivery
+from payments.reconciliation import LocalPaymentProvider, PaymentProvider, reconcile_pending
+
+User = get_user_model()
+
+
+class FlakyProvider(LocalPaymentProvider):
+    """Fails every lookup that includes one of `broken` ids"""
+
+    batch_size = 1
+
+    def __init__(self, statuses, broken):
+        super().__init__(statuses)
+        self.broken = set(broken)
+
+    def fetch_statuses(self, transactions):
+        if any(tx.transaction_id in self.broken for tx in transactions):
+            raise ConnectionError('provider unavailable')
+        return {tx.transaction_id: self.statuses[tx.transaction_id]
+                for tx in transactions if tx.transaction_id in self.statuses}
+
+
+class ReconcilePendingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='payer', password='secret')
+        self.plan = PaymentPlan.objects.create(
+            plan_id='monthly', name='Monthly', plan_type='monthly', duration_days=30,
+            price_usd=Decimal('4.99'), price_eur=Decimal('4.99'), price_gel=Decimal('12.99'),
+        )
+
+    def stale(self, transaction_id):
+        tx = Transaction.objects.create(
+            transaction_id=transaction_id, user=self.user, plan=self.plan, amount=Decimal('4.99'), currency='USD',
+        )
+        Transaction.objects.filter(id=tx.id).update(created_at=timezone.now() - timedelta(days=2))
+        return tx
+
+    def status(self, transaction_id):
+        return Transaction.objects.get(transaction_id=transaction_id).status
+
+    def test_provider_statuses_are_applied(self):
+        for transaction_id in ('paid', 'failed', 'cancelled', 'pending', 'unknown', 'broken'):
+            self.stale(transaction_id)
+        provider = FlakyProvider(
+            {'paid': 'paid', 'failed': 'failed', 'cancelled': 'cancelled', 'pending': 'pending'},
+            broken={'broken'},
+        )
+
+        stats = reconcile_pending(verify=True, provider=provider)
+
+        self.assertEqual(self.status('paid'), 'paid')
+        self.assertEqual(self.status('failed'), 'failed')
+        self.assertEqual(self.status('cancelled'), 'cancelled')
+        self.assertEqual(self.status('unknown'), 'cancelled')
+        self.assertEqual(self.status('pending'), 'pending')
+        self.assertEqual(self.status('broken'), 'pending')
+        self.assertEqual(
+            {key: stats[key] for key in ('scanned', 'paid', 'failed', 'cancelled', 'pending', 'errors')},
+            {'scanned': 6, 'paid': 1, 'failed': 1, 'cancelled': 2, 'pending': 1, 'errors': 1},
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_premium)
+
+    def test_only_this_runs_deliveries_are_applied(self):
+        self.stale('paid')
+        fresh = Transaction.objects.create(transaction_id='webhook', user=self.user, plan=self.plan,
+                                           amount=Decimal('4.99'), currency='USD')
+        WebhookDelivery.objects.create(event_id='evt-1', transaction_id=fresh.transaction_id, status='paid')
+
+        reconcile_pending(verify=True, provider=LocalPaymentProvider({'paid': 'paid'}))
+
+        self.assertEqual(self.status('paid'), 'paid')
+        # Left to the webhook job
+        self.assertEqual(WebhookDelivery.objects.get(event_id='evt-1').state, 'pending')
+
+    def test_without_provider_stale_rows_expire(self):
+        self.stale('old')
+        Transaction.objects.create(transaction_id='new', user=self.user, plan=self.plan,
+                                   amount=Decimal('4.99'), currency='USD')
+
+        stats = reconcile_pending()
+
+        self.assertEqual(stats['cancelled'], 1)
+        self.assertEqual(self.status('old'), 'cancelled')
+        self.assertEqual(self.status('new'), 'pending')
+
+    def test_provider_must_implement_fetch_statuses(self):
+        with self.assertRaises(TypeError):
+            PaymentProvider()
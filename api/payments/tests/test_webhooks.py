@@ -0,0 +1,131 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import get_task
+from payments.models import PaymentPlan, Transaction, WebhookDelivery
+from payments.webhooks import MAX_ATTEMPTS, drain_deliveries, process_deliveries
+
+User = get_user_model()
+
+
+class WebhookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='payer', password='secret')
+        self.plan = PaymentPlan.objects.create(
+            plan_id='monthly', name='Monthly', plan_type='monthly', duration_days=30,
+            price_usd=Decimal('4.99'), price_eur=Decimal('4.99'), price_gel=Decimal('12.99'),
+        )
+
+    def transaction(self, transaction_id):
+        return Transaction.objects.create(
+            transaction_id=transaction_id, user=self.user, plan=self.plan, amount=Decimal('4.99'), currency='USD',
+        )
+
+    def deliver(self, transaction_id, payment_status='paid', event_id=None):
+        data = {'tx_id': transaction_id, 'status': payment_status, 'plan': 'monthly'}
+        if event_id:
+            data['event_id'] = event_id
+        response = self.client.post('/api/v1/payments/webhook/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_retried_delivery_is_recorded_once(self):
+        self.transaction('tx-1')
+        self.deliver('tx-1', event_id='evt-1')
+        self.deliver('tx-1', event_id='evt-1')
+        self.deliver('tx-1')
+        self.deliver('tx-1')
+
+        self.assertEqual(
+            sorted(WebhookDelivery.objects.values_list('event_id', flat=True)), ['evt-1', 'tx-1:paid']
+        )
+
+    def test_payment_extends_premium_once(self):
+        self.transaction('tx-1')
+        self.deliver('tx-1', event_id='evt-1')
+        self.deliver('tx-1', event_id='evt-2')  # same payment, reported twice
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_deliveries(), 2)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_premium)
+        self.assertAlmostEqual(
+            self.user.premium_until, timezone.now() + timedelta(days=30), delta=timedelta(minutes=1)
+        )
+        self.assertEqual(Transaction.objects.get().status, 'paid')
+        self.assertEqual(
+            dict(WebhookDelivery.objects.values_list('event_id', 'state')),
+            {'evt-1': 'processed', 'evt-2': 'ignored'},
+        )
+        self.assertEqual(process_deliveries(), 0)
+
+    def test_payment_extends_existing_premium(self):
+        premium_until = timezone.now() + timedelta(days=10)
+        User.objects.filter(id=self.user.id).update(is_premium=True, premium_until=premium_until)
+        self.transaction('tx-1')
+        self.deliver('tx-1')
+
+        process_deliveries()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.premium_until, premium_until + timedelta(days=30))
+
+    def test_bad_deliveries_fail_without_holding_back_the_rest(self):
+        self.transaction('tx-1')
+        self.deliver('missing')
+        self.deliver('tx-1', payment_status='refunded-ish')
+        self.deliver('tx-1')
+
+        process_deliveries()
+
+        self.assertEqual(
+            dict(WebhookDelivery.objects.values_list('event_id', 'state')),
+            {'missing:paid': 'failed', 'tx-1:refunded-ish': 'failed', 'tx-1:paid': 'processed'},
+        )
+
+    def test_delivery_that_keeps_erroring_is_given_up(self):
+        self.transaction('tx-1')
+        self.deliver('tx-1')
+
+        with mock.patch('payments.webhooks.grant_premium', side_effect=RuntimeError('db down')):
+            for _ in range(MAX_ATTEMPTS):
+                process_deliveries()
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.state, delivery.attempts), ('failed', MAX_ATTEMPTS))
+        self.assertIn('db down', delivery.last_error)
+        self.assertEqual(Transaction.objects.get().status, 'pending')
+
+    def test_new_delivery_queues_processing(self):
+        self.transaction('tx-1')
+        self.deliver('tx-1', event_id='evt-1')
+        self.deliver('tx-1', event_id='evt-1')
+
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['payments.process_webhooks'])
+        self.assertEqual(get_task('payments.process_webhooks').func(), 1)
+        self.assertEqual(Transaction.objects.get().status, 'paid')
+
+    def test_rows_held_by_another_worker_are_not_counted(self):
+        self.transaction('tx-1')
+        self.deliver('tx-1')
+
+        # SKIP LOCKED claims nothing while another worker holds the row
+        with mock.patch('payments.webhooks.run_batch', return_value=[]):
+            self.assertEqual(process_deliveries(), 0)
+
+    def test_drain_tries_a_failing_delivery_once(self):
+        self.transaction('tx-1')
+        self.transaction('tx-2')
+        self.deliver('tx-1')
+        self.deliver('tx-2')
+
+        with mock.patch('payments.webhooks.grant_premium', side_effect=RuntimeError('db down')):
+            self.assertEqual(drain_deliveries(batch_size=1), 2)
+
+        self.assertEqual(list(WebhookDelivery.objects.values_list('attempts', flat=True)), [1, 1])
@@ -5,4 +5,6 @@ urlpatterns = [
     path('products/', views.products, name='payment_products'),
     path('checkout/', views.checkout, name='payment_checkout'),
     path('webhook/', views.webhook, name='payment_webhook'),
+    path('history/', views.history, name='payment_history'),
+    path('entitlement/', views.entitlement, name='payment_entitlement'),
 ]
\ No newline at end of file
@@ -3,11 +3,17 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from django.utils import timezone
-from datetime import timedelta
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 import uuid
 from .models import PaymentPlan, Transaction
 from .pricing import RegionalPricingService
+from .catalog import get_catalog
+from .webhooks import delivery_event_id, record_delivery
+from .entitlement import get_entitlement
+from config.pagination import decode_cursor, encode_cursor
+from config.renderers import PreRenderedJSON
+from jobs.queue import enqueue
 
 User = get_user_model()
 
@@ -17,69 +23,10 @@ User = get_user_model()
 def products(request):
     """Get available payment products with regional pricing"""
     try:
-        pricing_data = RegionalPricingService.get_pricing_for_request(request)
-
-        # Ensure default plans exist in database
-        plans_data = [
-            {
-                'plan_id': 'weekly_plan',
-                'name': 'Weekly Premium',
-                'plan_type': 'weekly',
-                'duration_days': 7,
-                'price_usd': 2.49,
-                'price_eur': 2.49,
-                'price_gel': 2.49
-            },
-            {
-                'plan_id': 'monthly_plan',
-                'name': 'Monthly Premium',
-                'plan_type': 'monthly',
-                'duration_days': 30,
-                'price_usd': 5.00,
-                'price_eur': 5.00,
-                'price_gel': 5.00
-            },
-            {
-                'plan_id': 'yearly_plan',
-                'name': 'Yearly Premium',
-                'plan_type': 'yearly',
-                'duration_days': 365,
-                'price_usd': 49.00,
-                'price_eur': 49.00,
-                'price_gel': 49.00
-            }
-        ]
-
-        for plan_data in plans_data:
-            PaymentPlan.objects.get_or_create(
-                plan_id=plan_data['plan_id'],
-                defaults=plan_data
-            )
+        country = RegionalPricingService.get_country_from_request(request)
 
-        # Get active plans
-        active_plans = PaymentPlan.objects.filter(is_active=True).order_by('duration_days')
-
-        response_data = {
-            'country': pricing_data['country'],
-            'currency': pricing_data['currency'],
-            'pricing': pricing_data['pricing'],
-            'monthly_display': pricing_data['monthly_display'],
-            'plans': []
-        }
-
-        for plan in active_plans:
-            plan_pricing = pricing_data['pricing'][plan.plan_type]
-            response_data['plans'].append({
-                'id': plan.plan_id,
-                'name': plan.name,
-                'type': plan.plan_type,
-                'duration_days': plan.duration_days,
-                'price': plan_pricing['amount'],
-                'currency': plan_pricing['currency'],
-                'display_price': plan_pricing['display']
-            })
-
-        return Response(response_data)
+        # Body is pre-rendered per country (see payments/catalog.py)
+        return Response(PreRenderedJSON(get_catalog().render(country)))
 
     except Exception as e:
         return Response(
@@ -152,12 +99,17 @@ def checkout(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def webhook(request):
-    """Handle payment webhook from payment provider"""
+    """
+    Handle payment webhook from payment provider
+
+    The delivery is stored and acknowledged right away; a queued
+    payments.process_webhooks job applies it (see payments/webhooks.py).
+    """
     try:
-        transaction_id = request.data.get('tx_id')
-        payment_status = request.data.get('status')
-        plan_type = request.data.get('plan')
-        currency = request.data.get('currency')
+        data = request.data if isinstance(request.data, dict) else {}
+        transaction_id = data.get('tx_id')
+        payment_status = data.get('status')
+        plan_type = data.get('plan')
 
         if not all([transaction_id, payment_status, plan_type]):
             return Response(
@@ -165,39 +117,76 @@ def webhook(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if record_delivery(delivery_event_id(request, data), data):
+            enqueue('payments.process_webhooks')
+
+        return Response({'status': 'success'})
+
+    except Exception as e:
+        return Response(
+            {"error": {"code": "SERVER_ERROR", "message": "Failed to process webhook"}},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def history(request):
+    """The user's transactions, newest first, paged with `?after=<cursor>`"""
+    try:
+        limit = min(max(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response(
+            {"error": {"code": "INVALID_DATA", "message": "limit must be an integer"}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = Transaction.objects.filter(user=request.user).select_related('plan').order_by('-created_at', '-id')
+
+    cursor = request.GET.get('after')
+    if cursor:
         try:
-            transaction = Transaction.objects.get(transaction_id=transaction_id)
-        except Transaction.DoesNotExist:
+            created_at, last_id = decode_cursor(cursor)
+            created_at = parse_datetime(created_at)
+            if created_at is None or not isinstance(last_id, int):
+                raise ValueError('Invalid cursor')
+        except (TypeError, ValueError):
             return Response(
-                {"error": {"code": "INVALID_DATA", "message": "Transaction not found"}},
+                {"error": {"code": "INVALID_DATA", "message": "Invalid cursor"}},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id))
+
+    transactions = list(queryset[:limit + 1])
+    has_next = len(transactions) > limit
+    transactions = transactions[:limit]
+
+    results = []
+    for tx in transactions:
+        results.append({
+            'transaction_id': tx.transaction_id,
+            'plan': tx.plan.plan_type,
+            'plan_name': tx.plan.name,
+            'amount': float(tx.amount),
+            'currency': tx.currency,
+            'status': tx.status,
+            'created_at': tx.created_at.isoformat(),
+            'paid_at': tx.paid_at.isoformat() if tx.paid_at else None,
+        })
 
-        # Update transaction status
-        transaction.status = payment_status
-        if payment_status == 'paid':
-            transaction.paid_at = timezone.now()
-
-            # Update user premium status
-            user = transaction.user
-            plan = transaction.plan
-
-            if user.premium_until and user.premium_until > timezone.now():
-                # Extend existing premium
-                user.premium_until += timedelta(days=plan.duration_days)
-            else:
-                # Start new premium period
-                user.premium_until = timezone.now() + timedelta(days=plan.duration_days)
-
-            user.is_premium = True
-            user.save(update_fields=['is_premium', 'premium_until'])
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(transactions[-1].created_at.isoformat(), transactions[-1].id)
 
-        transaction.save(update_fields=['status', 'paid_at'])
+    return Response({'results': results, 'next_cursor': next_cursor})
 
-        return Response({'status': 'success'})
 
-    except Exception as e:
-        return Response(
-            {"error": {"code": "SERVER_ERROR", "message": "Failed to process webhook"}},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def entitlement(request):
+    """Current premium entitlement, served from a cached snapshot"""
+    return Response(get_entitlement(request.user.pk))
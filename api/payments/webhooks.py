@@ -0,0 +1,195 @@
+"""
+Payment webhook pipeline
+
+The webhook view only records each delivery (unique by provider event id),
+queues a payments.process_webhooks job (payments/tasks.py) and acknowledges
+it. The job, also scheduled every minute as a safety net, applies pending
+deliveries in batches: deliveries and their transactions are locked with
+select_for_update, a transaction is marked paid at most once, and premium time
+is granted with one conditional UPDATE per user, so retries and parallel
+workers can neither double-extend nor lose an extension.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .entitlement import invalidate_entitlements
+from .models import Transaction, WebhookDelivery
+
+User = get_user_model()
+logger = logging.getLogger('payments')
+
+BATCH_SIZE = 100
+
+# Deliveries that keep failing with unexpected errors are given up on
+MAX_ATTEMPTS = 5
+
+TRANSACTION_STATUSES = {value for value, _ in Transaction.STATUS_CHOICES}
+
+
+def delivery_event_id(request, data):
+    """
+    Provider event id for a webhook call.
+
+    Providers that do not send one are keyed on transaction and status, which
+    still makes their retries idempotent.
+    """
+    event_id = data.get('event_id') or request.META.get('HTTP_X_WEBHOOK_ID')
+    if event_id:
+        return str(event_id)[:200]
+    return f"{data.get('tx_id')}:{data.get('status')}"[:200]
+
+
+def record_delivery(event_id, data):
+    """Store a delivery; returns False when this event id was already received"""
+    _, created = WebhookDelivery.objects.get_or_create(
+        event_id=event_id,
+        defaults={
+            'transaction_id': str(data['tx_id'])[:100],
+            'status': str(data['status'])[:20],
+            'payload': data,
+        }
+    )
+    return created
+
+
+def grant_premium(user_id, days, now):
+    """Extend or start premium in one UPDATE, based on the row's current value"""
+    return User.objects.filter(pk=user_id).update(
+        is_premium=True,
+        premium_until=Case(
+            When(premium_until__gt=now, then=F('premium_until') + timedelta(days=days)),
+            default=Value(now + timedelta(days=days)),
+        )
+    )
+
+
+def apply_deliveries(deliveries, now):
+    """Apply locked deliveries to their (locked) transactions and users"""
+    transaction_ids = {delivery.transaction_id for delivery in deliveries}
+    transactions = {
+        tx.transaction_id: tx
+        for tx in Transaction.objects.select_for_update(of=('self',)).select_related('plan').filter(
+            transaction_id__in=transaction_ids
+        )
+    }
+
+    premium_days = defaultdict(int)
+    changed = {}
+    for delivery in deliveries:
+        delivery.attempts += 1
+        delivery.processed_at = now
+        tx = transactions.get(delivery.transaction_id)
+
+        if tx is None:
+            delivery.state, delivery.last_error = 'failed', 'Transaction not found'
+        elif delivery.status not in TRANSACTION_STATUSES:
+            delivery.state, delivery.last_error = 'failed', f"Unknown status '{delivery.status}'"
+        elif tx.status == 'paid':
+            # Paid is final: repeated or late deliveries change nothing
+            delivery.state = 'ignored'
+        else:
+            tx.status = delivery.status
+            if delivery.status == 'paid':
+                tx.paid_at = now
+                premium_days[tx.user_id] += tx.plan.duration_days
+            tx.updated_at = now
+            changed[tx.transaction_id] = tx
+            delivery.state = 'processed'
+
+    if changed:
+        Transaction.objects.bulk_update(changed.values(), ['status', 'paid_at', 'updated_at'])
+    for user_id, days in premium_days.items():
+        grant_premium(user_id, days, now)
+
+    user_ids = {tx.user_id for tx in changed.values()}
+    if user_ids:
+        db_transaction.on_commit(lambda: invalidate_entitlements(user_ids))
+
+    WebhookDelivery.objects.bulk_update(deliveries, ['state', 'attempts', 'last_error', 'processed_at'])
+
+
+def run_batch(queryset, now):
+    with db_transaction.atomic():
+        deliveries = list(queryset.select_for_update(skip_locked=True))
+        if deliveries:
+            apply_deliveries(deliveries, now)
+    return deliveries
+
+
+def pending_deliveries():
+    return WebhookDelivery.objects.filter(state='pending').order_by('id')
+
+
+def apply_pending(ids, now=None):
+    """
+    Apply the pending deliveries among `ids`; returns how many were handled.
+
+    Rows are claimed with SKIP LOCKED, so rows another worker holds are not
+    counted. When the batch fails its deliveries are retried one by one so a
+    single bad delivery cannot hold back the rest; those that fail again are
+    counted as handled (see record_failure).
+    """
+    now = now or timezone.now()
+    pending = pending_deliveries()
+    try:
+        handled = len(run_batch(pending.filter(id__in=ids), now))
+    except Exception as e:
+        logger.error(f"Webhook batch failed, retrying deliveries one by one: {e}")
+        handled = 0
+        for delivery_id in ids:
+            try:
+                handled += len(run_batch(pending.filter(id=delivery_id), now))
+            except Exception as e:
+                logger.error(f"Webhook delivery {delivery_id} failed: {e}")
+                record_failure(delivery_id, str(e))
+                handled += 1
+
+    if handled:
+        logger.info(f"Processed {handled} webhook deliveries")
+    return handled
+
+
+def process_deliveries(batch_size=BATCH_SIZE):
+    """
+    Apply one batch of pending deliveries; returns how many were handled.
+
+    Several workers can run side by side. 0 means there was nothing to do,
+    or that other workers hold every pending row.
+    """
+    ids = list(pending_deliveries().values_list('id', flat=True)[:batch_size])
+    return apply_pending(ids) if ids else 0
+
+
+def process_events(event_ids, batch_size=BATCH_SIZE):
+    """Apply the pending deliveries with these event ids, once each; returns how many were handled"""
+    ids = list(pending_deliveries().filter(event_id__in=event_ids).values_list('id', flat=True))
+    return sum(apply_pending(ids[start:start + batch_size]) for start in range(0, len(ids), batch_size))
+
+
+def drain_deliveries(batch_size=BATCH_SIZE):
+    """
+    Apply the deliveries pending so far, in batches; returns how many were handled.
+
+    Each delivery is tried at most once per call, so one that keeps failing
+    is retried on the next call instead of straight away.
+    """
+    handled = 0
+    last_id = 0
+    while True:
+        ids = list(pending_deliveries().filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return handled
+        handled += apply_pending(ids)
+        last_id = ids[-1]
+
+
+def record_failure(delivery_id, error):
+    """Count a failed attempt; give up on deliveries that keep failing"""
+    WebhookDelivery.objects.filter(id=delivery_id).update(attempts=F('attempts') + 1, last_error=error)
+    WebhookDelivery.objects.filter(id=delivery_id, attempts__gte=MAX_ATTEMPTS).update(state='failed')
@@ -3,4 +3,12 @@ from django.apps import AppConfig
 
 class PredictionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'predictions'
\ No newline at end of file
+    name = 'predictions'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .content import banner_list
+        from .models import Banner
+
+        post_save.connect(banner_list.invalidate, sender=Banner)
+        post_delete.connect(banner_list.invalidate, sender=Banner)
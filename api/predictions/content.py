@@ -0,0 +1,112 @@
+"""
+Read-only content kept in memory (preloaded by config/warmup.py)
+
+- The active banners, rendered to a JSON body once and rebuilt only after a
+  Banner is saved or deleted.
+- The content/*.json packs shipped with the app (CONTENT_DIR), decoded once
+  per process into frozen mappings and tuples.
+- The prediction and compatibility templates of the data generators.
+"""
+import json
+import logging
+from pathlib import Path
+import threading
+from types import MappingProxyType
+
+from django.conf import settings
+
+from compatibility.data_generator import CompatibilityDataGenerator
+from config.renderers import dumps
+from config.warmup import Snapshot, freeze
+
+from .data_generator import HoroscopeDataGenerator
+from .models import Banner
+
+logger = logging.getLogger('performance')
+
+
+def serialize_banner(banner):
+    return {
+        'id': banner.banner_id,
+        'title': banner.title,
+        'subtitle': banner.subtitle,
+        'bullets': banner.bullets,
+        'target': banner.target,
+        'premium_required': banner.premium_required
+    }
+
+
+def load_banners():
+    """JSON body of the active banners, creating the defaults if there are none"""
+    active_banners = Banner.objects.filter(is_active=True).order_by('created_at')
+    banners = list(active_banners)
+
+    if not banners:
+        for banner in HoroscopeDataGenerator.generate_banner_data():
+            Banner.objects.get_or_create(
+                banner_id=banner['id'],
+                defaults={
+                    'title': banner['title'],
+                    'subtitle': banner['subtitle'],
+                    'bullets': banner['bullets'],
+                    'target': banner['target'],
+                    'premium_required': banner['premium_required'],
+                    'is_active': True
+                }
+            )
+        banners = list(active_banners.all())
+
+    return dumps([serialize_banner(banner) for banner in banners])
+
+
+banner_list = Snapshot('predictions.banners', load_banners)
+
+
+def load_content_packs(directory):
+    """{pack name: frozen content} for every *.json file in `directory`"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        logger.warning(f"Content directory {directory} not found; no content packs loaded")
+        return {}
+    return {path.stem: freeze(json.loads(path.read_bytes())) for path in sorted(directory.glob('*.json'))}
+
+
+_content_packs = None
+_content_lock = threading.Lock()
+
+
+def content_packs():
+    global _content_packs
+
+    if _content_packs is None:
+        with _content_lock:
+            if _content_packs is None:
+                _content_packs = MappingProxyType(load_content_packs(settings.CONTENT_DIR))
+    return _content_packs
+
+
+def content_pack(name):
+    """A frozen content pack (e.g. 'horoscopes', 'druid'), or None"""
+    return content_packs().get(name)
+
+
+def warm_banners():
+    return len(banner_list.get())
+
+
+def warm_content_packs():
+    return len(content_packs())
+
+
+def warm_templates():
+    """Template count; the generators' class tables are built on import"""
+    return sum(
+        len(templates)
+        for table in (
+            HoroscopeDataGenerator.DAILY_TEMPLATES,
+            HoroscopeDataGenerator.WEEKLY_MONTHLY_TEMPLATES,
+            CompatibilityDataGenerator.PREVIEW_TEMPLATES,
+            CompatibilityDataGenerator.PREMIUM_TEMPLATES,
+        )
+        for templates in table.values()
+    )
@@ -0,0 +1,52 @@
+"""
+Background tasks (see jobs/registry.py)
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from jobs.registry import task
+
+from .data_generator import HoroscopeDataGenerator
+from .models import Prediction
+from .validation import SIGNS
+
+
+@task('predictions.precompute_daily', every=3600)
+def precompute_daily(days_ahead=1):
+    """
+    Store the daily predictions of every sign from yesterday to `days_ahead`
+    days from now, so the daily endpoint finds them instead of generating
+    them on the request (clients ask for their local date)
+    """
+    today = timezone.now().date()
+    days = [today + timedelta(days=offset) for offset in range(-1, days_ahead + 1)]
+    date_keys = {day.isoformat(): day for day in days}
+
+    existing = set(Prediction.objects.filter(
+        prediction_type='daily', date_key__in=list(date_keys)
+    ).values_list('sign', 'date_key'))
+
+    predictions = []
+    for date_key, day in date_keys.items():
+        for sign in sorted(SIGNS):
+            if (sign, date_key) in existing:
+                continue
+            data = HoroscopeDataGenerator.generate_daily_prediction(sign, day)
+            predictions.append(Prediction(
+                sign=sign,
+                prediction_type='daily',
+                date_key=date_key,
+                text=data['text'],
+                lucky_number=data['lucky_number'],
+                lucky_color=data['lucky_color'],
+                mood=data['mood'],
+                love_score=data['aspects']['love'],
+                career_score=data['aspects']['career'],
+                health_score=data['aspects']['health'],
+                premium=False
+            ))
+
+    # A request may have generated some of them meanwhile; keep those
+    Prediction.objects.bulk_create(predictions, ignore_conflicts=True)
+    return len(predictions)
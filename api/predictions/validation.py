@@ -0,0 +1,45 @@
+"""
+Shared validation of sign and period parameters
+
+Sets and patterns are built once at import instead of on every request.
+Used by the prediction and compatibility views.
+"""
+from datetime import date
+import re
+
+from .models import Prediction
+
+SIGNS = frozenset(choice[0] for choice in Prediction.ZODIAC_SIGNS)
+
+# Same inputs as strptime('%Y-%m-%d'), which allows unpadded month and day
+DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+WEEK_RE = re.compile(r'\d{4}-W\d{2}')
+MONTH_RE = re.compile(r'\d{4}-\d{2}')
+YEAR_RE = re.compile(r'\d{4}')
+
+
+def is_valid_sign(sign):
+    return isinstance(sign, str) and sign in SIGNS
+
+
+def parse_date_key(value):
+    """date for a YYYY-MM-DD key, or None when malformed or not a real day"""
+    match = DATE_RE.fullmatch(value)
+    if match is None:
+        return None
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def is_week_key(value):
+    return WEEK_RE.fullmatch(value) is not None
+
+
+def is_month_key(value):
+    return MONTH_RE.fullmatch(value) is not None
+
+
+def is_year_key(value):
+    return YEAR_RE.fullmatch(value) is not None
@@ -2,10 +2,11 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from datetime import datetime, timedelta
+from config.renderers import PreRenderedJSON
+from .content import banner_list
 from .data_generator import HoroscopeDataGenerator
-from .models import Prediction, Banner
-import re
+from .models import Prediction
+from .validation import is_month_key, is_valid_sign, is_week_key, is_year_key, parse_date_key
 
 
 @api_view(['GET'])
@@ -22,16 +23,14 @@ def daily_prediction(request):
         )
 
     # Validate sign
-    valid_signs = [choice[0] for choice in Prediction.ZODIAC_SIGNS]
-    if sign not in valid_signs:
+    if not is_valid_sign(sign):
         return Response(
             {"error": {"code": "INVALID_SIGN", "message": "Invalid zodiac sign"}},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    except ValueError:
+    date = parse_date_key(date_str)
+    if date is None:
         return Response(
             {"error": {"code": "INVALID_DATA", "message": "Invalid date format. Use YYYY-MM-DD"}},
             status=status.HTTP_400_BAD_REQUEST
@@ -62,19 +61,22 @@ def daily_prediction(request):
         # Generate new prediction
         prediction_data = HoroscopeDataGenerator.generate_daily_prediction(sign, date)
 
-        # Save to database
-        Prediction.objects.create(
+        # Save to database (get_or_create: a concurrent request or a lagging
+        # read replica may have missed a row the primary already has)
+        Prediction.objects.get_or_create(
             sign=sign,
             prediction_type='daily',
             date_key=date_str,
-            text=prediction_data['text'],
-            lucky_number=prediction_data['lucky_number'],
-            lucky_color=prediction_data['lucky_color'],
-            mood=prediction_data['mood'],
-            love_score=prediction_data['aspects']['love'],
-            career_score=prediction_data['aspects']['career'],
-            health_score=prediction_data['aspects']['health'],
-            premium=False
+            defaults={
+                'text': prediction_data['text'],
+                'lucky_number': prediction_data['lucky_number'],
+                'lucky_color': prediction_data['lucky_color'],
+                'mood': prediction_data['mood'],
+                'love_score': prediction_data['aspects']['love'],
+                'career_score': prediction_data['aspects']['career'],
+                'health_score': prediction_data['aspects']['health'],
+                'premium': False
+            }
         )
 
         response_data = prediction_data
@@ -96,15 +98,14 @@ def weekly_prediction(request):
         )
 
     # Validate sign
-    valid_signs = [choice[0] for choice in Prediction.ZODIAC_SIGNS]
-    if sign not in valid_signs:
+    if not is_valid_sign(sign):
         return Response(
             {"error": {"code": "INVALID_SIGN", "message": "Invalid zodiac sign"}},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     # Validate week format (YYYY-WXX)
-    if not re.match(r'^\d{4}-W\d{2}$', week_str):
+    if not is_week_key(week_str):
         return Response(
             {"error": {"code": "INVALID_DATA", "message": "Invalid week format. Use YYYY-WXX"}},
             status=status.HTTP_400_BAD_REQUEST
@@ -128,13 +129,16 @@ def weekly_prediction(request):
         # Generate new prediction
         prediction_data = HoroscopeDataGenerator.generate_extended_prediction(sign, 'weekly', week_str)
 
-        # Save to database
-        Prediction.objects.create(
+        # Save to database (get_or_create: a concurrent request or a lagging
+        # read replica may have missed a row the primary already has)
+        Prediction.objects.get_or_create(
             sign=sign,
             prediction_type='weekly',
             date_key=week_str,
-            text=prediction_data['text'],
-            premium=True
+            defaults={
+                'text': prediction_data['text'],
+                'premium': True
+            }
         )
 
         response_data = prediction_data
@@ -156,15 +160,14 @@ def monthly_prediction(request):
         )
 
     # Validate sign
-    valid_signs = [choice[0] for choice in Prediction.ZODIAC_SIGNS]
-    if sign not in valid_signs:
+    if not is_valid_sign(sign):
         return Response(
             {"error": {"code": "INVALID_SIGN", "message": "Invalid zodiac sign"}},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     # Validate month format (YYYY-MM)
-    if not re.match(r'^\d{4}-\d{2}$', month_str):
+    if not is_month_key(month_str):
         return Response(
             {"error": {"code": "INVALID_DATA", "message": "Invalid month format. Use YYYY-MM"}},
             status=status.HTTP_400_BAD_REQUEST
@@ -188,13 +191,16 @@ def monthly_prediction(request):
         # Generate new prediction
         prediction_data = HoroscopeDataGenerator.generate_extended_prediction(sign, 'monthly', month_str)
 
-        # Save to database
-        Prediction.objects.create(
+        # Save to database (get_or_create: a concurrent request or a lagging
+        # read replica may have missed a row the primary already has)
+        Prediction.objects.get_or_create(
             sign=sign,
             prediction_type='monthly',
             date_key=month_str,
-            text=prediction_data['text'],
-            premium=True
+            defaults={
+                'text': prediction_data['text'],
+                'premium': True
+            }
         )
 
         response_data = prediction_data
@@ -216,15 +222,14 @@ def yearly_prediction(request):
         )
 
     # Validate sign
-    valid_signs = [choice[0] for choice in Prediction.ZODIAC_SIGNS]
-    if sign not in valid_signs:
+    if not is_valid_sign(sign):
         return Response(
             {"error": {"code": "INVALID_SIGN", "message": "Invalid zodiac sign"}},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     # Validate year format (YYYY)
-    if not re.match(r'^\d{4}$', year_str):
+    if not is_year_key(year_str):
         return Response(
             {"error": {"code": "INVALID_DATA", "message": "Invalid year format. Use YYYY"}},
             status=status.HTTP_400_BAD_REQUEST
@@ -248,13 +253,16 @@ def yearly_prediction(request):
         # Generate new prediction
         prediction_data = HoroscopeDataGenerator.generate_extended_prediction(sign, 'yearly', year_str)
 
-        # Save to database
-        Prediction.objects.create(
+        # Save to database (get_or_create: a concurrent request or a lagging
+        # read replica may have missed a row the primary already has)
+        Prediction.objects.get_or_create(
             sign=sign,
             prediction_type='yearly',
             date_key=year_str,
-            text=prediction_data['text'],
-            premium=True
+            defaults={
+                'text': prediction_data['text'],
+                'premium': True
+            }
         )
 
         response_data = prediction_data
@@ -267,42 +275,8 @@ def yearly_prediction(request):
 def banners(request):
     """Get promotional banners"""
     try:
-        # Get active banners from database
-        active_banners = Banner.objects.filter(is_active=True).order_by('created_at')
-
-        if not active_banners.exists():
-            # Create default banners if none exist
-            banner_data = HoroscopeDataGenerator.generate_banner_data()
-
-            for banner in banner_data:
-                Banner.objects.get_or_create(
-                    banner_id=banner['id'],
-                    defaults={
-                        'title': banner['title'],
-                        'subtitle': banner['subtitle'],
-                        'bullets': banner['bullets'],
-                        'target': banner['target'],
-                        'premium_required': banner['premium_required'],
-                        'is_active': True
-                    }
-                )
-
-            # Refresh queryset
-            active_banners = Banner.objects.filter(is_active=True).order_by('created_at')
-
-        # Format response
-        response_data = []
-        for banner in active_banners:
-            response_data.append({
-                'id': banner.banner_id,
-                'title': banner.title,
-                'subtitle': banner.subtitle,
-                'bullets': banner.bullets,
-                'target': banner.target,
-                'premium_required': banner.premium_required
-            })
-
-        return Response(response_data)
+        # Body is pre-rendered once (see predictions/content.py)
+        return Response(PreRenderedJSON(banner_list.get()))
 
     except Exception as e:
         return Response(